@@ -1,59 +1,50 @@
-import random
-import pygame
-import os
+import rngs
+import sprites
+import spawner
 class Asteroid: 
-    def __init__(self, grid_size, occupied_positions, existing_data=None):
+    __slots__ = ('grid_size', 'x', 'y', 'dx', 'dy')
+
+    def __init__(self, grid_size, occupied_positions, existing_data=None, spawn=None):
         self.grid_size = grid_size
-        self.sprite = None
 
         if existing_data:
             self.load_from_dict(existing_data)
         else:
-            self.create_new_asteroid(occupied_positions)
-        
-        self.load_sprite()
-    def create_new_asteroid(self, occupied_positions):
-        """ Spawns an asteroid at a random edge """
-        edge = random.randint(0, 3)
+            self.create_new_asteroid(occupied_positions, spawn)
+    def create_new_asteroid(self, occupied_positions, spawn=None):
+        """
+        Spawns an asteroid on a random free edge cell, or on spawn=(x, y, edge)
+        from spawner.free_edge_cells.
+        """
+        if spawn is None:
+            cells = spawner.free_edge_cells(self.grid_size, 1, lambda pos: pos not in occupied_positions)
+            # Every edge cell is taken, overlap instead of searching forever
+            spawn = cells[0] if cells else spawner.edge_cell(
+                rngs.spawn.randrange(spawner.edge_count(self.grid_size)), self.grid_size)
+        self.x, self.y, edge = spawn
         #Top
-        if edge == 0:
-            self.x = random.randint(0, self.grid_size - 1)
-            self.y = 0
-            self.dx = random.choice([- 1, 0, 1])
+        if edge == spawner.EDGE_TOP:
+            self.dx = rngs.spawn.choice([- 1, 0, 1])
             self.dy = 1 
         #Bottom
-        elif edge == 1:
-            self.x = random.randint(0, self.grid_size - 1)
-            self.y = self.grid_size - 1
-            self.dx = random.choice([- 1, 0, 1])
+        elif edge == spawner.EDGE_BOTTOM:
+            self.dx = rngs.spawn.choice([- 1, 0, 1])
             self.dy = -1
         #left
-        elif edge == 2:
-            self.x = 0
-            self.y = random.randint(0, self.grid_size - 1)
+        elif edge == spawner.EDGE_LEFT:
             self.dx = 1
-            self.dy = random.choice([- 1, 0, 1])
+            self.dy = rngs.spawn.choice([- 1, 0, 1])
         #right
         else:
-            self.x = self.grid_size - 1
-            self.y = random.randint(0, self.grid_size - 1)
             self.dx = -1
-            self.dy = random.choice([- 1, 0, 1])
+            self.dy = rngs.spawn.choice([- 1, 0, 1])
         #correction    
         if self.dx == 0 and self.dy == 0:
             self.dx, self.dy = 1, 1
-        #correction for station and player
-        if (self.x, self.y) in occupied_positions:
-            self.create_new_asteroid(occupied_positions)
-    def load_sprite(self):
-        """Attempts to load sprite"""
-        try: 
-            current_dir = os.path.dirname(os.path.abspath(__file__))
-            sprite_path = os.path.join(current_dir, 'sprites', 'Asteroid.png')
-            loaded_sprite = pygame.image.load(sprite_path)
-            self.sprite = pygame.transform.scale(loaded_sprite, (32, 32))
-        except (pygame.error, FileNotFoundError):
-            self.sprite = None
+    @property
+    def sprite(self):
+        """Gets the shared sprite from the cache, loaded the first time the map draws one"""
+        return sprites.get_sprite('Asteroid.png', (32, 32))
     def move(self, avoid_locations=None):
         """Updates position, but waits if the next spot is blocked."""
         if avoid_locations is None:
@@ -69,11 +60,11 @@ class Asteroid:
             if hit_x_wall:
                 self.dx *= -1
                 if self.dy == 0:
-                    self.dy = random.choice([-1, 1])
+                    self.dy = rngs.asteroids.choice([-1, 1])
             if hit_y_wall:
                 self.dy *= -1
                 if self.dx == 0:
-                    self.dx = random.choice([-1, 1])
+                    self.dx = rngs.asteroids.choice([-1, 1])
             #Corner Bounce
             if not hit_x_wall and not hit_y_wall:
                 self.dx *= -1
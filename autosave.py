@@ -0,0 +1,212 @@
+"""
+Background autosave.
+
+Every turn the game hands the current save data to an Autosaver. Only
+what changed since the last turn is appended to a journal file (one JSON
+line per turn). Every snapshot_every turns the full state is written as
+a binary save instead and the journal starts over. Working out what
+changed, encoding and all file writes happen on a background thread, the
+game's thread only queues the save data. Snapshots are written to a temp
+file and renamed over the old one so a crash never leaves half a snapshot.
+A background made from a seed is snapshotted as that seed, not its tiles.
+
+recover() rebuilds the latest state from the snapshot plus the journal.
+"""
+import json
+import lzma
+import os
+import queue
+import struct
+import threading
+import zlib
+import savefile
+from camera import ChunkedBackground
+
+# map_state keys that don't change during play, they are only written with snapshots
+STATIC_MAP_KEYS = ('bg_grid',)
+# Snapshot map_state key holding ChunkedBackground.to_dict() in place of bg_grid
+BG_SEED_KEY = 'bg_seed'
+SNAPSHOT_EVERY = 25
+
+
+def diff(old, new):
+    """Returns a patch that turns old into new, or None if they are equal."""
+    if old == new:
+        return None
+    if isinstance(old, dict) and isinstance(new, dict):
+        changed = {}
+        for key, value in new.items():
+            if key in old:
+                patch = diff(old[key], value)
+                if patch is not None:
+                    changed[key] = patch
+            else:
+                changed[key] = {'v': value}
+        removed = [key for key in old if key not in new]
+        return {'d': changed, 'r': removed} if removed else {'d': changed}
+    if isinstance(old, list) and isinstance(new, list):
+        changed = {}
+        for i, value in enumerate(new):
+            if i < len(old):
+                patch = diff(old[i], value)
+                if patch is not None:
+                    changed[str(i)] = patch
+            else:
+                changed[str(i)] = {'v': value}
+        return {'l': len(new), 'd': changed}
+    return {'v': new}
+
+
+def apply(value, patch):
+    """Returns value with a patch from diff() applied."""
+    if 'v' in patch:
+        return patch['v']
+    if 'l' in patch:
+        value = list(value[:patch['l']])
+        value.extend([None] * (patch['l'] - len(value)))
+        for i, sub in patch['d'].items():
+            value[int(i)] = apply(value[int(i)], sub)
+        return value
+    value = dict(value)
+    for key in patch.get('r', ()):
+        value.pop(key, None)
+    for key, sub in patch['d'].items():
+        value[key] = apply(value.get(key), sub)
+    return value
+
+
+def _plain(save_data: dict) -> dict:
+    """JSON-shaped copy of save_data without the static map keys (tuples become lists)."""
+    map_state = save_data.get('map_state', {})
+    trimmed = dict(save_data)
+    trimmed['map_state'] = {key: value for key, value in map_state.items() if key not in STATIC_MAP_KEYS}
+    return json.loads(json.dumps(trimmed))
+
+
+class Autosaver:
+    def __init__(self, snapshot_file: str, journal_file: str, snapshot_every: int = SNAPSHOT_EVERY,
+                 codec: int = savefile.CODEC_ZLIB):
+        self.snapshot_file = snapshot_file
+        self.journal_file = journal_file
+        self.snapshot_every = snapshot_every
+        self.codec = codec
+        self.seq = 0
+        self._last = None  # state written so far, as plain JSON data (writer thread only)
+        self._last_snapshot_seq = None
+        # The static map values last snapshotted, held so a new object can't reuse an old one's id
+        self._static = None
+        self._jobs = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="autosave", daemon=True)
+        self._thread.start()
+
+    def record(self, save_data: dict) -> None:
+        """
+        Saves one turn. Only queues save_data, the writer thread reads it later,
+        so it must not share anything the game goes on changing (the background aside).
+        """
+        self.seq += 1
+        map_state = save_data.get('map_state', {})
+        # A missing key is None every turn, so it doesn't look like a change
+        static = tuple(map_state.get(key) for key in STATIC_MAP_KEYS)
+        snapshot = (self._last_snapshot_seq is None
+                    or any(value is not old for value, old in zip(static, self._static))
+                    or self.seq - self._last_snapshot_seq >= self.snapshot_every)
+        if snapshot:
+            self._last_snapshot_seq = self.seq
+            self._static = static
+        self._jobs.put(('snapshot' if snapshot else 'journal', (self.seq, save_data)))
+
+    def flush(self) -> None:
+        """Waits until everything recorded so far is on disk."""
+        self._jobs.join()
+
+    def close(self, discard: bool = False) -> None:
+        """Stops the writer thread. With discard the autosave files are deleted (clean exit)."""
+        self._jobs.put(('stop', None))
+        self._thread.join()
+        if discard:
+            for filename in (self.snapshot_file, self.journal_file):
+                if os.path.exists(filename):
+                    os.remove(filename)
+
+    def _run(self) -> None:
+        while True:
+            kind, payload = self._jobs.get()
+            try:
+                if kind == 'stop':
+                    return
+                seq, save_data = payload
+                state = _plain(save_data)
+                last, self._last = self._last, state
+                if kind == 'snapshot':
+                    self._write_snapshot(self._snapshot(seq, state, save_data['map_state']))
+                else:
+                    patch = diff(last, state)
+                    if patch is not None:
+                        self._append_journal(json.dumps({'seq': seq, 'patch': patch}, separators=(',', ':')))
+            except (IOError, OSError) as e:
+                print(f"\nAutosave failed: {e}")
+            finally:
+                self._jobs.task_done()
+
+    def _snapshot(self, seq: int, state: dict, map_state: dict) -> dict:
+        """state plus the static map keys, ready for savefile."""
+        snapshot = dict(state)
+        snapshot['map_state'] = dict(state['map_state'])
+        for key in STATIC_MAP_KEYS:
+            value = map_state.get(key)
+            if isinstance(value, ChunkedBackground) and value.from_seed:
+                snapshot['map_state'][BG_SEED_KEY] = value.to_dict()
+                continue
+            if hasattr(value, 'to_list'):
+                # Every chunk of a from_list background already exists, so this only reads
+                value = value.to_list()
+            if value is not None:
+                snapshot['map_state'][key] = value
+        snapshot['autosave_seq'] = seq
+        return snapshot
+
+    def _write_snapshot(self, save_data: dict) -> None:
+        temp_file = self.snapshot_file + '.tmp'
+        with open(temp_file, 'wb') as f:
+            f.write(savefile.encode(save_data, self.codec))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_file, self.snapshot_file)
+        # Everything in the journal is part of the snapshot now
+        open(self.journal_file, 'w').close()
+
+    def _append_journal(self, line: str) -> None:
+        with open(self.journal_file, 'a') as f:
+            f.write(line + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+
+
+def recover(snapshot_file: str, journal_file: str):
+    """Returns the latest autosaved state (same shape as a loaded save), or None."""
+    if not os.path.exists(snapshot_file):
+        return None
+    try:
+        save_data = savefile.load(snapshot_file)
+    except (ValueError, IOError, struct.error, zlib.error, lzma.LZMAError) as e:
+        print(f"\nError loading autosave: {e}")
+        return None
+    snapshot_seq = save_data.pop('autosave_seq', 0)
+    map_state = save_data.get('map_state', {})
+    static = {key: map_state[key] for key in STATIC_MAP_KEYS if key in map_state}
+    if BG_SEED_KEY in map_state:
+        static['bg_grid'] = ChunkedBackground.from_dict(map_state.pop(BG_SEED_KEY))
+    state = _plain(save_data)
+    if os.path.exists(journal_file):
+        with open(journal_file, 'r') as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    # Torn write from a crash, nothing after it is usable
+                    break
+                if entry['seq'] > snapshot_seq:
+                    state = apply(state, entry['patch'])
+    state['map_state'].update(static)
+    return state
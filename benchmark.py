@@ -0,0 +1,401 @@
+"""
+Benchmarks for the game's hot paths.
+
+Runs headless (SDL dummy video driver) and prints ops/sec and latency
+percentiles for each case:
+
+    fight_turn        one handle_fight_turn call
+    menu_command      one command sent to a menus.Game at the station
+    asteroid_move     every asteroid calls Asteroid.move once
+    monster_move      every monster calls WanderingMonster.move once
+    map_turn          one turn of handle_map, input to drawn frame
+    save_roundtrip    save_game_data then load_game_data
+    render            a full repaint of the map view
+
+Grid sizes and entity counts can be picked on the command line. Results
+can be stored as a baseline, later runs are compared against it and
+exit with status 1 if a case's median got slower than the threshold:
+
+    python benchmark.py --save-baseline
+    python benchmark.py --threshold 0.25
+
+Every case re-seeds rngs first so runs do the same work.
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import sys
+import tempfile
+import time
+
+# Must be set before pygame opens a window
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+
+import rngs
+import gamefunctions
+import menus
+import spawner
+from asteroid import Asteroid
+from wanderingMonster import WanderingMonster
+from camera import Camera, as_background
+from occupancy import OccupancyGrid, LAYER_MONSTER
+from simulation import MAX_ASTEROIDS
+
+BASELINE_FILE = "benchmark_baseline.json"
+DEFAULT_GRID_SIZES = (10, 50, 200)
+DEFAULT_COUNTS = (10, 100, 1000)
+DEFAULT_THRESHOLD = 0.25
+BENCH_SEED = 1234
+PERCENTILES = (50, 90, 99)
+
+
+def measure(op, min_time: float, min_ops: int = 20, after=None) -> list:
+    """
+    Calls op() until min_time seconds and at least min_ops calls have passed.
+    after() runs between calls without being timed. Returns the latency of every call.
+    """
+    timings = []
+    clock = time.perf_counter
+    total = 0.0
+    while total < min_time or len(timings) < min_ops:
+        start = clock()
+        op()
+        elapsed = clock() - start
+        timings.append(elapsed)
+        total += elapsed
+        if after is not None:
+            after()
+    return timings
+
+
+def percentile(sorted_values: list, pct: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    index = max(0, min(len(sorted_values) - 1, round(pct / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def summarize(timings: list) -> dict:
+    ordered = sorted(timings)
+    stats = {
+        'ops': len(timings),
+        'ops_per_sec': len(timings) / sum(timings) if sum(timings) > 0 else float('inf'),
+    }
+    for pct in PERCENTILES:
+        stats[f'p{pct}_us'] = percentile(ordered, pct) * 1e6
+    return stats
+
+
+@contextlib.contextmanager
+def patched(module, **values):
+    """Temporarily replaces module globals."""
+    old = {name: getattr(module, name) for name in values}
+    for name, value in values.items():
+        setattr(module, name, value)
+    try:
+        yield
+    finally:
+        for name, value in old.items():
+            setattr(module, name, value)
+
+
+def _monsters(grid_size: int, count: int, town_pos=(0, 0)) -> list:
+    cells = spawner.free_cells(grid_size, count, lambda cell: cell != town_pos)
+    return [WanderingMonster(grid_size, town_pos, pos=cell) for cell in cells]
+
+
+def _asteroids(grid_size: int, count: int) -> list:
+    spawns = spawner.free_edge_cells(grid_size, count, lambda pos: True)
+    return [Asteroid(grid_size, set(), spawn=spawn) for spawn in spawns]
+
+
+def _session(grid_size: int):
+    view = min(grid_size, gamefunctions.VIEW_TILES) * gamefunctions.TILE_SIZE
+    session = gamefunctions.DisplaySession(view, view, gamefunctions.TILE_SIZE)
+    if not session.open():
+        return None
+    return session
+
+
+# Each bench_* sets up its workload and returns the timings, or None if it can't run here
+
+def bench_fight_turn(grid_size, count, min_time):
+    sink = io.StringIO()
+    weapon = gamefunctions.CATALOG.new_item('laser')
+    weapon['currentDurability'] = 10 ** 9
+
+    def op():
+        gamefunctions.handle_fight_turn(50, 5, 10 ** 9, 5, "Martian", weapon, total_defense=2)
+
+    def after():
+        # handle_fight_turn prints every roll
+        sink.seek(0)
+        sink.truncate()
+
+    with contextlib.redirect_stdout(sink):
+        return measure(op, min_time, after=after)
+
+
+def bench_menu_command(grid_size, count, min_time):
+    game = menus.Game(ask_name=False)
+    game.open()
+    # Into the shop and out again, then an equip menu that closes at once and a repair
+    commands = ("3", "0", "4", "2")
+    sent = [0]
+
+    def op():
+        game.send(commands[sent[0] % len(commands)])
+        sent[0] += 1
+
+    return measure(op, min_time)
+
+
+def bench_asteroid_move(grid_size, count, min_time):
+    asteroids = _asteroids(grid_size, count)
+    if not asteroids:
+        return None
+    blockers = {(grid_size // 2, grid_size // 2)}
+
+    def op():
+        for ast in asteroids:
+            ast.move(blockers)
+
+    def after():
+        # Replace the ones that flew off, so every pass moves the same number
+        for ast in asteroids:
+            if ast.is_out_of_bounds():
+                ast.create_new_asteroid(blockers)
+
+    return measure(op, min_time, after=after)
+
+
+def bench_monster_move(grid_size, count, min_time):
+    town_pos = (0, 0)
+    monsters = _monsters(grid_size, count, town_pos)
+    if len(monsters) < count:
+        return None
+    turn = [1]
+
+    def op():
+        # Monsters only move on odd turns
+        for monster in monsters:
+            monster.move(town_pos, turn[0])
+
+    def after():
+        turn[0] += 2
+
+    return measure(op, min_time, after=after)
+
+
+def bench_map_turn(grid_size, count, min_time):
+    import pygame
+    session = _session(grid_size)
+    if session is None:
+        return None
+    town_pos = (0, 0)
+    player_pos = (grid_size // 2, grid_size // 2)
+    monsters = _monsters(grid_size, count, town_pos)
+    if len(monsters) < count:
+        return None
+    map_state = {
+        'player_pos': player_pos,
+        'town_pos': town_pos,
+        'monsters': monsters,
+        'asteroids': [],
+        'moved_from_town': True,
+        'turn_count': 0
+    }
+    keys = (pygame.K_UP, pygame.K_RIGHT, pygame.K_DOWN, pygame.K_LEFT)
+    timings = []
+    state = {'last': None, 'total': 0.0, 'presses': 0}
+
+    def poll(loop_mode, idle):
+        # One key per frame, so the time between polls is one full turn
+        now = time.perf_counter()
+        if state['last'] is not None:
+            timings.append(now - state['last'])
+            state['total'] += now - state['last']
+        state['last'] = now
+        if state['total'] >= min_time and len(timings) >= 20:
+            return [pygame.event.Event(pygame.QUIT)]
+        state['presses'] += 1
+        return [pygame.event.Event(pygame.KEYDOWN, key=keys[state['presses'] // 2 % len(keys)])]
+
+    with patched(gamefunctions, GRID_SIZE=grid_size, _poll_map_events=poll), \
+            contextlib.redirect_stdout(io.StringIO()):
+        action = None
+        while action != gamefunctions.ACTION_QUIT:
+            # Encounters and docking end handle_map, just carry on
+            action, map_state = gamefunctions.handle_map(map_state, session, loop_mode=gamefunctions.MAP_LOOP_BUSY)
+            map_state.pop('active_encounter', None)
+            state['last'] = None
+    session.close()
+    return timings
+
+
+def bench_save_roundtrip(grid_size, count, min_time, extension=".sav"):
+    import game
+    town_pos = (0, 0)
+    map_state = {
+        'player_pos': town_pos,
+        'town_pos': town_pos,
+        'monsters': _monsters(grid_size, count, town_pos),
+        'asteroids': _asteroids(grid_size, MAX_ASTEROIDS),
+        'moved_from_town': False,
+        'turn_count': 0,
+        'bg_grid': as_background(None, grid_size)
+    }
+    save_data = game.build_save_data(30, 50, 10, 5, {}, [gamefunctions.CATALOG.new_item('shield')], map_state)
+    fd, filename = tempfile.mkstemp(suffix=extension)
+    os.close(fd)
+
+    def op():
+        gamefunctions.save_game_data(filename, save_data)
+        gamefunctions.load_game_data(filename)
+
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            return measure(op, min_time)
+    finally:
+        os.remove(filename)
+
+
+def bench_save_roundtrip_json(grid_size, count, min_time):
+    return bench_save_roundtrip(grid_size, count, min_time, extension=".json")
+
+
+def bench_render(grid_size, count, min_time):
+    session = _session(grid_size)
+    if session is None:
+        return None
+    town_pos = (0, 0)
+    player_pos = (grid_size // 2, grid_size // 2)
+    monsters = _monsters(grid_size, count, town_pos)
+    occupancy = OccupancyGrid(grid_size, town_pos, player_pos)
+    for monster in monsters:
+        occupancy.add(LAYER_MONSTER, monster)
+    renderer = session.renderer
+    renderer.set_background(as_background(None, grid_size), session.bg_variants)
+    camera = Camera(gamefunctions.VIEW_TILES, gamefunctions.VIEW_TILES, grid_size)
+    camera.center_on(player_pos)
+
+    def op():
+        renderer.redraw_all()
+        renderer.draw(camera, town_pos, player_pos, occupancy, session.town_sprite, session.player_sprite)
+
+    try:
+        return measure(op, min_time)
+    finally:
+        session.close()
+
+
+# name -> (function, whether it depends on grid size, whether it depends on entity count)
+CASES = {
+    'fight_turn': (bench_fight_turn, False, False),
+    'menu_command': (bench_menu_command, False, False),
+    'asteroid_move': (bench_asteroid_move, True, True),
+    'monster_move': (bench_monster_move, True, True),
+    'map_turn': (bench_map_turn, True, True),
+    'save_roundtrip': (bench_save_roundtrip, True, True),
+    'save_roundtrip_json': (bench_save_roundtrip_json, True, True),
+    'render': (bench_render, True, False),
+}
+
+
+def case_key(name: str, grid_size: int = None, count: int = None) -> str:
+    key = name
+    if grid_size is not None:
+        key += f"[grid={grid_size}"
+        key += f",n={count}]" if count is not None else "]"
+    return key
+
+
+def run(grid_sizes=DEFAULT_GRID_SIZES, counts=DEFAULT_COUNTS, min_time: float = 0.5, only: str = None,
+        report=print) -> dict:
+    """Runs every case (whose name contains only, if given). Returns {case key: stats}."""
+    results = {}
+    for name, (bench, uses_grid, uses_count) in CASES.items():
+        if only and only not in name:
+            continue
+        for grid_size in (grid_sizes if uses_grid else (None,)):
+            for count in (counts if uses_count else (None,)):
+                if count is not None and count > grid_size * grid_size // 2:
+                    # Would fill the sector, not a realistic workload
+                    continue
+                key = case_key(name, grid_size, count)
+                rngs.seed(BENCH_SEED)
+                timings = bench(grid_size if grid_size is not None else gamefunctions.GRID_SIZE,
+                                count if count is not None else 10, min_time)
+                if not timings:
+                    report(f"{key:<40} skipped")
+                    continue
+                results[key] = summarize(timings)
+                report(format_row(key, results[key]))
+    return results
+
+
+def format_row(key: str, stats: dict) -> str:
+    return (f"{key:<40} {stats['ops_per_sec']:>12,.1f} ops/s " +
+            " ".join(f"p{pct} {stats[f'p{pct}_us']:>10,.1f}us" for pct in PERCENTILES))
+
+
+def compare(results: dict, baseline: dict, threshold: float) -> list:
+    """
+    Cases whose median latency grew by more than threshold (0.25 = 25%) over the baseline.
+    Returns (key, baseline p50, new p50) tuples.
+    """
+    regressions = []
+    for key, stats in results.items():
+        old = baseline.get(key)
+        if old is None:
+            continue
+        if stats['p50_us'] > old['p50_us'] * (1 + threshold):
+            regressions.append((key, old['p50_us'], stats['p50_us']))
+    return regressions
+
+
+def load_baseline(filename: str) -> dict:
+    with open(filename, 'r') as f:
+        return json.load(f)['results']
+
+
+def save_baseline(filename: str, results: dict) -> None:
+    with open(filename, 'w') as f:
+        json.dump({'python': sys.version.split()[0], 'seed': BENCH_SEED, 'results': results}, f, indent=2)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks for the game's hot paths")
+    parser.add_argument('--grid', type=int, nargs='+', default=list(DEFAULT_GRID_SIZES), help="grid sizes")
+    parser.add_argument('--count', type=int, nargs='+', default=list(DEFAULT_COUNTS), help="entity counts")
+    parser.add_argument('--min-time', type=float, default=0.5, help="seconds to run each case")
+    parser.add_argument('--only', help="only run cases whose name contains this")
+    parser.add_argument('--baseline', default=BASELINE_FILE, help="baseline results file")
+    parser.add_argument('--save-baseline', action='store_true', help="store this run as the new baseline")
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help="allowed slowdown of the median before a case counts as a regression")
+    args = parser.parse_args()
+
+    results = run(args.grid, args.count, args.min_time, args.only)
+
+    if args.save_baseline:
+        save_baseline(args.baseline, results)
+        print(f"\nBaseline saved to '{args.baseline}'.")
+        return
+    if not os.path.exists(args.baseline):
+        print(f"\nNo baseline at '{args.baseline}', run with --save-baseline to create one.")
+        return
+    regressions = compare(results, load_baseline(args.baseline), args.threshold)
+    if not regressions:
+        print(f"\nNo regressions beyond {args.threshold:.0%} of '{args.baseline}'.")
+        return
+    print(f"\n{len(regressions)} regression(s) beyond {args.threshold:.0%}:")
+    for key, old, new in regressions:
+        print(f"  {key:<40} p50 {old:,.1f}us -> {new:,.1f}us ({new / old - 1:+.0%})")
+    sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
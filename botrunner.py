@@ -0,0 +1,318 @@
+"""
+Runs many headless games played by bots, for balance and soak testing.
+
+Each game is a menus.Game played by sending it commands, the same town,
+shop, equip and fight rules as the terminal game. The map runs headless
+through handle_map with a Bot choosing the moves. Games are
+spread over a process pool. Every game gets its own seed (in its stats),
+so any single game can be played again with play_game(seed). Per-game
+stats are merged into one report:
+
+    python botrunner.py --games 2000 --policy cautious --workers 8 --seed 1
+"""
+import argparse
+import contextlib
+import io
+import multiprocessing
+import random
+import time
+from collections import Counter
+import combatsolver
+import gamefunctions
+import menus
+import replay
+import rngs
+from inventory import Inventory
+from simulation import (
+    ACTION_MONSTER_ENCOUNTER, MOVE_UP, MOVE_DOWN, MOVE_LEFT, MOVE_RIGHT, MOVE_WAIT, MOVE_DOCK
+)
+
+DEFAULT_MAX_TURNS = 500
+
+
+class Policy:
+    """How a bot plays. Tuned with a few numbers instead of code."""
+    def __init__(self, name: str, go_home_below: float, shopping: tuple, min_win_odds: float,
+                 wander: float = 0.2):
+        self.name = name
+        # Fraction of max HP at which the bot flies back to the station
+        self.go_home_below = go_home_below
+        # Item ids the bot buys when it can afford them, in order of preference
+        self.shopping = shopping
+        # Fights with lower odds of winning are fled (or EMP'd if it has one)
+        self.min_win_odds = min_win_odds
+        # Chance of a random move instead of a purposeful one
+        self.wander = wander
+
+
+POLICIES = {
+    'aggressive': Policy('aggressive', go_home_below=0.25, shopping=('laser', 'rocket'), min_win_odds=0.0),
+    'cautious': Policy('cautious', go_home_below=0.6, shopping=('shield', 'emp', 'laser', 'rocket'),
+                       min_win_odds=0.75),
+    'random': Policy('random', go_home_below=0.0, shopping=(), min_win_odds=0.0, wander=1.0),
+}
+
+
+def _step_towards(pos: tuple, target: tuple) -> tuple:
+    dx = target[0] - pos[0]
+    dy = target[1] - pos[1]
+    if dx == 0 and dy == 0:
+        return MOVE_WAIT
+    if abs(dx) >= abs(dy):
+        return MOVE_RIGHT if dx > 0 else MOVE_LEFT
+    return MOVE_DOWN if dy > 0 else MOVE_UP
+
+
+class Bot:
+    """Map input source for replay.start(), picks every move by its policy."""
+    # handle_map takes moves from map_event() instead of opening a window
+    headless = True
+
+    def __init__(self, policy: Policy, rng: random.Random, max_turns: int):
+        self.policy = policy
+        self.rng = rng
+        self.max_turns = max_turns
+        self.turns = 0
+        self.map_state = None
+        self.player_hp = 0
+        self.player_max_hp = 1
+
+    def map_event(self):
+        if self.turns >= self.max_turns:
+            return gamefunctions.ACTION_QUIT
+        self.turns += 1
+        return self.next_move()
+
+    def next_move(self):
+        map_state = self.map_state
+        pos = map_state['player_pos']
+        town_pos = map_state['town_pos']
+        if self.rng.random() < self.policy.wander:
+            return self.rng.choice((MOVE_UP, MOVE_DOWN, MOVE_LEFT, MOVE_RIGHT))
+        if self.player_hp < self.policy.go_home_below * self.player_max_hp:
+            # Landing on the station only counts after leaving it, docking works either way
+            return MOVE_DOCK if pos == town_pos else _step_towards(pos, town_pos)
+        monsters = map_state['monsters']
+        if not monsters:
+            return MOVE_WAIT
+        target = min((m.get_pos() for m in monsters),
+                     key=lambda m: max(abs(m[0] - pos[0]), abs(m[1] - pos[1])))
+        return _step_towards(pos, target)
+
+
+def _shopping_list(policy: Policy, gold: int, inventory: Inventory) -> list:
+    """Shop answers (1-based item numbers) for what the bot buys this visit."""
+    answers = []
+    shop_ids = [item['id'] for item in gamefunctions.CATALOG.shop]
+    owned = {item.get('id') for item in inventory.to_list()}
+    for item_id in policy.shopping:
+        if item_id not in shop_ids or item_id in owned:
+            continue
+        price = gamefunctions.CATALOG.item(item_id)['price']
+        # Keep enough for a repair
+        if gold - price < menus.REPAIR_COST:
+            continue
+        gold -= price
+        owned.add(item_id)
+        answers.append(str(shop_ids.index(item_id) + 1))
+    return answers
+
+
+def _equip_answer(inventory: Inventory, equipped_weapon: dict):
+    """Equip menu answer for the strongest working weapon, None if nothing better is owned."""
+    weapons = [item for item in inventory.of_type("weapon") if item.get("currentDurability", 1) > 0]
+    if not weapons:
+        return None
+    best = max(range(len(weapons)), key=lambda i: weapons[i].get('damageBonus', 0))
+    if weapons[best] is equipped_weapon:
+        return None
+    return str(best + 1)
+
+
+class BotGame(menus.Game):
+    """menus.Game that counts won fights in stats. Saving is left as it is, bots never pick it."""
+    def __init__(self, stats: dict):
+        super().__init__(ask_name=False)
+        self.stats = stats
+
+    def fight_over(self, monster, won: bool) -> None:
+        if won:
+            self.stats['wins'] += 1
+        super().fight_over(monster, won)
+
+
+def _visit_town(game: BotGame, policy: Policy) -> None:
+    """Repairs, shops and equips by the policy, then leaves the station."""
+    stats = game.stats
+    player = game.player
+    if player.hp < player.max_hp:
+        old_gold = player.gold
+        game.handle("2")
+        if player.gold < old_gold:
+            stats['repairs'] += 1
+            stats['credits_spent'] += old_gold - player.gold
+    answers = _shopping_list(policy, player.gold, player.inventory)
+    if answers:
+        owned = Counter(item.get('id') for item in player.inventory.to_list())
+        old_gold = player.gold
+        for command in ["3"] + answers + ["0"]:
+            game.handle(command)
+        stats['credits_spent'] += old_gold - player.gold
+        stats['items_bought'] += Counter(item.get('id') for item in player.inventory.to_list()) - owned
+    answer = _equip_answer(player.inventory, player.equipped_weapon)
+    if answer is not None:
+        for command in ("4", answer, "0"):
+            game.handle(command)
+    game.handle("1")
+
+
+def _fight(game: BotGame, policy: Policy) -> None:
+    """Plays the encounter waiting in the map state, fighting or fleeing by the odds at its start."""
+    player = game.player
+    monster = game.map_state['active_encounter']
+    odds = combatsolver.fight_odds(
+        player.hp, monster.health,
+        player.equipped_weapon.get('currentDurability', 0) if player.equipped_weapon else 0,
+        combatsolver.make_matchup(player.power, player.equipped_weapon, player.inventory.total_defense, monster))
+    if odds.win >= policy.min_win_odds:
+        choice = "1"
+    else:
+        choice = "3" if player.inventory.has_id('emp') else "2"
+    old_gold = player.gold
+    game.stats['fights'] += 1
+    game.map_action(ACTION_MONSTER_ENCOUNTER)
+    while game.state == menus.STATE_MENU:
+        game.handle(choice)
+    game.stats['credits_earned'] += max(0, player.gold - old_gold)
+
+
+def play_game(seed: int, policy_name: str = 'cautious', max_turns: int = DEFAULT_MAX_TURNS) -> dict:
+    """Plays one game with a bot. Returns the game's stats."""
+    policy = POLICIES[policy_name]
+    rngs.seed(seed)
+    # The bot's own choices come from a separate stream, so they don't shift the game's
+    bot = Bot(policy, random.Random(f"{seed}:bot"), max_turns)
+    stats = {
+        'seed': seed, 'turns': 0, 'turns_survived': None, 'deaths': 0, 'fights': 0, 'wins': 0,
+        'credits_earned': 0, 'credits_spent': 0, 'repairs': 0, 'items_bought': Counter()
+    }
+    game = BotGame(stats)
+
+    replay.start(bot)
+    try:
+        # The menus print every step, nobody reads it
+        with contextlib.redirect_stdout(io.StringIO()) as out:
+            game.start()
+            # One round is a respawn, or a town visit (if docked) and a map visit
+            while bot.turns < max_turns and not game.done:
+                out.seek(0)
+                out.truncate()
+                if game.state == menus.STATE_DEAD:
+                    stats['deaths'] += 1
+                    if stats['turns_survived'] is None:
+                        stats['turns_survived'] = bot.turns
+                    # Always respawn
+                    game.handle("1")
+                    continue
+
+                if game.state == menus.STATE_TOWN:
+                    _visit_town(game, policy)
+
+                bot.map_state = game.map_state
+                bot.player_hp = game.player.hp
+                bot.player_max_hp = game.player.max_hp
+                action, game.map_state = gamefunctions.handle_map(game.map_state)
+                if action == ACTION_MONSTER_ENCOUNTER:
+                    _fight(game, policy)
+                else:
+                    game.map_action(action)
+    finally:
+        replay.stop()
+
+    stats['turns'] = bot.turns
+    if stats['turns_survived'] is None:
+        stats['turns_survived'] = bot.turns
+    stats['final_gold'] = game.player.gold
+    stats['items_bought'] = dict(stats['items_bought'])
+    return stats
+
+
+def _play(args: tuple) -> dict:
+    return play_game(*args)
+
+
+def game_seeds(games: int, seed: int = None) -> list:
+    """One seed per game, all following from seed (a new one if None)."""
+    rng = random.Random(rngs.new_seed() if seed is None else seed)
+    return [rng.getrandbits(32) for _ in range(games)]
+
+
+def run(games: int, policy: str = 'cautious', workers: int = None, seed: int = None,
+        max_turns: int = DEFAULT_MAX_TURNS) -> list:
+    """Plays games over a pool of workers (in this process if workers is 1). Returns the stats of every game."""
+    jobs = [(game_seed, policy, max_turns) for game_seed in game_seeds(games, seed)]
+    if workers == 1:
+        return [_play(job) for job in jobs]
+    with multiprocessing.Pool(workers) as pool:
+        # Several games per message, so the pool isn't dominated by pickling
+        chunksize = max(1, len(jobs) // ((workers or multiprocessing.cpu_count()) * 8))
+        return list(pool.imap_unordered(_play, jobs, chunksize))
+
+
+def merge(results: list) -> dict:
+    """Sums and averages per-game stats into one summary."""
+    games = len(results)
+    total = Counter()
+    items = Counter()
+    for result in results:
+        for key in ('turns', 'deaths', 'fights', 'wins', 'credits_earned', 'credits_spent', 'repairs'):
+            total[key] += result[key]
+        items.update(result['items_bought'])
+    survived = sorted(result['turns_survived'] for result in results)
+    return {
+        'games': games,
+        'totals': dict(total),
+        'items_bought': dict(items.most_common()),
+        'games_with_a_death': sum(1 for result in results if result['deaths']),
+        'deaths_per_game': total['deaths'] / games if games else 0.0,
+        'win_rate': total['wins'] / total['fights'] if total['fights'] else 0.0,
+        'credits_earned_per_game': total['credits_earned'] / games if games else 0.0,
+        'mean_turns_survived': sum(survived) / games if games else 0.0,
+        'median_turns_survived': survived[games // 2] if games else 0,
+        'mean_final_gold': sum(result['final_gold'] for result in results) / games if games else 0.0,
+    }
+
+
+def print_report(summary: dict, elapsed: float) -> None:
+    games = summary['games']
+    totals = summary['totals']
+    print(f"Games:                 {games:,} in {elapsed:.2f}s ({games / elapsed:,.1f} games/s)")
+    print(f"Map turns:             {totals.get('turns', 0):,}")
+    print(f"Turns survived:        mean {summary['mean_turns_survived']:.1f}, median {summary['median_turns_survived']}")
+    print(f"Deaths:                {totals.get('deaths', 0):,} ({summary['deaths_per_game']:.2f}/game, "
+          f"{summary['games_with_a_death'] / games:.0%} of games)")
+    print(f"Fights:                {totals.get('fights', 0):,}, {summary['win_rate']:.1%} won")
+    print(f"Credits earned:        {totals.get('credits_earned', 0):,} ({summary['credits_earned_per_game']:.1f}/game)")
+    print(f"Credits spent:         {totals.get('credits_spent', 0):,} ({totals.get('repairs', 0):,} repairs)")
+    print(f"Final credits:         mean {summary['mean_final_gold']:.1f}")
+    bought = ", ".join(f"{item_id} {count:,}" for item_id, count in summary['items_bought'].items()) or "nothing"
+    print(f"Items bought:          {bought}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Batch of headless bot games")
+    parser.add_argument('--games', type=int, default=1000)
+    parser.add_argument('--policy', choices=sorted(POLICIES), default='cautious')
+    parser.add_argument('--workers', type=int, default=None, help="processes, defaults to the number of cores")
+    parser.add_argument('--turns', type=int, default=DEFAULT_MAX_TURNS, help="map turns per game")
+    parser.add_argument('--seed', type=int, default=None, help="seed the per-game seeds are drawn from")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    results = run(args.games, args.policy, args.workers, args.seed, args.turns)
+    elapsed = time.perf_counter() - start
+    print_report(merge(results), elapsed)
+
+
+if __name__ == "__main__":
+    main()
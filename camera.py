@@ -0,0 +1,145 @@
+"""
+Camera viewport and lazily generated background for big sectors.
+
+The camera follows the player and only the tiles inside it are drawn.
+The background is made of square chunks that are generated the first
+time something asks for them, so a 1000x1000 sector costs nothing until
+the player gets there.
+"""
+import random
+import rngs
+
+CHUNK_SIZE = 16
+BG_VARIANTS = 4
+
+
+class Camera:
+    def __init__(self, view_width: int, view_height: int, grid_size: int, margin: int = 3):
+        """
+        view_width/view_height are in tiles and get clipped to the grid.
+        The view scrolls once the player gets within margin tiles of its edge.
+        """
+        self.grid_size = grid_size
+        self.view_width = min(view_width, grid_size)
+        self.view_height = min(view_height, grid_size)
+        self.margin = max(0, min(margin, (min(self.view_width, self.view_height) - 1) // 2))
+        self.x = 0
+        self.y = 0
+
+    def _clamp(self, value: int, view: int) -> int:
+        return max(0, min(value, self.grid_size - view))
+
+    def center_on(self, pos: tuple) -> None:
+        """Jumps the view so pos is in the middle."""
+        self.x = self._clamp(pos[0] - self.view_width // 2, self.view_width)
+        self.y = self._clamp(pos[1] - self.view_height // 2, self.view_height)
+
+    def follow(self, pos: tuple) -> bool:
+        """Scrolls just enough to keep pos away from the edges. Returns True if the view moved."""
+        px, py = pos
+        new_x = self.x
+        new_y = self.y
+        if px < self.x + self.margin:
+            new_x = px - self.margin
+        elif px >= self.x + self.view_width - self.margin:
+            new_x = px - self.view_width + self.margin + 1
+        if py < self.y + self.margin:
+            new_y = py - self.margin
+        elif py >= self.y + self.view_height - self.margin:
+            new_y = py - self.view_height + self.margin + 1
+        new_x = self._clamp(new_x, self.view_width)
+        new_y = self._clamp(new_y, self.view_height)
+        moved = (new_x, new_y) != (self.x, self.y)
+        self.x, self.y = new_x, new_y
+        return moved
+
+    def visible(self, pos: tuple) -> bool:
+        return (self.x <= pos[0] < self.x + self.view_width
+                and self.y <= pos[1] < self.y + self.view_height)
+
+    def to_view(self, pos: tuple) -> tuple:
+        """Converts a grid position to a tile position inside the view."""
+        return (pos[0] - self.x, pos[1] - self.y)
+
+    def visible_tiles(self):
+        """Yields every grid position inside the view."""
+        for x in range(self.x, self.x + self.view_width):
+            for y in range(self.y, self.y + self.view_height):
+                yield (x, y)
+
+
+class ChunkedBackground:
+    """
+    Background variant index for every tile, generated one chunk at a time.
+    Chunks are seeded from (seed, chunk position) so they come out the same
+    no matter in which order they are first visited.
+    """
+    def __init__(self, grid_size: int, seed: int = None, chunk_size: int = CHUNK_SIZE):
+        self.grid_size = grid_size
+        self.chunk_size = chunk_size
+        self.seed = rngs.background.getrandbits(32) if seed is None else seed
+        # False once tiles were filled in from elsewhere (from_list), then the seed alone can't rebuild them
+        self.from_seed = True
+        self._chunks = {}
+
+    def chunk(self, cx: int, cy: int) -> bytearray:
+        """Returns the tiles of one chunk, generating it on first use. Indexed [lx * chunk_size + ly]."""
+        key = (cx, cy)
+        tiles = self._chunks.get(key)
+        if tiles is None:
+            rng = random.Random(f"{self.seed}:{cx}:{cy}")
+            size = self.chunk_size
+            tiles = bytearray(rng.randrange(BG_VARIANTS) for _ in range(size * size))
+            self._chunks[key] = tiles
+        return tiles
+
+    def tile(self, x: int, y: int) -> int:
+        size = self.chunk_size
+        return self.chunk(x // size, y // size)[(x % size) * size + y % size]
+
+    def chunks_in_view(self, camera: Camera):
+        """Yields the (cx, cy) of every chunk the camera can see."""
+        size = self.chunk_size
+        for cx in range(camera.x // size, (camera.x + camera.view_width - 1) // size + 1):
+            for cy in range(camera.y // size, (camera.y + camera.view_height - 1) // size + 1):
+                yield (cx, cy)
+
+    @property
+    def generated_chunks(self) -> int:
+        return len(self._chunks)
+
+    @classmethod
+    def from_list(cls, bg_grid: list, chunk_size: int = CHUNK_SIZE):
+        """Builds a background from the old nested list format (bg_grid[x][y])."""
+        background = cls(len(bg_grid), seed=0, chunk_size=chunk_size)
+        background.from_seed = False
+        for x, column in enumerate(bg_grid):
+            for y, variant_index in enumerate(column):
+                cx, lx = divmod(x, chunk_size)
+                cy, ly = divmod(y, chunk_size)
+                tiles = background._chunks.get((cx, cy))
+                if tiles is None:
+                    tiles = background._chunks[(cx, cy)] = bytearray(chunk_size * chunk_size)
+                tiles[lx * chunk_size + ly] = variant_index
+        return background
+
+    def to_dict(self) -> dict:
+        """Everything needed to make the same background again, only for from_seed backgrounds."""
+        return {'grid_size': self.grid_size, 'seed': self.seed, 'chunk_size': self.chunk_size}
+
+    @classmethod
+    def from_dict(cls, data: dict):
+        return cls(data['grid_size'], seed=data['seed'], chunk_size=data.get('chunk_size', CHUNK_SIZE))
+
+    def to_list(self) -> list:
+        """Nested list format (bg_grid[x][y]) used by saves. Generates every chunk."""
+        return [[self.tile(x, y) for y in range(self.grid_size)] for x in range(self.grid_size)]
+
+
+def as_background(bg_grid, grid_size: int) -> ChunkedBackground:
+    """Returns bg_grid as a ChunkedBackground, converting old lists and creating one if missing."""
+    if isinstance(bg_grid, ChunkedBackground):
+        return bg_grid
+    if bg_grid:
+        return ChunkedBackground.from_list(bg_grid)
+    return ChunkedBackground(grid_size)
@@ -0,0 +1,161 @@
+"""
+Game content (monster types, items, shop) loaded from content.json.
+
+The file is read and checked once. Monster types become immutable
+MonsterType records indexed by id and by cumulative spawn weight, items
+become read-only templates indexed by id. New monsters or items only
+need an entry in content.json.
+"""
+import bisect
+import json
+import os
+import rngs
+from collections import namedtuple
+from types import MappingProxyType
+
+CONTENT_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "content.json")
+
+MonsterType = namedtuple('MonsterType', [
+    'id', 'name', 'description', 'health_range', 'power_range', 'money_range', 'color', 'sprite',
+    'crit_chance', 'crit_multiplier', 'miss_chance', 'spawn_weight'
+])
+MONSTER_DEFAULTS = {'crit_chance': 0.05, 'crit_multiplier': 1.5, 'miss_chance': 0.05, 'spawn_weight': 1}
+ITEM_TYPES = ('weapon', 'passive', 'consumable')
+
+
+class ContentError(ValueError):
+    """content.json is missing something or has a bad value."""
+
+
+def _check(condition: bool, message: str) -> None:
+    if not condition:
+        raise ContentError(message)
+
+
+def _range(entry: dict, field: str) -> tuple:
+    value = entry.get(field)
+    _check(isinstance(value, list) and len(value) == 2 and all(isinstance(v, int) for v in value)
+           and value[0] <= value[1], f"monster '{entry.get('id')}': {field} must be [low, high] integers")
+    return tuple(value)
+
+
+def _chance(value, what: str) -> float:
+    _check(isinstance(value, (int, float)) and 0 <= value <= 1, f"{what} must be between 0 and 1")
+    return float(value)
+
+
+def _monster_type(entry: dict) -> MonsterType:
+    _check(isinstance(entry.get('id'), str), "every monster needs a string id")
+    fields = dict(MONSTER_DEFAULTS, **entry)
+    what = f"monster '{entry['id']}'"
+    for field in ('name', 'description', 'sprite'):
+        _check(isinstance(fields.get(field), str), f"{what}: {field} must be a string")
+    color = fields.get('color')
+    _check(isinstance(color, list) and len(color) == 3 and all(isinstance(c, int) and 0 <= c <= 255 for c in color),
+           f"{what}: color must be [r, g, b]")
+    _check(isinstance(fields['crit_multiplier'], (int, float)) and fields['crit_multiplier'] >= 1,
+           f"{what}: crit_multiplier must be at least 1")
+    _check(isinstance(fields['spawn_weight'], (int, float)) and fields['spawn_weight'] >= 0,
+           f"{what}: spawn_weight must not be negative")
+    return MonsterType(
+        id=fields['id'],
+        name=fields['name'],
+        description=fields['description'],
+        health_range=_range(fields, 'health_range'),
+        power_range=_range(fields, 'power_range'),
+        money_range=_range(fields, 'money_range'),
+        color=tuple(color),
+        sprite=fields['sprite'],
+        crit_chance=_chance(fields['crit_chance'], f"{what}: crit_chance"),
+        crit_multiplier=float(fields['crit_multiplier']),
+        miss_chance=_chance(fields['miss_chance'], f"{what}: miss_chance"),
+        spawn_weight=fields['spawn_weight']
+    )
+
+
+def _item_template(entry: dict):
+    _check(isinstance(entry.get('id'), str), "every item needs a string id")
+    what = f"item '{entry['id']}'"
+    _check(isinstance(entry.get('name'), str), f"{what}: name must be a string")
+    _check(entry.get('type') in ITEM_TYPES, f"{what}: type must be one of {', '.join(ITEM_TYPES)}")
+    _check(isinstance(entry.get('price'), int) and entry['price'] > 0, f"{what}: price must be a positive integer")
+    for field in ('crit_chance', 'miss_chance'):
+        if field in entry:
+            _chance(entry[field], f"{what}: {field}")
+    if entry['type'] == 'weapon':
+        for field in ('maxDurability', 'currentDurability', 'damageBonus'):
+            _check(isinstance(entry.get(field), int), f"{what}: weapons need an integer {field}")
+    for value in entry.values():
+        # Templates are shared, nested lists or dicts could be changed through a copy
+        _check(not isinstance(value, (list, dict)), f"{what}: values must be plain numbers, strings or booleans")
+    return MappingProxyType(dict(entry))
+
+
+class Catalog:
+    def __init__(self, content: dict):
+        _check(isinstance(content, dict), "content must be a JSON object")
+        monsters = tuple(_monster_type(entry) for entry in content.get('monsters', []))
+        _check(monsters, "content needs at least one monster")
+        items = tuple(_item_template(entry) for entry in content.get('items', []))
+
+        self.monsters = monsters
+        self.monsters_by_id = MappingProxyType({m.id: m for m in monsters})
+        _check(len(self.monsters_by_id) == len(monsters), "monster ids must be unique")
+        self.items = items
+        self.items_by_id = MappingProxyType({item['id']: item for item in items})
+        _check(len(self.items_by_id) == len(items), "item ids must be unique")
+
+        shop = content.get('shop', [item['id'] for item in items])
+        for item_id in shop:
+            _check(item_id in self.items_by_id, f"shop lists unknown item '{item_id}'")
+        self.shop = tuple(self.items_by_id[item_id] for item_id in shop)
+
+        # Running total of spawn weights, a roll in [0, total) is bisected into it
+        cumulative = []
+        total = 0
+        for m in monsters:
+            total += m.spawn_weight
+            cumulative.append(total)
+        _check(total > 0, "at least one monster needs a spawn_weight above 0")
+        self._spawn_cumulative = tuple(cumulative)
+        self._spawn_total = total
+
+    def random_monster_type(self, rng=rngs.spawn) -> MonsterType:
+        """Picks a monster type, weighted by spawn_weight."""
+        roll = rng.random() * self._spawn_total
+        return self.monsters[bisect.bisect_right(self._spawn_cumulative, roll)]
+
+    def monster_type(self, monster_id: str) -> MonsterType:
+        return self.monsters_by_id[monster_id]
+
+    def item(self, item_id: str):
+        """Read-only template of an item, use new_item for one the player can own."""
+        return self.items_by_id[item_id]
+
+    def new_item(self, item_id: str) -> dict:
+        """A fresh, changeable copy of an item template."""
+        return dict(self.items_by_id[item_id])
+
+
+def load(filename: str = CONTENT_FILE) -> Catalog:
+    """Reads and checks a content file. Raises ContentError if something is wrong."""
+    try:
+        with open(filename, 'r') as f:
+            content = json.load(f)
+    except json.JSONDecodeError as e:
+        raise ContentError(f"'{filename}' is not valid JSON: {e}") from e
+    try:
+        return Catalog(content)
+    except ContentError as e:
+        raise ContentError(f"'{filename}': {e}") from e
+
+
+_default = None
+
+
+def get() -> Catalog:
+    """The game's catalog, loaded from CONTENT_FILE the first time it is needed."""
+    global _default
+    if _default is None:
+        _default = load()
+    return _default
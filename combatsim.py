@@ -0,0 +1,138 @@
+"""
+Monte Carlo combat simulator for balance sweeps.
+
+Plays many fights at once with NumPy arrays, following the same
+hit/miss/crit/shield/durability rules as handle_fight_turn, with the
+player choosing "Fight" every round. Run it directly for a report of
+every (weapon, shield, monster type) combination:
+
+    python combatsim.py --fights 1000000 --seed 1
+"""
+import argparse
+import time
+import numpy as np
+import catalog
+
+# Stats used by handle_fight_turn when nothing (working) is equipped
+UNARMED = {'name': 'Unarmed', 'damageBonus': 0, 'crit_chance': 0.05,
+           'crit_multiplier': 1.5, 'miss_chance': 0.05, 'maxDurability': 0}
+MAX_TURNS = 500
+
+
+def simulate_fights(
+    fights: int,
+    player_hp: int,
+    player_power: int,
+    weapon: dict,
+    total_defense: int,
+    monster_type: catalog.MonsterType,
+    rng
+) -> dict:
+    """
+    Plays fights until one side drops to 0 HP (or MAX_TURNS pass).
+    Monster health and power are rolled per fight from the type's ranges.
+    Returns the summary stats for the matchup.
+    """
+    weapon = weapon or UNARMED
+    w_bonus = weapon.get('damageBonus', 0)
+    w_crit = weapon.get('crit_chance', 0.05)
+    w_mult = weapon.get('crit_multiplier', 1.5)
+    w_miss = weapon.get('miss_chance', 0.05)
+    start_durability = weapon.get('maxDurability', 0)
+    m_crit = monster_type.crit_chance
+    m_mult = monster_type.crit_multiplier
+    m_miss = monster_type.miss_chance
+
+    p_hp = np.full(fights, player_hp, dtype=np.int64)
+    m_hp = rng.integers(monster_type.health_range[0], monster_type.health_range[1] + 1, fights)
+    m_power = rng.integers(monster_type.power_range[0], monster_type.power_range[1] + 1, fights)
+    durability = np.full(fights, start_durability, dtype=np.int64)
+    turns = np.zeros(fights, dtype=np.int64)
+
+    # Only fights that are still going are simulated each round
+    active = np.arange(fights)
+    for _ in range(MAX_TURNS):
+        if active.size == 0:
+            break
+        n = active.size
+        dur = durability[active]
+        armed = dur > 0
+        durability[active] = dur - armed
+
+        # Player attack
+        base = player_power + np.where(armed, w_bonus, 0)
+        missed = rng.random(n) < np.where(armed, w_miss, UNARMED['miss_chance'])
+        crit = ~missed & (rng.random(n) < np.where(armed, w_crit, UNARMED['crit_chance']))
+        crit_damage = (base * np.where(armed, w_mult, UNARMED['crit_multiplier'])).astype(np.int64)
+        damage = np.where(missed, 0, np.where(crit, crit_damage, base))
+        monster_hp = m_hp[active] - damage
+        m_hp[active] = monster_hp
+
+        # Monster attack, only if it survived
+        power = m_power[active]
+        m_missed = rng.random(n) < m_miss
+        m_crits = ~m_missed & (rng.random(n) < m_crit)
+        m_damage = np.where(m_missed, 0, np.where(m_crits, (power * m_mult).astype(np.int64), power))
+        m_damage = np.maximum(0, m_damage - total_defense)
+        hp = p_hp[active] - np.where(monster_hp > 0, m_damage, 0)
+        p_hp[active] = hp
+
+        turns[active] += 1
+        active = active[(hp > 0) & (monster_hp > 0)]
+
+    won = m_hp <= 0
+    return {
+        'fights': fights,
+        'win_rate': float(won.mean()),
+        'mean_turns': float(turns.mean()),
+        'mean_turns_to_kill': float(turns[won].mean()) if won.any() else float('nan'),
+        'mean_hp_lost': float((player_hp - np.maximum(p_hp, 0)).mean()),
+        'mean_charge_used': float((start_durability - durability).mean()),
+        'unfinished': int(((p_hp > 0) & (m_hp > 0)).sum())
+    }
+
+
+def sweep(fights: int, player_hp: int = 50, player_power: int = 5, seed: int = None) -> list:
+    """Runs every (weapon, shield, monster type) combination. Returns one row per combination."""
+    rng = np.random.default_rng(seed)
+    content = catalog.get()
+    weapons = [None] + [item for item in content.items if item.get('type') == 'weapon']
+    shield = sum(item.get('defense_bonus', 0) for item in content.items if item.get('type') == 'passive')
+    rows = []
+    for weapon in weapons:
+        for defense in (0, shield):
+            for monster_type in content.monsters:
+                stats = simulate_fights(fights, player_hp, player_power, weapon, defense, monster_type, rng)
+                stats['weapon'] = (weapon or UNARMED)['name']
+                stats['shield'] = defense > 0
+                stats['monster'] = monster_type.name
+                rows.append(stats)
+    return rows
+
+
+def print_report(rows: list) -> None:
+    print(f"{'Weapon':<16} {'Shield':<7} {'Monster':<13} {'Win %':>7} {'Turns':>6} {'To kill':>8} {'HP lost':>8} {'Charge':>7}")
+    print("-" * 78)
+    for row in rows:
+        print(f"{row['weapon']:<16} {'yes' if row['shield'] else 'no':<7} {row['monster']:<13} "
+              f"{row['win_rate'] * 100:>6.1f}% {row['mean_turns']:>6.2f} {row['mean_turns_to_kill']:>8.2f} "
+              f"{row['mean_hp_lost']:>8.2f} {row['mean_charge_used']:>7.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Monte Carlo combat balance sweep")
+    parser.add_argument('--fights', type=int, default=100000, help="fights per combination")
+    parser.add_argument('--hp', type=int, default=50, help="player starting HP")
+    parser.add_argument('--power', type=int, default=5, help="player power")
+    parser.add_argument('--seed', type=int, default=None)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    rows = sweep(args.fights, args.hp, args.power, args.seed)
+    elapsed = time.perf_counter() - start
+    print_report(rows)
+    print(f"\n{len(rows) * args.fights:,} fights in {elapsed:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
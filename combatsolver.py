@@ -0,0 +1,229 @@
+"""
+Exact combat odds.
+
+A fight under the handle_fight_turn rules is a small Markov chain over
+(player_hp, monster_hp, weapon durability). fight_odds works out the
+exact chance of winning, losing or fleeing by dynamic programming over
+that chain, walked with an explicit stack so long fights don't run into
+the recursion limit. Results are memoized on the state, so later rounds
+of the same fight and other fights with the same matchup reuse earlier work.
+"""
+from collections import OrderedDict, namedtuple
+
+# handle_fight: flee_chance = random.randrange(0, 100, 1), success if <= 80
+FLEE_SUCCESS_CHANCE = 81 / 100
+# handle_fight_turn: stats used when no working weapon is equipped
+UNARMED_CRIT_CHANCE = 0.05
+UNARMED_CRIT_MULTIPLIER = 1.5
+UNARMED_MISS_CHANCE = 0.05
+# Solved states kept, whole matchups are dropped (least recently used first) past this
+CACHE_SIZE = 2 ** 18
+
+Matchup = namedtuple('Matchup', [
+    'player_power', 'weapon_bonus', 'weapon_crit_chance', 'weapon_crit_multiplier', 'weapon_miss_chance',
+    'total_defense', 'monster_power', 'monster_crit_chance', 'monster_crit_multiplier', 'monster_miss_chance',
+    'flee_below'
+])
+FightOdds = namedtuple('FightOdds', ['win', 'lose', 'flee'])
+
+# matchup -> {(player_hp, monster_hp, durability): (win, lose, flee)}, least recently used first
+_odds_cache = OrderedDict()
+_cache_stats = {'hits': 0, 'misses': 0}
+
+
+def make_matchup(player_power: int, equipped_weapon: dict, total_defense: int, monster, flee_below: int = 0) -> Matchup:
+    """
+    Builds the fixed part of a fight.
+    The player tries to run whenever their HP is at or below flee_below.
+    """
+    weapon = equipped_weapon or {}
+    return Matchup(
+        player_power=player_power,
+        weapon_bonus=weapon.get('damageBonus', 0),
+        weapon_crit_chance=weapon.get('crit_chance', 0.05),
+        weapon_crit_multiplier=weapon.get('crit_multiplier', 1.5),
+        weapon_miss_chance=weapon.get('miss_chance', 0.05),
+        total_defense=total_defense,
+        monster_power=monster.power,
+        monster_crit_chance=getattr(monster, 'crit_chance', 0.05),
+        monster_crit_multiplier=getattr(monster, 'crit_multiplier', 1.5),
+        monster_miss_chance=getattr(monster, 'miss_chance', 0.05),
+        flee_below=flee_below
+    )
+
+
+def _attack_outcomes(power: int, miss_chance: float, crit_chance: float, crit_multiplier: float) -> tuple:
+    """(probability, damage) pairs for one attack roll."""
+    return (
+        (miss_chance, 0),
+        ((1 - miss_chance) * crit_chance, int(power * crit_multiplier)),
+        ((1 - miss_chance) * (1 - crit_chance), power)
+    )
+
+
+def _rolls(matchup: Matchup) -> tuple:
+    """
+    The (probability, damage) pairs of the armed player, the unarmed player and the
+    monster, the monster's damage already after shields. Chances of 0 are left out.
+    """
+    armed = _attack_outcomes(matchup.player_power + matchup.weapon_bonus, matchup.weapon_miss_chance,
+                             matchup.weapon_crit_chance, matchup.weapon_crit_multiplier)
+    unarmed = _attack_outcomes(matchup.player_power, UNARMED_MISS_CHANCE, UNARMED_CRIT_CHANCE,
+                               UNARMED_CRIT_MULTIPLIER)
+    monster = tuple((chance, max(0, damage - matchup.total_defense) if damage > 0 else 0)
+                    for chance, damage in _attack_outcomes(matchup.monster_power, matchup.monster_miss_chance,
+                                                           matchup.monster_crit_chance,
+                                                           matchup.monster_crit_multiplier))
+    return tuple(tuple(roll for roll in rolls if roll[0] != 0) for rolls in (armed, unarmed, monster))
+
+
+def _transitions(matchup: Matchup, rolls: tuple, player_hp: int, monster_hp: int, durability: int) -> tuple:
+    """
+    One round from this state: (win, lose, flee, stay, moves) where the first four
+    are chances of ending the fight or changing nothing this round and moves is a
+    list of (chance, (player_hp, monster_hp, durability)) for the states it can go on in.
+    Every move lowers at least one of the three and raises none.
+    """
+    win = lose = flee = stay = 0.0
+    moves = []
+
+    if player_hp <= matchup.flee_below:
+        # Run: a failed attempt costs the full monster power, shields do not help
+        flee = FLEE_SUCCESS_CHANCE
+        fail = 1 - FLEE_SUCCESS_CHANCE
+        next_hp = player_hp - matchup.monster_power
+        if next_hp <= 0:
+            lose += fail
+        elif next_hp == player_hp:
+            stay += fail
+        else:
+            moves.append((fail, (next_hp, monster_hp, durability)))
+        return win, lose, flee, stay, moves
+
+    armed_rolls, unarmed_rolls, monster_rolls = rolls
+    if durability > 0:
+        player_rolls = armed_rolls
+        next_durability = durability - 1
+    else:
+        player_rolls = unarmed_rolls
+        next_durability = durability
+
+    for p_chance, damage in player_rolls:
+        next_monster_hp = monster_hp - damage
+        if next_monster_hp <= 0:
+            win += p_chance
+            continue
+        for m_chance, monster_damage in monster_rolls:
+            chance = p_chance * m_chance
+            next_hp = player_hp - monster_damage
+            if next_hp <= 0:
+                lose += chance
+            elif (next_hp, next_monster_hp, next_durability) == (player_hp, monster_hp, durability):
+                stay += chance
+            else:
+                moves.append((chance, (next_hp, next_monster_hp, next_durability)))
+    return win, lose, flee, stay, moves
+
+
+def _cached_states() -> int:
+    return sum(len(solved) for solved in _odds_cache.values())
+
+
+def _states(matchup: Matchup) -> dict:
+    """The solved states of matchup, making room for them first."""
+    solved = _odds_cache.get(matchup)
+    if solved is None:
+        solved = _odds_cache[matchup] = {}
+    _odds_cache.move_to_end(matchup)
+    while len(_odds_cache) > 1 and _cached_states() > CACHE_SIZE:
+        _odds_cache.popitem(last=False)
+    return solved
+
+
+def _solve(matchup: Matchup, player_hp: int, monster_hp: int, durability: int) -> tuple:
+    """
+    (win, lose, flee) probabilities from this state, before the player acts.
+    Depth first with a stack of its own, a fight can run for thousands of rounds.
+    """
+    solved = _states(matchup)
+    root = (player_hp, monster_hp, durability)
+    odds = solved.get(root)
+    if odds is not None:
+        _cache_stats['hits'] += 1
+        return odds
+    rolls = _rolls(matchup)
+    hits = 0
+    misses = 1
+    # Each frame: [state, win, lose, flee, stay, moves, index of the next move to add in]
+    stack = [[root, *_transitions(matchup, rolls, *root), 0]]
+    while True:
+        frame = stack[-1]
+        moves = frame[5]
+        index = frame[6]
+        # Moves already solved are added straight in, the first unsolved one gets a frame of its own
+        while index < len(moves):
+            chance, next_state = moves[index]
+            odds = solved.get(next_state)
+            if odds is None:
+                break
+            hits += 1
+            frame[1] += chance * odds[0]
+            frame[2] += chance * odds[1]
+            frame[3] += chance * odds[2]
+            index += 1
+        frame[6] = index
+        if index < len(moves):
+            misses += 1
+            stack.append([next_state, *_transitions(matchup, rolls, *next_state), 0])
+            continue
+
+        state, win, lose, flee, stay = frame[:5]
+        if stay >= 1:
+            # Nobody can ever hurt anybody
+            odds = (0.0, 0.0, 0.0)
+        else:
+            scale = 1 / (1 - stay)
+            odds = (win * scale, lose * scale, flee * scale)
+        solved[state] = odds
+        stack.pop()
+        if not stack:
+            _cache_stats['hits'] += hits
+            _cache_stats['misses'] += misses
+            return odds
+        # Handed to the frame waiting on it
+        parent = stack[-1]
+        chance = parent[5][parent[6]][0]
+        parent[1] += chance * odds[0]
+        parent[2] += chance * odds[1]
+        parent[3] += chance * odds[2]
+        parent[6] += 1
+
+
+def fight_odds(player_hp: int, monster_hp: int, durability: int, matchup: Matchup) -> FightOdds:
+    """
+    Exact odds of how the fight ends from here. They add up to 1 unless it can never end.
+    Any HP works, but the work and the cache grow with player_hp * monster_hp / damage per hit:
+    game fights take milliseconds, 3000 HP against 3000 HP about a minute and 3 million states.
+    """
+    if monster_hp <= 0:
+        return FightOdds(1.0, 0.0, 0.0)
+    if player_hp <= 0:
+        return FightOdds(0.0, 1.0, 0.0)
+    return FightOdds(*_solve(matchup, player_hp, monster_hp, max(0, durability)))
+
+
+def cache_stats() -> dict:
+    """Hit/miss counts of the state cache."""
+    lookups = _cache_stats['hits'] + _cache_stats['misses']
+    return {
+        'hits': _cache_stats['hits'],
+        'misses': _cache_stats['misses'],
+        'hit_rate': _cache_stats['hits'] / lookups if lookups else 0.0,
+        'states': _cached_states()
+    }
+
+
+def clear_cache() -> None:
+    _odds_cache.clear()
+    _cache_stats['hits'] = 0
+    _cache_stats['misses'] = 0
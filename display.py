@@ -0,0 +1,90 @@
+"""
+Long-lived display session for the map screen.
+
+The window, renderer, clock and map sprites are created the first time
+the map opens and kept until the game exits, so going back to the map
+after a town visit or a fight does not re-initialize SDL.
+Creating a session is free, pygame is only imported by open().
+"""
+import sys
+import sprites
+
+
+class DisplaySession:
+    def __init__(self, width: int, height: int, tile_size: int, caption: str = "Space"):
+        self.width = width
+        self.height = height
+        self.tile_size = tile_size
+        self.caption = caption
+        self.screen = None
+        self.renderer = None
+        self.clock = None
+        self.bg_variants = []
+        self.player_sprite = None
+        self.town_sprite = None
+
+    @property
+    def is_open(self) -> bool:
+        return self.screen is not None
+
+    def open(self) -> bool:
+        """
+        Opens the window and loads map assets if that has not happened yet.
+        Returns False if pygame could not be started.
+        """
+        if self.is_open:
+            # Coming back from the menus, the old frame may be stale
+            self.renderer.redraw_all()
+            return True
+
+        try:
+            import pygame
+            from renderer import MapRenderer
+        except ImportError as e:
+            print(f"Pygame is not available: {e}")
+            return False
+        try:
+            if not pygame.get_init():
+                pygame.init()
+            self.screen = pygame.display.set_mode((self.width, self.height))
+        except pygame.error as e:
+            print(f"Pygame initialization failed: {e}")
+            return False
+        pygame.display.set_caption(self.caption)
+        self._force_focus()
+
+        #Map background
+        for angle in [0, 90, 180, 270]:
+            variant = sprites.get_sprite("Background.png", (self.tile_size, self.tile_size), angle)
+            if variant is None:
+                print("Warning: 'Background.png' not found. Defaulting to black.")
+                self.bg_variants = []
+                break
+            self.bg_variants.append(variant)
+        self.player_sprite = sprites.get_sprite("Player.png", (self.tile_size, self.tile_size))
+        self.town_sprite = sprites.get_sprite("SpaceStation.png", (self.tile_size, self.tile_size))
+
+        self.renderer = MapRenderer(self.screen, self.tile_size)
+        self.clock = pygame.time.Clock()
+        return True
+
+    def _force_focus(self) -> None:
+        """Fix the annoying thing where the window for pygame is in the background"""
+        try:
+            if sys.platform.startswith('win'):
+                import ctypes
+                import pygame
+                hwnd = pygame.display.get_wm_info()['window']
+                ctypes.windll.user32.SetForegroundWindow(hwnd)
+        except Exception as e:
+            print(f"Note: Could not force window focus: {e}")
+
+    def close(self) -> None:
+        """Closes the window and shuts pygame down. Only call this at exit."""
+        if self.is_open:
+            import pygame
+            pygame.quit()
+        self.screen = None
+        self.renderer = None
+        self.clock = None
+        self.bg_variants = []
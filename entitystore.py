@@ -0,0 +1,356 @@
+"""
+Optional struct-of-arrays storage for large numbers of entities.
+
+Positions, velocities and stats live in NumPy columns, one row per
+entity, and movement is done for every row at once. The per-entity
+rules are the same as Asteroid.move and WanderingMonster.move.
+AsteroidRow and MonsterRow are thin views over one row that behave like
+the normal classes, so saving, loading and drawing keep working.
+
+NumPy is optional, check HAS_NUMPY before creating a store.
+"""
+import asteroid
+import wanderingMonster
+
+try:
+    import numpy as np
+    HAS_NUMPY = True
+except ImportError:
+    np = None
+    HAS_NUMPY = False
+
+# Same directions as WanderingMonster.move
+MONSTER_DIRECTIONS = ((0, -1), (0, 1), (-1, 0), (1, 0), (1, 1), (1, -1), (-1, 1), (-1, -1))
+
+
+class EntityStore:
+    """Rows of NumPy columns with a free list, grown by doubling."""
+    COLUMNS = ()
+
+    def __init__(self, grid_size: int, capacity: int = 64, rng=None):
+        if not HAS_NUMPY:
+            raise RuntimeError("EntityStore needs NumPy, which is not installed.")
+        self.grid_size = grid_size
+        self.rng = rng if rng is not None else np.random.default_rng()
+        self.size = 0
+        self.alive = np.zeros(capacity, dtype=bool)
+        for name in self.COLUMNS:
+            setattr(self, name, np.zeros(capacity, dtype=np.int64))
+        self.views = [None] * capacity
+        self._free = []
+
+    def __len__(self) -> int:
+        return int(self.alive[:self.size].sum())
+
+    def _grow(self) -> None:
+        capacity = len(self.alive) * 2
+        self.alive = np.resize(self.alive, capacity)
+        self.alive[self.size:] = False
+        for name in self.COLUMNS:
+            setattr(self, name, np.resize(getattr(self, name), capacity))
+        self.views.extend([None] * (capacity - len(self.views)))
+
+    def add_row(self, **values) -> int:
+        """Adds a row, reusing freed rows first. Returns the row index."""
+        if self._free:
+            row = self._free.pop()
+        else:
+            if self.size == len(self.alive):
+                self._grow()
+            row = self.size
+            self.size += 1
+        for name in self.COLUMNS:
+            getattr(self, name)[row] = values.get(name, 0)
+        self.alive[row] = True
+        return row
+
+    def free_row(self, row: int) -> None:
+        if self.alive[row]:
+            self.alive[row] = False
+            self.views[row] = None
+            self._free.append(row)
+
+    def live_rows(self):
+        """Indexes of every live row in row order."""
+        return np.flatnonzero(self.alive[:self.size])
+
+    def _keys(self, x, y):
+        """Flattens grid positions into single ints for fast lookups. Off-grid cells become -1."""
+        return np.where(self._in_bounds(x, y), x * self.grid_size + y, -1)
+
+    def _in_bounds(self, x, y):
+        return (x >= 0) & (x < self.grid_size) & (y >= 0) & (y < self.grid_size)
+
+
+def _count_in(sorted_keys, counts, query):
+    """How many times each query key appears, given np.unique(..., return_counts=True) output."""
+    if sorted_keys.size == 0:
+        return np.zeros(query.shape, dtype=np.int64)
+    index = np.searchsorted(sorted_keys, query)
+    index = np.minimum(index, sorted_keys.size - 1)
+    return np.where(sorted_keys[index] == query, counts[index], 0)
+
+
+class AsteroidStore(EntityStore):
+    COLUMNS = ('x', 'y', 'dx', 'dy')
+
+    def adopt(self, ast) -> "AsteroidRow":
+        """Copies an asteroid (object or view) into a new row and returns its view."""
+        row = self.add_row(x=ast.x, y=ast.y, dx=ast.dx, dy=ast.dy)
+        view = AsteroidRow(self, row)
+        self.views[row] = view
+        return view
+
+    def move_all(self, blocker_x, blocker_y):
+        """
+        Moves every asteroid once, in row order, exactly like calling
+        Asteroid.move on each one with the cells of the other asteroids
+        (already moved ones at their new cell) plus the blockers as
+        avoid_locations.
+        blocker_x/blocker_y are arrays of other blocked cells (monsters, player, station).
+        Returns (moved_rows, old_x, old_y, out_of_bounds_rows). The caller
+        frees the out of bounds rows once it is done with their views.
+        """
+        rows = self.live_rows()
+        x, y = self.x[rows], self.y[rows]
+        dx, dy = self.dx[rows], self.dy[rows]
+        n = rows.size
+        static_keys, static_counts = np.unique(self._keys(np.asarray(blocker_x), np.asarray(blocker_y)), return_counts=True)
+        old_keys, old_counts = np.unique(self._keys(x, y), return_counts=True)
+        # Random bounce directions, used only by rows that need one
+        sign_x = self.rng.choice((-1, 1), n)
+        sign_y = self.rng.choice((-1, 1), n)
+
+        def static_blocked(cx, cy):
+            inside = self._in_bounds(cx, cy)
+            not_self = (cx != x) | (cy != y)
+            return inside & not_self & (_count_in(static_keys, static_counts, self._keys(cx, cy)) > 0)
+
+        # Vectorized pass, pretending no other asteroid is in the way
+        next_x, next_y = x + dx, y + dy
+        blocked = static_blocked(next_x, next_y)
+        hit_x_wall = blocked & static_blocked(x + dx, y)
+        hit_y_wall = blocked & static_blocked(x, y + dy)
+        corner = blocked & ~hit_x_wall & ~hit_y_wall
+        new_dx = np.where(hit_x_wall, -dx, dx)
+        new_dy = np.where(hit_x_wall & (dy == 0), sign_y, dy)
+        new_dy = np.where(hit_y_wall, -new_dy, new_dy)
+        new_dx = np.where(hit_y_wall & (new_dx == 0), sign_x, new_dx)
+        new_dx = np.where(corner, -dx, new_dx)
+        new_dy = np.where(corner, -dy, new_dy)
+        target_x = np.where(corner, x - dx, next_x)
+        target_y = np.where(corner, y - dy, next_y)
+        stays = static_blocked(target_x, target_y)
+        final_x = np.where(stays, x, target_x)
+        final_y = np.where(stays, y, target_y)
+
+        # Rows whose cells touch another asteroid (old or new cell) depend on move order
+        checked_cells = ((next_x, next_y), (x + dx, y), (x, y + dy), (x - dx, y - dy))
+
+        def touches(other_keys, other_counts, own_x, own_y):
+            hit = np.zeros(n, dtype=bool)
+            for cx, cy in checked_cells:
+                others = _count_in(other_keys, other_counts, self._keys(cx, cy)) - ((cx == own_x) & (cy == own_y))
+                hit |= self._in_bounds(cx, cy) & (others > 0)
+            return hit
+
+        new_keys, new_counts = np.unique(self._keys(final_x, final_y), return_counts=True)
+        dependent = touches(old_keys, old_counts, x, y) | touches(new_keys, new_counts, final_x, final_y)
+        while dependent.any():
+            resolved = self._move_in_order(np.flatnonzero(dependent), x, y, dx, dy, final_x, final_y,
+                                           static_keys, static_counts, sign_x, sign_y)
+            for i, (fx, fy, fdx, fdy) in resolved.items():
+                final_x[i], final_y[i], new_dx[i], new_dy[i] = fx, fy, fdx, fdy
+            # A re-resolved row may now land next to a row we thought was independent
+            dep_keys, dep_counts = np.unique(self._keys(final_x[dependent], final_y[dependent]), return_counts=True)
+            nowhere = np.full(n, -1)
+            more = ~dependent & touches(dep_keys, dep_counts, nowhere, nowhere)
+            if not more.any():
+                break
+            dependent |= more
+
+        self.x[rows], self.y[rows] = final_x, final_y
+        self.dx[rows], self.dy[rows] = new_dx, new_dy
+        moved = (final_x != x) | (final_y != y)
+        return rows[moved], x[moved], y[moved], rows[~self._in_bounds(final_x, final_y)]
+
+    def _move_in_order(self, order, x, y, dx, dy, final_x, final_y, static_keys, static_counts, sign_x, sign_y):
+        """Runs the Asteroid.move rules one row at a time for the rows in order."""
+        grid_size = self.grid_size
+        old_keys = self._keys(x, y)
+        new_keys = self._keys(final_x, final_y)
+        in_order = set(int(i) for i in order)
+        old_sort = np.argsort(old_keys, kind='stable')
+        new_sort = np.argsort(new_keys, kind='stable')
+        resolved = {}
+        resolved_cells = {}
+
+        def rows_on(key, keys, sort):
+            return sort[np.searchsorted(keys[sort], key, 'left'):np.searchsorted(keys[sort], key, 'right')]
+
+        def is_blocked(i, cx, cy):
+            if not (0 <= cx < grid_size and 0 <= cy < grid_size) or (cx, cy) == (x[i], y[i]):
+                return False
+            key = cx * grid_size + cy
+            if _count_in(static_keys, static_counts, np.array([key]))[0] > 0:
+                return True
+            # Earlier rows are at their new cell, later rows still at their old one
+            if any(j > i for j in rows_on(key, old_keys, old_sort)):
+                return True
+            if any(j < i and j not in in_order for j in rows_on(key, new_keys, new_sort)):
+                return True
+            return any(j < i for j in resolved_cells.get((cx, cy), ()))
+
+        for i in order:
+            ax, ay, adx, ady = int(x[i]), int(y[i]), int(dx[i]), int(dy[i])
+            next_x, next_y = ax + adx, ay + ady
+            if is_blocked(i, next_x, next_y):
+                hit_x_wall = is_blocked(i, ax + adx, ay)
+                hit_y_wall = is_blocked(i, ax, ay + ady)
+                if hit_x_wall:
+                    adx *= -1
+                    if ady == 0:
+                        ady = int(sign_y[i])
+                if hit_y_wall:
+                    ady *= -1
+                    if adx == 0:
+                        adx = int(sign_x[i])
+                #Corner Bounce
+                if not hit_x_wall and not hit_y_wall:
+                    adx *= -1
+                    ady *= -1
+                    next_x, next_y = ax + adx, ay + ady
+            if not is_blocked(i, next_x, next_y):
+                ax, ay = next_x, next_y
+            resolved[i] = (ax, ay, adx, ady)
+            resolved_cells.setdefault((ax, ay), []).append(i)
+        return resolved
+
+
+class MonsterStore(EntityStore):
+    COLUMNS = ('x', 'y', 'health', 'max_health', 'power', 'money', 'type_id')
+
+    def __init__(self, grid_size: int, capacity: int = 64, rng=None):
+        super().__init__(grid_size, capacity, rng)
+        # Shared MonsterKind records, rows only keep a type_id
+        self.types = []
+        self._type_ids = {}
+        self._directions = np.array(MONSTER_DIRECTIONS, dtype=np.int64)
+
+    def intern_type(self, monster) -> int:
+        """Returns the id of this monster's kind in self.types, adding it if new."""
+        kind = monster.kind
+        type_id = self._type_ids.get(kind)
+        if type_id is None:
+            type_id = len(self.types)
+            self.types.append(kind)
+            self._type_ids[kind] = type_id
+        return type_id
+
+    def adopt(self, monster) -> "MonsterRow":
+        """Copies a monster (object or view) into a new row and returns its view."""
+        row = self.add_row(x=monster.x, y=monster.y, health=monster.health,
+                           max_health=monster.max_health, power=monster.power,
+                           money=monster.money, type_id=self.intern_type(monster))
+        view = MonsterRow(self, row)
+        self.views[row] = view
+        return view
+
+    def move_all(self, town_pos: tuple, turn_count: int, stop_at: tuple = None, flow_field=None):
+        """
+        Moves every monster once in row order, like WanderingMonster.move.
+        Monsters the flow_field reaches hunt, the same way as in WanderingMonster.move.
+        If a monster lands on stop_at the rows after it do not move.
+        Returns (moved_rows, old_x, old_y, encounter_row or None).
+        """
+        empty = np.zeros(0, dtype=np.int64)
+        if turn_count % 2 == 0:
+            return empty, empty, empty, None
+        rows = self.live_rows()
+        n = rows.size
+        x, y = self.x[rows], self.y[rows]
+        distance = np.where(self.rng.random(n) < 0.25, 2, 1)
+        # A random order of the eight directions for every monster
+        order = np.argsort(self.rng.random((n, len(MONSTER_DIRECTIONS))), axis=1)
+        steps = self._directions[order]
+        cand_x = x[:, None] + steps[:, :, 0] * distance[:, None]
+        cand_y = y[:, None] + steps[:, :, 1] * distance[:, None]
+        valid = self._in_bounds(cand_x, cand_y) & ~((cand_x == town_pos[0]) & (cand_y == town_pos[1]))
+        pick = valid.argmax(axis=1)
+        can_move = valid[np.arange(n), pick]
+        if flow_field is not None and flow_field.target is not None:
+            here = self._flow_distance(flow_field, x, y)
+            there = self._flow_distance(flow_field, cand_x, cand_y)
+            # Closest direction that gets nearer, first one in the shuffled order on ties
+            closer = valid & (there >= 0) & (there < here[:, None])
+            best = np.where(closer, there, np.iinfo(np.int64).max).argmin(axis=1)
+            hunting = here >= 0
+            pick = np.where(hunting, best, pick)
+            can_move = np.where(hunting, closer[np.arange(n), best], can_move)
+        new_x = np.where(can_move, cand_x[np.arange(n), pick], x)
+        new_y = np.where(can_move, cand_y[np.arange(n), pick], y)
+
+        encounter_row = None
+        if stop_at is not None:
+            hits = np.flatnonzero((new_x == stop_at[0]) & (new_y == stop_at[1]))
+            if hits.size:
+                cut = hits[0] + 1
+                rows, x, y, new_x, new_y = rows[:cut], x[:cut], y[:cut], new_x[:cut], new_y[:cut]
+                encounter_row = int(rows[-1])
+
+        self.x[rows], self.y[rows] = new_x, new_y
+        moved = (new_x != x) | (new_y != y)
+        return rows[moved], x[moved], y[moved], encounter_row
+
+    def _flow_distance(self, flow_field, x, y):
+        """flow_field distances of the cells at x, y, -1 where it did not reach."""
+        distances = np.frombuffer(flow_field.distances, dtype=np.int64)
+        stamps = np.frombuffer(flow_field.stamps, dtype=np.int64)
+        keys = self._keys(x, y)
+        safe = np.maximum(keys, 0)
+        reached = (keys >= 0) & (stamps[safe] == flow_field.generation)
+        return np.where(reached, distances[safe], -1)
+
+
+def _column(name):
+    """Property that reads and writes one column of the view's row."""
+    def get(self):
+        return int(getattr(self._store, name)[self._row])
+
+    def set(self, value):
+        getattr(self._store, name)[self._row] = value
+    return property(get, set)
+
+
+class AsteroidRow(asteroid.Asteroid):
+    """An Asteroid whose state lives in a row of an AsteroidStore."""
+    __slots__ = ('_store', '_row')
+    x = _column('x')
+    y = _column('y')
+    dx = _column('dx')
+    dy = _column('dy')
+
+    def __init__(self, store: AsteroidStore, row: int):
+        self._store = store
+        self._row = row
+        self.grid_size = store.grid_size
+
+
+class MonsterRow(wanderingMonster.WanderingMonster):
+    """A WanderingMonster whose state lives in a row of a MonsterStore."""
+    __slots__ = ('_store', '_row')
+    x = _column('x')
+    y = _column('y')
+    health = _column('health')
+    max_health = _column('max_health')
+    power = _column('power')
+    money = _column('money')
+
+    @property
+    def kind(self):
+        return self._store.types[int(self._store.type_id[self._row])]
+
+    def __init__(self, store: MonsterStore, row: int):
+        self._store = store
+        self._row = row
+        self.grid_size = store.grid_size
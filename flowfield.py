@@ -0,0 +1,84 @@
+"""
+Shared distance field for monsters hunting the player.
+
+Once per turn a breadth-first search runs outward from the player,
+around blocked cells (asteroids, the station), up to an optional radius.
+Every hunting monster then only looks up the distance of the cells it
+could move to and takes the closest one, so the turn costs one search
+no matter how many monsters are chasing.
+
+Steps are 8-connected like WanderingMonster.move. Cells are stored flat
+as x * grid_size + y, the same layout as OccupancyGrid.
+"""
+from array import array
+
+NEIGHBOURS = ((0, -1), (0, 1), (-1, 0), (1, 0), (1, 1), (1, -1), (-1, 1), (-1, -1))
+
+
+class FlowField:
+    def __init__(self, grid_size: int):
+        self.grid_size = grid_size
+        cells = grid_size * grid_size
+        # A distance only counts if the cell's stamp is the current generation,
+        # so nothing has to be cleared between searches
+        self.distances = array('q', bytes(8 * cells))
+        self.stamps = array('q', bytes(8 * cells))
+        self.generation = 0
+        self.target = None
+        self.reached = 0
+
+    def compute(self, target: tuple, blocked=None, blocked_positions=(), max_distance: int = None) -> None:
+        """
+        Fills in the distance from target to every cell it can reach.
+        blocked is an optional flat per-cell sequence, truthy cells are never entered.
+        Cells in blocked_positions are never entered either. The target itself always counts.
+        Cells further than max_distance steps are left unreached.
+        """
+        size = self.grid_size
+        distances = self.distances
+        stamps = self.stamps
+        self.generation += 1
+        generation = self.generation
+        self.target = target
+        self.reached = 0
+
+        tx, ty = target
+        if not (0 <= tx < size and 0 <= ty < size):
+            return
+        walls = {x * size + y for x, y in blocked_positions if 0 <= x < size and 0 <= y < size}
+        start = tx * size + ty
+        stamps[start] = generation
+        distances[start] = 0
+        frontier = [start]
+        depth = 0
+        reached = 1
+        while frontier and (max_distance is None or depth < max_distance):
+            depth += 1
+            next_frontier = []
+            for cell in frontier:
+                x, y = divmod(cell, size)
+                for dx, dy in NEIGHBOURS:
+                    nx = x + dx
+                    ny = y + dy
+                    if not (0 <= nx < size and 0 <= ny < size):
+                        continue
+                    i = nx * size + ny
+                    if stamps[i] == generation or i in walls or (blocked is not None and blocked[i]):
+                        continue
+                    stamps[i] = generation
+                    distances[i] = depth
+                    next_frontier.append(i)
+            reached += len(next_frontier)
+            frontier = next_frontier
+        self.reached = reached
+
+    def distance(self, pos: tuple):
+        """Steps from pos to the target, or None if the search did not reach pos."""
+        x, y = pos
+        size = self.grid_size
+        if self.target is None or not (0 <= x < size and 0 <= y < size):
+            return None
+        i = x * size + y
+        if self.stamps[i] != self.generation:
+            return None
+        return self.distances[i]
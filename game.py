@@ -2,36 +2,86 @@
 This file runs the main game loop.
 It tracks player stats and calls functions from the gamefunctions module.
 """
+import time
+# Taken before the other imports so the startup report includes them
+STARTUP_BEGIN = time.perf_counter()
 import gamefunctions
-import sys 
 import os
-import pygame
 import wanderingMonster
 import asteroid
+import autosave
+import rngs
+import replay
+import perf
+import world
+import menus
+from camera import ChunkedBackground
+from inventory import Inventory
 
-DEFAULT_SAVE_FILE = "savegame.json"
+DEFAULT_SAVE_FILE = "savegame.sav"
+# Older saves are still offered for loading, the next save goes to DEFAULT_SAVE_FILE
+LEGACY_SAVE_FILE = "savegame.json"
+# Written in the background while playing, removed again on a clean exit
+AUTOSAVE_FILE = "autosave.sav"
+AUTOSAVE_JOURNAL = "autosave.journal"
+# Sectors of each world are kept in WORLD_DIR/<world id>
+WORLD_DIR = "sectors"
 
-def main():
-    """Main game loop and game state initialization/loading."""
+def build_save_data(player_hp, player_max_hp, player_gold, player_power, equipped_weapon, player_inventory,
+                    map_state, background_as_list=True, world_info=None) -> dict:
+    """
+    Collects everything that goes into a save file.
+    map_state is the current sector, world_info the world id and sector coordinates.
+    """
+    bg_grid = map_state.get('bg_grid')
+    if background_as_list and isinstance(bg_grid, ChunkedBackground):
+        bg_grid = bg_grid.to_list()
+    items = player_inventory.to_list() if isinstance(player_inventory, Inventory) else player_inventory
+    save_map_state = {
+        'player_pos': map_state['player_pos'],
+        'town_pos': map_state['town_pos'],
+        'moved_from_town': map_state['moved_from_town'],
+        'turn_count': map_state.get('turn_count', 0),
+        'monsters': [m.to_dict() for m in map_state['monsters']],
+        'asteroids': [a.to_dict() for a in map_state.get('asteroids', [])],
+        'bg_grid': bg_grid
+    }
+    save_data = {
+        'player_hp': player_hp,
+        'player_max_hp': player_max_hp,
+        'player_gold': player_gold,
+        'player_power': player_power,
+        # Copies, autosave reads them on its own thread while the game changes the originals
+        'equipped_weapon': dict(equipped_weapon),
+        'player_inventory': [dict(item) for item in items],
+        'map_state': save_map_state 
+    }
+    if world_info is not None:
+        save_data['world'] = dict(world_info)
+    return save_data
+
+def main(seed: int = None, autosave_enabled: bool = True, save_file: str = DEFAULT_SAVE_FILE,
+         world_root: str = WORLD_DIR):
+    """
+    Main game loop and game state initialization/loading.
+    seed fixes every random stream (a new one is picked if None).
+    Sectors the player is not near are stored under world_root.
+    """
+    rngs.seed(seed)
     
     # Define initial map state constants
     initial_town_pos = (0, 0)
-    initial_monsters = gamefunctions.populate_monsters(2, initial_town_pos)
     
     # Default map state for a new game
-    initial_map_state = {
-        'player_pos': initial_town_pos,
-        'town_pos': initial_town_pos,
-        'monsters': initial_monsters,
-        'asteroids': [],
-        'moved_from_town': False,
-        'turn_count': 0
-    }
+    initial_map_state = menus.new_map_state(initial_town_pos)
 
     # Startup: New Game or Load Game 
     print("Welcome to the Space Game!")
+    print(f"(Started in {(time.perf_counter() - STARTUP_BEGIN) * 1000:.0f} ms)")
     
-    save_exists = os.path.exists(DEFAULT_SAVE_FILE)
+    load_file = DEFAULT_SAVE_FILE if os.path.exists(DEFAULT_SAVE_FILE) else LEGACY_SAVE_FILE
+    save_exists = os.path.exists(load_file)
+    autosave_exists = os.path.exists(AUTOSAVE_FILE)
     
     # Initialize variables with default (new game) values
     player_name = ""
@@ -39,30 +89,37 @@ def main():
     player_max_hp = 50  
     player_gold = 10
     player_power = 5    
-    player_inventory = []
+    player_inventory = Inventory()
     equipped_weapon = {} 
     current_map_state = initial_map_state
+    # Saves from before the multi-sector world start a new one around their sector
+    world_info = {}
 # New game / Load game
     while True:
         print("\nWhat would you like to do?")
         print("  1) Start New Game")
         if save_exists:
-            print(f"  2) Load Game ({DEFAULT_SAVE_FILE})")
+            print(f"  2) Load Game ({load_file})")
+        if autosave_exists:
+            print("  3) Recover Autosave (last session did not exit cleanly)")
         
-        choice = input(f"Enter your choice ({'1-2' if save_exists else '1'}): ")
+        choice = replay.read_input(f"Enter your choice ({'1-3' if autosave_exists else '1-2' if save_exists else '1'}): ")
         
         if choice == "1":
             # New Game Initialization (using defaults)
-            player_name = input("What is your name? ")
+            player_name = replay.read_input("What is your name? ")
             gamefunctions.print_welcome(player_name, 50)
             break
             
-        elif choice == "2" and save_exists:
+        elif (choice == "2" and save_exists) or (choice == "3" and autosave_exists):
             # Load Game
-            loaded_data = gamefunctions.load_game_data(DEFAULT_SAVE_FILE)
+            if choice == "2":
+                loaded_data = gamefunctions.load_game_data(load_file)
+            else:
+                loaded_data = autosave.recover(AUTOSAVE_FILE, AUTOSAVE_JOURNAL)
             
             if loaded_data:
-                player_name = input("What is your name? ")
+                player_name = replay.read_input("What is your name? ")
                 gamefunctions.print_welcome(player_name, 50)
                 
                 # Load all required variables
@@ -70,8 +127,9 @@ def main():
                 player_max_hp = loaded_data.get('player_max_hp', 30)
                 player_gold = loaded_data.get('player_gold', 10)
                 player_power = loaded_data.get('player_power', 5)
-                player_inventory = loaded_data.get('player_inventory', [])
+                player_inventory = Inventory.from_list(loaded_data.get('player_inventory', []))
                 equipped_weapon = loaded_data.get('equipped_weapon', {}) 
+                world_info = loaded_data.get('world', {})
                 
                 # Load Map State 
                 current_map_state = loaded_data.get('map_state', initial_map_state)
@@ -107,154 +165,124 @@ def main():
                 continue
                 
         else:
-            print("\nInvalid choice. Please enter 1 or 2.")
+            print("\nInvalid choice. Please enter a valid number.")
     
-    #Main Game Loop
-    while True:
-        action = None
-        # Dead check
-        if player_hp <= 0:
-            print("\n" + "!"*40)
-            print("CRITICAL FAILURE: Your ship has been destroyed!")
-            print("!"*40)
-            
-            choice = input("Would you like to (1) Respawn at Station or (2) Embrace the unforgiving vaccuum of space? ")
-            
-            if choice == "1":
-                print("\nRescue teams have recovered your escape pod.")
-                print("Your ship has been rebuilt at the station.")
-                player_hp = player_max_hp
-                current_map_state['player_pos'] = current_map_state['town_pos']
-                current_map_state['moved_from_town'] = False
-                continue 
-            else:
-                print("You would...")
-                break
-        # Check if the player is at the Town's position
-        is_at_town = current_map_state['player_pos'] == current_map_state['town_pos']
+    # A world no save or autosave points to yet, its sectors go again if it is quit without saving
+    fresh_world = not world_info.get('id')
+    # Not taken from rngs, so seeded runs and replays draw the same numbers
+    world_info = {'id': world_info.get('id') or f"{rngs.new_seed():08x}",
+                  'sector': list(world_info.get('sector', world.ORIGIN))}
+    game_world = world.World(gamefunctions.GRID_SIZE, os.path.join(world_root, world_info['id']),
+                             current_map_state, tuple(world_info['sector']))
 
-        #Determine Action Source (Town Menu vs Auto-Explore)
-        if is_at_town:
-            # Show Town Menu
-            print("\n" + "-"*20)
-            print("You are at the Space Station.")
-            print(f"Current HP: {player_hp}/{player_max_hp}")
-            print(f"Current Credits: {player_gold}")
-            
-            # Display equipped weapon if one exists
-            if equipped_weapon:
-                current_dur = equipped_weapon.get('currentDurability', 0)
-                max_dur = equipped_weapon.get('maxDurability', 0)
-                name = equipped_weapon.get('name', 'Unknown')
-                print(f"Auxilary Weapons: {name.capitalize()} (Charge: {current_dur}/{max_dur})")
+    # The map window is opened on first use and kept until the game exits
+    display_session = gamefunctions.new_display_session()
+    autosaver = autosave.Autosaver(AUTOSAVE_FILE, AUTOSAVE_JOURNAL) if autosave_enabled else None
+    player = menus.Player(player_name, player_hp, player_max_hp, player_gold, player_power,
+                          player_inventory, equipped_weapon)
+    game = TerminalGame(player, current_map_state, game_world, world_info, save_file)
+
+    def autosave_turn():
+        if autosaver is not None:
+            autosaver.record(game.save_data(background_as_list=False))
+
+    #Main Game Loop, the town and the menus are run by game, the map here in its window
+    # Anything but the game ending (Ctrl+C, end of input, a replay running out) keeps the autosave
+    clean_exit = False
+    try:
+        game.start()
+        while not game.done:
+            autosave_turn()
+            if game.state == menus.STATE_MAP:
+                action, game.map_state = gamefunctions.handle_map(game.map_state, display_session,
+                                                                  on_turn=autosave_turn, open_edges=True)
+                if action == gamefunctions.ACTION_LEAVE_SECTOR:
+                    # Flew off the edge, the map reopens in the next sector
+                    direction = game.map_state.pop('exit_direction')
+                    game.map_state = game_world.cross(game.map_state, direction)
+                    sx, sy = game_world.current
+                    print(f"\nEntering sector ({sx}, {sy}).")
+                game.map_action(action)
             else:
-                 print("Auxilary Weapons: None")
+                game.show()
+                game.handle(replay.read_input(game.prompt))
+        clean_exit = not game.quit_abruptly
+    finally:
+        if autosaver is not None:
+            # Waits for the turns still queued, the writer thread would die with the process
+            autosaver.close(discard=clean_exit)
+        if clean_exit and fresh_world and not game.saved:
+            game_world.discard()
+        display_session.close()
 
-            print("\nWhat would you like to do?")
-            print("  1) Leave station (Explore Space)") 
-            print("  2) Shipyard (Repair Ship for 5 Credits)")
-            print("  3) Visit Shop") 
-            print("  4) Equip Weapons") 
-            print("  5) Save and Quit")
-            print("  6) Quit (No Save)")
-            
-            # Validate User input
-            choice = input("Enter your choice (1-6): ")
-        else:
-            # If not in town, automatically set choice to "1" to trigger map exploration
-            choice = "1"
+class TerminalGame(menus.Game):
+    """menus.Game for main(), saving to save_file with the world's sectors."""
+    def __init__(self, player: menus.Player, map_state: dict, game_world: world.World, world_info: dict,
+                 save_file: str):
+        super().__init__(player, map_state, ask_name=False)
+        self.world = game_world
+        self.world_info = world_info
+        self.save_file = save_file
+        self.saved = False
 
+    def save_data(self, background_as_list: bool = True) -> dict:
+        player = self.player
+        self.world_info['sector'] = list(self.world.current)
+        return build_save_data(player.hp, player.max_hp, player.gold, player.power, player.equipped_weapon,
+                               player.inventory, self.map_state, background_as_list=background_as_list,
+                               world_info=self.world_info)
 
-        #Handle User Choice (Common logic for map action or town actions)
-        if choice == "1":
-            # Map/Explore/Continue
-            action, current_map_state = gamefunctions.handle_map(current_map_state)
-            
-        if action == gamefunctions.ACTION_QUIT:
-            print("\nGame closed abruptly.")
-            break
-            
-        if action == gamefunctions.ACTION_MONSTER_ENCOUNTER:
-            enemy_monster = current_map_state.get('active_encounter')
-            #Retrieve the monster
-            if enemy_monster:
-                player_hp, player_gold, equipped_weapon, player_inventory, won = gamefunctions.handle_fight(
-                player_hp=player_hp,
-                player_gold=player_gold,
-                player_power=player_power,
-                equipped_weapon=equipped_weapon,
-                player_inventory=player_inventory,
-                monster=enemy_monster 
-                    )
-                    
-                if won:
-                    # Remove the defeated monster 
-                    current_map_state['monsters'].remove(enemy_monster)
-                        
-                        # If all monsters are cleared, spawn 2 new ones
-                    if not current_map_state['monsters']:
-                            print("\nThe sector is clear... for now. New opponents appear!")
-                            new_monsters = gamefunctions.populate_monsters(2, current_map_state['town_pos'])
-                            current_map_state['monsters'].extend(new_monsters)
-                    
-                    # Cleanup active encounter key
-                    current_map_state.pop('active_encounter', None)
-        elif choice == "2" and is_at_town:
-        # Sleep handler 
-                player_hp, player_gold = gamefunctions.handle_sleep(
-                player_hp=player_hp,
-                player_gold=player_gold,
-                max_hp=player_max_hp,
-                sleep_cost=5
-            )
+    def save(self) -> None:
+        self.world.flush()
+        gamefunctions.save_game_data(self.save_file, self.save_data())
+        self.saved = True
 
-        elif choice == "3" and is_at_town:
-            # Shop handler
-            player_gold, player_inventory = gamefunctions.handle_shop(
-                player_gold=player_gold,
-                player_inventory=player_inventory
-            )
-            
-        elif choice == "4" and is_at_town:
-            # Equip handler
-            equipped_weapon, player_inventory = gamefunctions.handle_equip(
-                player_inventory=player_inventory,
-                equipped_weapon=equipped_weapon
-            )
+def cli():
+    """Command line entry point, see replay.py for recording and replaying sessions."""
+    import argparse
+    parser = argparse.ArgumentParser(description="Space Game")
+    parser.add_argument('--seed', type=int, help="seed for every random stream, picked at random if left out")
+    parser.add_argument('--record', metavar='FILE', help="record the seed and every input to FILE")
+    parser.add_argument('--replay', metavar='FILE', help="play back a recorded session without a window")
+    parser.add_argument('--quiet', action='store_true', help="do not echo replayed menu inputs")
+    parser.add_argument('--perf', metavar='FILE', help="time the map loop and write a summary to FILE at exit")
+    parser.add_argument('--hud', action='store_true', help="time the map loop and show the overlay (F3 toggles it)")
+    args = parser.parse_args()
 
-        elif choice == "5" and is_at_town:
-            # Save Game and Quit 
-            save_map_state = {
-                'player_pos': current_map_state['player_pos'],
-                'town_pos': current_map_state['town_pos'],
-                'moved_from_town': current_map_state['moved_from_town'],
-                'turn_count': current_map_state.get('turn_count', 0),
-                'monsters': [m.to_dict() for m in current_map_state['monsters']],
-                'asteroids': [a.to_dict() for a in current_map_state.get('asteroids', [])],
-                'bg_grid': current_map_state.get('bg_grid', [])
-            }
-            save_data = {
-                'player_hp': player_hp,
-                'player_max_hp': player_max_hp,
-                'player_gold': player_gold,
-                'player_power': player_power,
-                'equipped_weapon': equipped_weapon,
-                'player_inventory': player_inventory,
-                'map_state': save_map_state 
-            }
-            gamefunctions.save_game_data(DEFAULT_SAVE_FILE, save_data)
-            print(f"\nGoodbye, {player_name}!")
-            break 
-            
-        elif choice == "6" and is_at_town:
-            # Quit the game without saving
-            print(f"\nGoodbye, {player_name}!")
-            break 
-            
-        else:
-            # Handle invalid input
-            print("\nInvalid choice. Please enter a valid number.")
+    if args.perf or args.hud:
+        perf.enable(dump_file=args.perf, hud=args.hud)
+
+    if args.replay:
+        replayer = replay.Replayer.load(args.replay, echo=not args.quiet)
+        replay.start(replayer)
+        start = time.perf_counter()
+        # A replay must not touch the real save, autosave or sector files
+        import shutil
+        import tempfile
+        with tempfile.TemporaryDirectory() as world_root:
+            if os.path.isdir(WORLD_DIR):
+                # Loaded saves read their sectors back, from a copy
+                shutil.copytree(WORLD_DIR, world_root, dirs_exist_ok=True)
+            try:
+                main(replayer.seed, autosave_enabled=False, save_file=os.devnull, world_root=world_root)
+            except replay.ReplayFinished:
+                print("\nReplay ended before the game did.")
+            finally:
+                replay.stop()
+        print(f"Replayed {replayer.position} inputs in {time.perf_counter() - start:.2f} s (seed {replayer.seed}).")
+    elif args.record:
+        seed = rngs.new_seed() if args.seed is None else args.seed
+        recorder = replay.Recorder(seed)
+        replay.start(recorder)
+        try:
+            main(seed)
+        finally:
+            replay.stop()
+            recorder.save(args.record)
+            print(f"Recorded {len(recorder.events)} inputs to '{args.record}' (seed {seed}).")
+    else:
+        main(args.seed)
 
 # Run the main function when the script is executed
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    cli()
\ No newline at end of file
@@ -2,46 +2,77 @@
 
 there is a function for purchasing an item, generating a monster, 
 and printing a shop and welcome"""
-import random
-import sys 
+import rngs
+import replay
+import perf
 import json
 import os
+import struct
+import zlib
+import lzma
 from typing import Union
-import pygame
 import wanderingMonster
-import asteroid
+import catalog
+import spawner
+from inventory import Inventory
+import savefile
+from display import DisplaySession
+from camera import Camera, as_background
+from simulation import (
+    SectorSimulation, ACTION_RETURN_TO_TOWN, ACTION_MONSTER_ENCOUNTER, ACTION_LEAVE_SECTOR,
+    MOVE_UP, MOVE_DOWN, MOVE_LEFT, MOVE_RIGHT, MOVE_WAIT, MOVE_DOCK
+)
 
 
 GRID_SIZE = 10
 TILE_SIZE = 32
-SCREEN_WIDTH = GRID_SIZE * TILE_SIZE
-SCREEN_HEIGHT = GRID_SIZE * TILE_SIZE
-ACTION_RETURN_TO_TOWN = "return_to_town"
-ACTION_MONSTER_ENCOUNTER = "monster_encounter"
+# Largest number of tiles shown at once, bigger sectors scroll
+VIEW_TILES = 15
+SCREEN_WIDTH = min(GRID_SIZE, VIEW_TILES) * TILE_SIZE
+SCREEN_HEIGHT = min(GRID_SIZE, VIEW_TILES) * TILE_SIZE
 ACTION_QUIT = "quit"
+# Map loop modes
+MAP_LOOP_EVENT = "event"    # sleep until there is input
+MAP_LOOP_CAPPED = "capped"  # redraw at most MAP_FPS times a second
+MAP_LOOP_BUSY = "busy"      # redraw as fast as possible (old behavior)
+MAP_LOOP_MODE = MAP_LOOP_EVENT
+MAP_FPS = 30
+# Move monsters and asteroids with NumPy batches (needs numpy)
+BATCHED_ENTITIES = False
+# Monsters near the player chase it instead of wandering
+HUNTING_MONSTERS = False
 def save_game_data(filename: str, player_data: dict) -> None:
-    """Saves the game"""
+    """Saves the game. Files ending in .json are written as JSON, anything else in the binary format"""
     try:
-        with open(filename, 'w') as f:
-            json.dump(player_data, f, indent=4)
+        if filename.endswith('.json'):
+            with open(filename, 'w') as f:
+                json.dump(player_data, f, indent=4)
+        else:
+            savefile.save(filename, player_data)
         print(f"\nGame successfully saved to '{filename}'.")
     except IOError as e:
         print(f"\nError saving game: {e}") 
 def load_game_data(filename: str) -> Union[dict, None]:
     """
-   Loads the game and provides fail condition 
+   Loads the game (JSON or binary, detected from the file) and provides fail condition 
     """
     if not os.path.exists(filename):
         return None
     
     try:
-        with open(filename, 'r') as f:
-            player_data = json.load(f)
+        if savefile.is_binary_save(filename):
+            player_data = savefile.load(filename)
+        else:
+            with open(filename, 'r') as f:
+                player_data = json.load(f)
         print(f"\nGame successfully loaded from '{filename}'.")
         return player_data
     except json.JSONDecodeError:
         print(f"\nError: The file '{filename}' is corrupted or not a valid JSON file.")
         return None
+    except (ValueError, struct.error, zlib.error, lzma.LZMAError) as e:
+        print(f"\nError: The file '{filename}' is not a valid save file ({e}).")
+        return None
     except IOError as e:
         print(f"\nError loading game: {e}")
         return None   
@@ -79,7 +110,7 @@ def get_fight_action() -> str:
     print("What will you do?")
     print("  1) Fight")
     print("  2) Run")
-    action = input("Enter your choice (1-2): ")
+    action = replay.read_input("Enter your choice (1-2): ")
     return action
 def handle_fight_turn(
     player_hp: int, 
@@ -120,14 +151,14 @@ def handle_fight_turn(
     final_damage = base_damage
     
     # Roll for Crits/Misses
-    hit_roll = random.random() 
+    hit_roll = rngs.combat.random() 
 
     if hit_roll < miss_chance:
         # Miss
         final_damage = 0
         print(f"\nYou fired at the {monster_name}, but missed!")
         
-    elif random.random() < crit_chance: 
+    elif rngs.combat.random() < crit_chance: 
         # Crit
         final_damage = int(base_damage * crit_multiplier)
         print(f"\nCRITICAL HIT!! You hit a weak spot!")
@@ -144,13 +175,13 @@ def handle_fight_turn(
         monster_damage = monster_power
         
         # Roll for Monster Hit/Miss
-        hit_roll = random.random()
+        hit_roll = rngs.combat.random()
         
         if hit_roll < monster_miss_chance:
             monster_damage = 0
             print(f"The {monster_name} attacks, but misses you!")
             
-        elif random.random() < monster_crit_chance:
+        elif rngs.combat.random() < monster_crit_chance:
             monster_damage = int(monster_power * monster_crit_multiplier)
             print(f"The {monster_name} lands a critical hit! Dealing {monster_damage} damage.")
             
@@ -184,117 +215,34 @@ def handle_fight_end(player_hp: int, player_gold: int, monster_hp: int, monster_
         print(f"You found {monster_gold} credits! You now have {player_gold} credits.")
     
     return player_hp, player_gold
-def populate_monsters(count, town_pos):
-    """Creates a list of WanderingMonster objects."""
-    monsters = []
-    for _ in range(count):
-        m = wanderingMonster.WanderingMonster(GRID_SIZE, town_pos)
-        monsters.append(m)
-    return monsters
+def populate_monsters(count, town_pos, blocked=()):
+    """
+    Creates a list of WanderingMonster objects on distinct free cells,
+    never on the town or a position in blocked.
+    Returns fewer monsters if the grid runs out of cells.
+    """
+    town_pos = tuple(town_pos)
+    blocked = set(blocked)
+    cells = spawner.free_cells(GRID_SIZE, count, lambda cell: cell != town_pos and cell not in blocked)
+    return [wanderingMonster.WanderingMonster(GRID_SIZE, town_pos, pos=cell) for cell in cells]
 def handle_fight(
     player_hp: int, 
     player_gold: int, 
     player_power: int,
     equipped_weapon: dict,       
-    player_inventory: list,
+    player_inventory: Inventory,
     monster: dict 
-) -> tuple[int, int, dict, list, bool]:
+) -> tuple[int, int, dict, Inventory, bool]:
     """
-    Manages a single fight with a specific monster.
+    Manages a single fight with a specific monster at the terminal, see menus.FightMenu.
     Returns updated stats and a boolean indicating if the monster was defeated.
     """
-    
-    # Use attributes from the passed monster object
-    monster_hp = monster.health
-    monster_power = monster.power
-    monster_name = monster.name
-    monster_desc = monster.description
-    monster_money = monster.money
-    
-    print(f"\nYou encounter a {monster_name} ship!")
-    print(f"> {monster_desc}")
-    
-    # Check for consumables that instantly end the fight
-    emp_index = next(
-        (i for i, item in enumerate(player_inventory) if item.get('name') == 'emp'), 
-        -1
-    )
-    m_crit_chance = getattr(monster, 'crit_chance', 0.05)
-    m_crit_mult = getattr(monster, 'crit_multiplier', 1.5)
-    m_miss_chance = getattr(monster, 'miss_chance', 0.05)
-    # fight loop
-    while player_hp > 0 and monster_hp > 0:
-        
-        display_fight_stats(player_hp, monster_name, monster_hp)
-        
-        print("What will you do?")
-        print("  1) Fight")
-        print("  2) Run")
-        
-        has_emp = emp_index != -1
-        
-        if has_emp:
-            print("  3) Use EMP (Destroy Enemy)")
-            user_action = input("Enter your choice (1-3): ")
-        else:
-            user_action = input("Enter your choice (1-2): ")
-            
-
-        if user_action == "1":
-            #defense
-            current_defense = 0
-            for item in player_inventory:
-                current_defense += item.get('defense_bonus', 0)
-            # Call the turn handler
-            player_hp, monster_hp, equipped_weapon = handle_fight_turn(
-                player_hp, player_power, 
-                monster_hp, monster_power, monster_name,
-                equipped_weapon,
-                total_defense=current_defense,
-                monster_crit_chance=m_crit_chance,
-                monster_crit_multiplier=m_crit_mult,
-                monster_miss_chance=m_miss_chance 
-            )
-            
-        elif user_action == "2":
-            #make fleeing only work sometimes
-            flee_chance = random.randrange(0, 100, 1)
-            if flee_chance <= 80:
-                print("\nYou successfully Fled!")
-                break 
-            else:
-                print("\nYou did not get away!")
-                player_hp -= monster_power
-                print(f"The {monster_name} attacks you in your failed attempt to flee, dealing {monster_power} damage.")
-            
-        elif user_action == "3" and has_emp:
-            print(f"\nYou sent an EMP! The {monster_name} ship is destroyed.")
-            player_inventory.pop(emp_index)
-            monster_hp = 0
-            break
-            
-        else:
-            print("\nUnrecognized command. Try again.")
-    
-    # If the equipped weapon broke during the fight, unequip it here.
-    if equipped_weapon and equipped_weapon.get('currentDurability', 0) <= 0:
-        print(f"\nYour {equipped_weapon['name'].capitalize()} has burned out!")
-        print("You discard the scrap.")
-        if equipped_weapon in player_inventory:
-            player_inventory.remove(equipped_weapon)
-        else:
-            for item in player_inventory:
-                if item['name'] == equipped_weapon['name']:
-                    player_inventory.remove(item)
-                    break
-    # end fight
-    player_hp, player_gold = handle_fight_end(
-        player_hp, player_gold, 
-        monster_hp, monster_name, monster_money
-    )
-    
+    # menus imports this module, so it is only imported once needed
+    import menus
+    fight = menus.run_in_terminal(menus.FightMenu(
+        player_hp, player_gold, player_power, equipped_weapon, player_inventory, monster))
     # Return updated gold, HP, equipped_weapon, inventory, and win status
-    return player_hp, player_gold, equipped_weapon, player_inventory, monster_hp <= 0
+    return fight.player_hp, fight.player_gold, fight.equipped_weapon, fight.inventory, fight.won
 def handle_sleep(player_hp: int, player_gold: int, max_hp: int, sleep_cost: int) -> tuple[int, int]:
     """
     Function for sleeping, 
@@ -311,388 +259,168 @@ def handle_sleep(player_hp: int, player_gold: int, max_hp: int, sleep_cost: int)
     else:
         print(f"\nYou need {sleep_cost} credits to get repairs, but you only have {player_gold}.")
     return player_hp, player_gold
-# This dictionary stores the base stats for the items in the shop
-ITEM_TEMPLATES = {
-    "rocket": {
-        "name": "Rocket Launcher", 
-        "type": "weapon", 
-        "price": 30,
-        "desc": "Above average crit and damage.",
-        "maxDurability": 15, 
-        "currentDurability": 15, 
-        "damageBonus": 5,
-        "crit_chance": 0.25,
-        "crit_multiplier": 1.5,
-        "miss_chance": .05
-
-    },
-    "laser": {
-        "name": "Sighted Laser", 
-        "type": "weapon", 
-        "price": 50,
-        "desc": "Limited uses, High Damage, High Crit, Does not miss.",
-        "maxDurability": 5, 
-        "currentDurability": 5, 
-        "damageBonus": 8,
-        "crit_chance": 0.75,
-        "crit_multiplier": 2.0,
-        "miss_chance": 0.0
-
-    },
-    "shield": {
-        "name": "Shield System",
-        "type": "passive",
-        "price": 50,
-        "desc": "Passive. Reduces Incoming Damage",
-        "defense_bonus": 3,
-        "unique": True
-    },    
-    "emp": {
-        "name": "EMP Charge", 
-        "type": "consumable", 
-        "price": 10,
-        "desc": "A one time use item that destroys an enemy ship",
-        "note": "A electrical pulse that can disable a ship instantly."
-    }
-}
-SHOP_KEYS = ["rocket","laser", "emp", "shield"]
-def handle_shop(player_gold: int, player_inventory: list) -> tuple[int, list]:
+# Item and shop tables are loaded from content.json once, see catalog.py
+CATALOG = catalog.get()
+ITEM_TEMPLATES = CATALOG.items_by_id
+SHOP_KEYS = tuple(item['id'] for item in CATALOG.shop)
+def handle_shop(player_gold: int, player_inventory: Inventory) -> tuple[int, Inventory]:
     """
-    Manages the shop interface for purchasing items.
+    Manages the shop interface for purchasing items at the terminal, see menus.ShopMenu.
     Returns the updated player_gold and player_inventory.
     """
-    
-    while True:
-        print("\n" + "="*40)
-        print(f"      SHOP | Credits: {player_gold}")
-        print("="*40)
-        
-        # Display shop items from SHOP_KEYS
-        print(f"{'#':<4} {'Item':<18} {'Price':<8} {'Description'}")
-        print("-" * 40)
-        
-        for i, key in enumerate(SHOP_KEYS):
-            item = ITEM_TEMPLATES.get(key)
-            if item:
-                name = item['name']
-                price = item['price']
-                desc = item.get('desc', '')
-                print(f"{i+1:<4} {name:<18} {price:<8} {desc}")
-                
-        print("-" * 40)
-        print("0)   Exit Shop")
-        
-        choice = input("\nEnter choice: ")
-        
-        if choice == "0":
-            break
-        
-        if choice.isdigit():
-            index = int(choice) - 1
-            
-            if 0 <= index < len(SHOP_KEYS):
-                key = SHOP_KEYS[index]
-                item_template = ITEM_TEMPLATES[key]
-                price = item_template['price']
-                is_unique = item_template.get("unique", False)
-                already_owns = False
-                if is_unique:
-                    for inv_item in player_inventory:
-                        if inv_item['name'] == item_template['name']:
-                            already_owns = True
-                            break
-                if already_owns:
-                    print(f"\nYou already have a {item_template['name']} installed. You cannot carry another.")
-                    continue
-                # Check affordability
-                if player_gold >= price:
-                    player_gold -= price
-                    
-                    # Create an item to add to inventory
-                    new_item = item_template.copy()
-                    player_inventory.append(new_item)
-                    
-                    print(f"\n*** Purchased {new_item['name']} for {price} credits! ***")
-                else:
-                    print(f"\nNot enough credits! You need {price} credits.")
-            else:
-                print("\nInvalid selection.")
-        else:
-            print("\nInvalid input.")
-            
-    print("\nThanks for shopping!")
-    return player_gold, player_inventory
-def handle_equip(player_inventory: list, equipped_weapon: dict) -> tuple[dict, list]:
+    import menus
+    shop = menus.run_in_terminal(menus.ShopMenu(player_gold, player_inventory))
+    return shop.gold, shop.inventory
+def handle_equip(player_inventory: Inventory, equipped_weapon: dict) -> tuple[dict, Inventory]:
     """
-    Handles equipping a 'weapon' item from the inventory.
+    Handles equipping a 'weapon' item from the inventory at the terminal, see menus.EquipMenu.
     Returns the updated equipped_weapon and player_inventory.
     """
-    
-    item_type_to_equip = "weapon"
-    
-    #Find all equipable items in inventory
-    equipable_items = [
-        item for item in player_inventory 
-        if item.get("type") == item_type_to_equip 
-        and item.get("currentDurability", 1) > 0
-    ]
-    
-    if not equipable_items:
-        print(f"\nYou have no functioning {item_type_to_equip}s to equip.")
-        return equipped_weapon, player_inventory
-    
-    while True:
-        print("\n--- Equip Weapon ---")
-        print(f"Currently Equipped: {equipped_weapon.get('name', 'None').capitalize()}")
-
-        #Display equipable items
-        print(f"\nAvailable {item_type_to_equip.capitalize()}s:")
-        for i, item in enumerate(equipable_items):
-            display_name = item['name'].capitalize()
-            # Special check for durability items
-            if 'currentDurability' in item:
-                display_name += f" (Durability: {item['currentDurability']}/{item['maxDurability']})"
-            
-            print(f"  {i+1}) {display_name}")
-        unequip_option = len(equipable_items) + 1
-        
-        print(f"  {unequip_option}) Unequip Current Weapon")
-        print("  0) Back to Town Menu")
-        print("=" * 30)
-
-        choice = input(f"Enter choice (0-{unequip_option}): ")
-        if choice == "0":
-            break 
-
-        if choice.isdigit():
-            choice_num = int(choice)
-            if choice_num == unequip_option:
-                if equipped_weapon:
-                    print(f"\n{equipped_weapon['name'].capitalize()} has been unequipped.")
-                    equipped_weapon = {}
-                else:
-                    print("\nNothing is currently equipped.")
-            elif 1 <= choice_num <= len(equipable_items):
-                item_index = choice_num - 1
-                item_to_equip = equipable_items[item_index]
-                equipped_weapon = item_to_equip 
-                print(f"\n** {equipped_weapon['name'].capitalize()} is now equipped! **")
-            else: 
-                print("\nInvalid selection number.")
-        else:
-            print("\nInvalid input. Please enter a number.")
-    return equipped_weapon, player_inventory
-def handle_map(map_state: dict) -> tuple[str, dict]:
+    import menus
+    equip = menus.run_in_terminal(menus.EquipMenu(player_inventory, equipped_weapon))
+    return equip.equipped_weapon, equip.inventory
+def _poll_map_events(loop_mode: str, idle: bool) -> list:
+    """
+    Gets the next batch of map events.
+    In event mode an idle map blocks until something happens instead of spinning.
     """
-    Initializes and runs the Pygame map screen.
+    import pygame
+    if idle and loop_mode == MAP_LOOP_EVENT:
+        return [pygame.event.wait()] + pygame.event.get()
+    return pygame.event.get()
+def new_display_session() -> DisplaySession:
+    """Creates a display session sized for the map. It opens on first use."""
+    return DisplaySession(SCREEN_WIDTH, SCREEN_HEIGHT, TILE_SIZE)
+def handle_map(map_state: dict, session: DisplaySession = None, loop_mode: str = None, fps: int = None,
+               on_turn=None, open_edges: bool = False) -> tuple[str, dict]:
+    """
+    Runs the Pygame map screen in the given display session.
     Handles movement, drawing, and encounter/return logic.
+    Without a session a temporary one is opened and closed again.
+    loop_mode is one of the MAP_LOOP_* modes, fps is the cap for capped mode.
+    on_turn is called with no arguments after every turn (used for autosave).
+    With open_edges flying off the edge returns ACTION_LEAVE_SECTOR.
+    While a replay or bot is running the map is played headless from its moves.
     Returns the action taken and the updated map state.
     """
+    if replay.is_headless():
+        return run_map_headless(map_state, replay.active.map_event, on_turn, open_edges)
+    if loop_mode is None:
+        loop_mode = MAP_LOOP_MODE
+    if fps is None:
+        fps = MAP_FPS
+    owns_session = session is None
+    if owns_session:
+        session = new_display_session()
     
-    # Initialize Pygame if not already initialized
-    if not pygame.get_init():
-        try:
-            pygame.init()
-        except pygame.error as e:
-            print(f"Pygame initialization failed: {e}")
-            print("Cannot display map. Returning to town menu.")
-            return ACTION_RETURN_TO_TOWN, map_state
+    if not session.open():
+        print("Cannot display map. Returning to town menu.")
+        replay.record_map_event(ACTION_RETURN_TO_TOWN)
+        return ACTION_RETURN_TO_TOWN, map_state
+    # Only imported now so the text menus start without it
+    import pygame
+    # Keys and clicks on the window while the menus were up are not moves
+    pygame.event.clear()
 
-    screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
-    pygame.display.set_caption("Space")
-    #Fix the annoying thing where the window for pygame is in the background
-    try:
-        import sys
-        if sys.platform.startswith('win'):
-            import ctypes
-            hwnd = pygame.display.get_wm_info()['window']
-            ctypes.windll.user32.SetForegroundWindow(hwnd)
-        else:
-            pass
-    except Exception as e:
-        print(f"Note: Could not force window focus: {e}")    
-    current_dir = os.path.dirname(os.path.abspath(__file__))
-    sprites_dir = os.path.join(current_dir, "sprites")
-    #Map background
-    bg_variants = []
-    try:
-        raw_bg = pygame.image.load(os.path.join(sprites_dir, "Background.png"))
-        scaled_bg = pygame.transform.scale(raw_bg, (TILE_SIZE, TILE_SIZE))
-        for angle in [0, 90, 180, 270]:
-            bg_variants.append(pygame.transform.rotate(scaled_bg, angle))
-    except (pygame.error, FileNotFoundError):
-        print("Warning: 'Background.png' not found. Defaulting to black.")
-    #Store background
-    if 'bg_grid' not in map_state:
-        map_state['bg_grid'] = [
-            [random.randint(0, 3) for _ in range(GRID_SIZE)] 
-            for _ in range(GRID_SIZE)
-        ]
-    player_sprite = None
-    try:
-        raw_player = pygame.image.load(os.path.join(sprites_dir, "Player.png"))
-        player_sprite = pygame.transform.scale(raw_player, (TILE_SIZE, TILE_SIZE))
-    except (pygame.error, FileNotFoundError) as e:
-        print(f"Failed to load 'Player.png'")
-    town_sprite = None
-    try:
-        raw_town = pygame.image.load(os.path.join(sprites_dir, "SpaceStation.png"))
-        town_sprite = pygame.transform.scale(raw_town, (TILE_SIZE, TILE_SIZE))
-    except (pygame.error, FileNotFoundError) as e:
-        print(f"Failed to load 'SpaceStation.png'")
-        if 'asteroids' not in map_state:
-            map_state['asteroids'] = []
-    # Extract locations from state
-    player_x, player_y = map_state['player_pos']
-    town_x, town_y = map_state['town_pos']
-    monsters = map_state['monsters']
-    asteroids = map_state['asteroids']
+    #Store background, chunks are only generated once the camera gets there
+    map_state['bg_grid'] = as_background(map_state.get('bg_grid'), GRID_SIZE)
+    renderer = session.renderer
+    clock = session.clock
+    bg_variants = session.bg_variants
+    player_sprite = session.player_sprite
+    town_sprite = session.town_sprite
+    expose_events = {pygame.VIDEOEXPOSE, getattr(pygame, 'WINDOWEXPOSED', pygame.VIDEOEXPOSE)}
+    if loop_mode == MAP_LOOP_EVENT:
+        # Don't wake up for mouse movement and the like
+        pygame.event.set_blocked(None)
+        pygame.event.set_allowed([pygame.QUIT, pygame.KEYDOWN] + list(expose_events))
+    else:
+        pygame.event.set_allowed(None)
+    simulation = SectorSimulation(map_state, GRID_SIZE, batched=BATCHED_ENTITIES, hunt=HUNTING_MONSTERS,
+                                  open_edges=open_edges)
+    camera = Camera(VIEW_TILES, VIEW_TILES, GRID_SIZE)
+    camera.center_on(simulation.player_pos)
+    key_moves = {
+        pygame.K_UP: MOVE_UP,
+        pygame.K_DOWN: MOVE_DOWN,
+        pygame.K_LEFT: MOVE_LEFT,
+        pygame.K_RIGHT: MOVE_RIGHT,
+        pygame.K_RETURN: MOVE_DOCK
+    }
     
     running = True
     action = None # Default action if window is closed by 'X'
+    frame_drawn = False
 
     while running:
-        asteroid_coords = {a.get_pos() for a in asteroids}
-        for event in pygame.event.get():
+        # Waiting for a key in event mode is idle time, not work
+        blocking = frame_drawn and loop_mode == MAP_LOOP_EVENT
+        with perf.phase('idle' if blocking else 'events'):
+            polled = _poll_map_events(loop_mode, idle=frame_drawn)
+        frame_start = perf.now()
+        for event in polled:
+            if event.type in expose_events:
+                # Window was uncovered, the dirty rectangles are not enough
+                renderer.redraw_all()
             if event.type == pygame.QUIT:
                 # User hit the 'x' button, resulting in abrupt exit
+                replay.record_map_event(ACTION_QUIT)
                 action = ACTION_QUIT
                 running = False
+                break
             
             if event.type == pygame.KEYDOWN:
-                dx, dy = 0, 0
-                #prevent softlock
-                if event.key == pygame.K_RETURN:
-                    if (player_x, player_y) == (town_x, town_y):
-                        action = ACTION_RETURN_TO_TOWN
-                        running = False
-                
-                # Handle Movement
-                if event.key == pygame.K_UP:
-                    dy = -1
-                elif event.key == pygame.K_DOWN:
-                    dy = 1
-                elif event.key == pygame.K_LEFT:
-                    dx = -1
-                elif event.key == pygame.K_RIGHT:
-                    dx = 1
-                
-                #Calculate new potential position
-                new_x = player_x + dx
-                new_y = player_y + dy
-                #Bounds and asteroid collision
-                if (0 <= new_x < GRID_SIZE and 0 <= new_y < GRID_SIZE 
-                    and (new_x, new_y) not in asteroid_coords):
-                    
-                    player_x = new_x
-                    player_y = new_y
-                    #Player-initiated Encounter Check
-                    #Check if player moved onto a monster's square
-                    for monster in monsters:
-                        if (player_x, player_y) == monster.get_pos():
-                            map_state['active_encounter'] = monster
-                            action = ACTION_MONSTER_ENCOUNTER
-                            running = False
-                            break #Exit monster loop
-                    if not running:
-                        break #Exit event loop
-
-                    
-                    #Increment turn counter for each player move
-                    map_state['turn_count'] += 1
-                    #move asteroids
-                    blocked_spots = {m.get_pos() for m in monsters}
-                    blocked_spots.add((player_x, player_y))
-                    blocked_spots.add((town_x, town_y))
-                    for a in asteroids:
-                        blocked_spots.add(a.get_pos())
-                    for ast in asteroids[:]:
-                        blocked_spots.discard(ast.get_pos())
-                        ast.move(blocked_spots)
-                        if ast.is_out_of_bounds():
-                            asteroids.remove(ast)
-                        else:
-                            blocked_spots.add(ast.get_pos())
-
-                    #Spawn and maintain # of asteroids
-                    while len(asteroids) < 3:
-                        current_unsafe_spawns = {(player_x, player_y), (town_x, town_y)}
-                        for a in asteroids:
-                            current_unsafe_spawns.add(a.get_pos())
-                        new_ast = asteroid.Asteroid(GRID_SIZE, current_unsafe_spawns)
-                        asteroids.append(new_ast)
-                        
-                    asteroid_coords = {a.get_pos() for a in asteroids}
-
-                    #Monster Movement
-                    for monster in monsters:
-                        # Pass the global turn count to the move function
-                        monster.move((town_x, town_y), map_state['turn_count'], obstacles=asteroid_coords)
-                        #Monster-initiated Encounter Check
-                        # Check if a monster moved onto the player's square
-                        if (player_x, player_y) == monster.get_pos():
-                            map_state['active_encounter'] = monster
-                            action = ACTION_MONSTER_ENCOUNTER
-                            running = False
-                            break #Exit monster loop
-                    if not running:
-                        break #Exit event loop
-                    
-                    #Check for Town Return
-                    if (player_x, player_y) == (town_x, town_y):
-                        #Only return to town if they've moved away first
-                        if map_state['moved_from_town']:
-                            action = ACTION_RETURN_TO_TOWN
-                            running = False
-                        #Mark that the player has moved away from town for the first time
-                    elif dx != 0 or dy != 0:
-                        map_state['moved_from_town'] = True               
-                            # Drawing
-        screen.fill((0, 0, 0)) #Black background
-        #Tiled Background
-        if bg_variants:
-            bg_grid = map_state['bg_grid']
-            for x in range(GRID_SIZE):
-                for y in range(GRID_SIZE):
-                    variant_index = bg_grid[x][y]
-                    screen.blit(bg_variants[variant_index], (x * TILE_SIZE, y * TILE_SIZE))
-        #Draw Town 
-        if town_sprite:
-            screen.blit(town_sprite, (town_x * TILE_SIZE, town_y * TILE_SIZE))
-        else:
-            town_center = (town_x * TILE_SIZE + TILE_SIZE // 2, town_y * TILE_SIZE + TILE_SIZE // 2)
-            pygame.draw.circle(screen, (0, 150, 0), town_center, TILE_SIZE // 3)
-        #Draw asteroid
-        for ast in asteroids:
-            ax, ay = ast.get_pos()
-            if ast.sprite:
-                screen.blit(ast.sprite, (ax * TILE_SIZE, ay * TILE_SIZE))
-            else:
-                # Draw grey circle if no sprite
-                a_center = (ax * TILE_SIZE + TILE_SIZE // 2, ay * TILE_SIZE + TILE_SIZE // 2)
-                pygame.draw.circle(screen, (100, 100, 100), a_center, TILE_SIZE // 3)
-        #Draw Monsters 
-        for monster in monsters:
-            monster_x, monster_y = monster.get_pos()
-            if (monster_x, monster_y) != (town_x, town_y):
-                 if hasattr(monster, 'sprite') and monster.sprite:
-                     screen.blit(monster.sprite, (monster_x * TILE_SIZE, monster_y * TILE_SIZE))
-                 else:
-                     monster_center = (monster_x * TILE_SIZE + TILE_SIZE // 2, monster_y * TILE_SIZE + TILE_SIZE // 2)
-                     pygame.draw.circle(screen, monster.color, monster_center, TILE_SIZE // 3)
-        
-        #Draw Player 
-        if player_sprite:
-            screen.blit(player_sprite, (player_x * TILE_SIZE, player_y * TILE_SIZE))
-        else:
-            player_rect = pygame.Rect(player_x * TILE_SIZE, player_y * TILE_SIZE, TILE_SIZE, TILE_SIZE)
-            pygame.draw.rect(screen, (255, 255, 255), player_rect, 2) #Draw white border
-        
-        pygame.display.flip() #Update the full screen
+                if event.key == pygame.K_F3 and perf.enabled:
+                    # Timing overlay, not a move
+                    perf.toggle_hud()
+                    renderer.redraw_all()
+                    continue
+                # Any other key waits a turn
+                move = key_moves.get(event.key, MOVE_WAIT)
+                replay.record_map_event(move)
+                with perf.phase('turn'):
+                    events = simulation.step(move)
+                if on_turn is not None:
+                    on_turn()
+                if events:
+                    action = events[-1]
+                    running = False
+                    break
+        # Drawing (only changed tiles are repainted)
+        renderer.set_background(map_state['bg_grid'], bg_variants)
+        renderer.overlay = perf.overlay()
+        camera.follow(simulation.player_pos)
+        renderer.draw(camera, simulation.town_pos, simulation.player_pos, simulation.occupancy,
+                      town_sprite, player_sprite)
+        perf.frame_done(frame_start)
+        frame_drawn = True
+        if loop_mode == MAP_LOOP_CAPPED:
+            clock.tick(fps)
 
-    pygame.quit() #Close Pygame window
-    
-    #Update map state with new position before returning
-    map_state['player_pos'] = (player_x, player_y)
+    # Nothing is queued while the window waits behind the menus
+    pygame.event.set_blocked(None)
+    if owns_session:
+        session.close() #Close Pygame window
     
-    return action, map_state
\ No newline at end of file
+    return action, map_state
+def run_map_headless(map_state: dict, next_move, on_turn=None, open_edges: bool = False) -> tuple[str, dict]:
+    """
+    Plays the map without a window. next_move() is called for every input and
+    returns a move, MOVE_DOCK, ACTION_QUIT, or ACTION_RETURN_TO_TOWN when the
+    map could not be opened. Otherwise the same as handle_map.
+    """
+    move = next_move()
+    if move == ACTION_RETURN_TO_TOWN:
+        return ACTION_RETURN_TO_TOWN, map_state
+    map_state['bg_grid'] = as_background(map_state.get('bg_grid'), GRID_SIZE)
+    simulation = SectorSimulation(map_state, GRID_SIZE, batched=BATCHED_ENTITIES, hunt=HUNTING_MONSTERS,
+                                  open_edges=open_edges)
+    while move != ACTION_QUIT:
+        with perf.phase('turn'):
+            events = simulation.step(move)
+        if on_turn is not None:
+            on_turn()
+        if events:
+            return events[-1], map_state
+        move = next_move()
+    return ACTION_QUIT, map_state
\ No newline at end of file
@@ -0,0 +1,133 @@
+"""
+The player's items.
+
+Inventory keeps the item dicts in the order they were added plus indexes
+by catalog id, name and type, and keeps the total defense bonus up to
+date as items come and go. Lookups, counts, adding and removing are all
+O(1). Saves still use the plain list of dicts from to_list().
+"""
+import catalog
+
+
+def _item_id(item: dict):
+    """Catalog id of an item. Items from older saves have no id, so look it up by name."""
+    item_id = item.get('id')
+    if item_id is None:
+        for template in catalog.get().items:
+            if template['name'] == item.get('name'):
+                return template['id']
+    return item_id
+
+
+class Inventory:
+    def __init__(self, items=None):
+        self._next_key = 0
+        # key -> item, in the order the items were added
+        self._items = {}
+        # id(item) -> key, items are matched by identity
+        self._keys = {}
+        # key -> values the item was indexed under
+        self._indexed = {}
+        # index name -> value -> {key: item}
+        self._by = {'id': {}, 'name': {}, 'type': {}}
+        self.total_defense = 0
+        for item in items or ():
+            self.add(item)
+
+    @classmethod
+    def from_list(cls, items: list) -> "Inventory":
+        return cls(items)
+
+    def to_list(self) -> list:
+        """The list of item dicts written to saves."""
+        return list(self._items.values())
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def __iter__(self):
+        return iter(list(self._items.values()))
+
+    def __contains__(self, item) -> bool:
+        return id(item) in self._keys
+
+    def _index_values(self, item: dict) -> dict:
+        return {'id': _item_id(item), 'name': item.get('name'), 'type': item.get('type')}
+
+    def add(self, item: dict) -> None:
+        if item in self:
+            raise ValueError("item is already in the inventory")
+        key = self._next_key
+        self._next_key += 1
+        self._items[key] = item
+        self._keys[id(item)] = key
+        values = self._indexed[key] = self._index_values(item)
+        for index, value in values.items():
+            self._by[index].setdefault(value, {})[key] = item
+        self.total_defense += item.get('defense_bonus', 0)
+
+    def remove(self, item: dict) -> None:
+        """Removes this exact item dict. Raises ValueError if it is not in the inventory."""
+        key = self._keys.pop(id(item), None)
+        if key is None:
+            raise ValueError("item is not in the inventory")
+        del self._items[key]
+        for index, value in self._indexed.pop(key).items():
+            bucket = self._by[index][value]
+            del bucket[key]
+            if not bucket:
+                del self._by[index][value]
+        self.total_defense -= item.get('defense_bonus', 0)
+
+    def _first(self, index: str, value):
+        bucket = self._by[index].get(value)
+        return next(iter(bucket.values())) if bucket else None
+
+    def find_id(self, item_id: str):
+        """First item with this catalog id, or None."""
+        return self._first('id', item_id)
+
+    def find_name(self, name: str):
+        """First item with this name, or None."""
+        return self._first('name', name)
+
+    def count_name(self, name: str) -> int:
+        return len(self._by['name'].get(name, ()))
+
+    def has_id(self, item_id: str) -> bool:
+        return item_id in self._by['id']
+
+    def has_name(self, name: str) -> bool:
+        return name in self._by['name']
+
+    def of_type(self, item_type: str) -> list:
+        """Items of one type in the order they were added."""
+        return list(self._by['type'].get(item_type, {}).values())
+
+    def pop_id(self, item_id: str):
+        """Removes and returns the first item with this catalog id, or None."""
+        item = self.find_id(item_id)
+        if item is not None:
+            self.remove(item)
+        return item
+
+    def remove_matching(self, item: dict):
+        """
+        Removes item itself if it is in the inventory, otherwise an equal item
+        with the same name, otherwise the first item with that name.
+        Returns the removed item or None.
+        """
+        if item not in self:
+            same_name = self._by['name'].get(item.get('name'), {}).values()
+            item = next((other for other in same_name if other == item), None) or next(iter(same_name), None)
+            if item is None:
+                return None
+        self.remove(item)
+        return item
+
+
+def as_inventory(items) -> Inventory:
+    """Returns items as an Inventory, converting a plain list of item dicts."""
+    if isinstance(items, Inventory):
+        return items
+    return Inventory(items)
@@ -0,0 +1,544 @@
+"""
+Menus as state machines that take one command at a time.
+
+A menu never asks for input itself. Its driver calls start() once, then
+while not done: show() to print the menu, and handle(command) with the
+player's answer to prompt. Menus print like the terminal game does, and
+open() and send() capture that print output and return it as text, so
+one process can run many menus side by side (see server.py).
+run_in_terminal() is the driver for the terminal game (and replays),
+it reads each command with replay.read_input.
+
+    menu = ShopMenu(gold, inventory)
+    text = menu.open()
+    while not menu.done:
+        text = menu.send(answer_to(text, menu.prompt))
+    gold, inventory = menu.gold, menu.inventory
+"""
+import contextlib
+import io
+import combatsolver
+import gamefunctions
+import replay
+import rngs
+from camera import as_background
+from inventory import Inventory, as_inventory
+from simulation import (
+    SectorSimulation, ACTION_MONSTER_ENCOUNTER, MOVE_UP, MOVE_DOWN, MOVE_LEFT, MOVE_RIGHT, MOVE_WAIT, MOVE_DOCK
+)
+
+REPAIR_COST = 5
+
+
+def captured(fn, *args) -> str:
+    """Runs fn and returns what it printed."""
+    out = io.StringIO()
+    with contextlib.redirect_stdout(out):
+        fn(*args)
+    return out.getvalue()
+
+
+class Menu:
+    prompt = "> "
+    done = False
+
+    def start(self) -> None:
+        """Prints what appears on entering the menu. May already finish it."""
+
+    def show(self) -> None:
+        """Prints the menu before each command."""
+
+    def handle(self, command: str) -> None:
+        raise NotImplementedError
+
+    def _open(self) -> None:
+        self.start()
+        if not self.done:
+            self.show()
+
+    def _send(self, command: str) -> None:
+        self.handle(command.strip())
+        if not self.done:
+            self.show()
+
+    def open(self) -> str:
+        """start() and the first show(), returned as text."""
+        return captured(self._open)
+
+    def send(self, command: str) -> str:
+        """Handles one command and shows the menu again (unless done), returned as text."""
+        return captured(self._send, command)
+
+
+def run_in_terminal(menu: Menu) -> Menu:
+    """Plays menu with input from the terminal (or the running replay) until it is done. Returns it."""
+    menu.start()
+    while not menu.done:
+        menu.show()
+        menu.handle(replay.read_input(menu.prompt))
+    return menu
+
+
+class ShopMenu(Menu):
+    """handle_shop. Finished by choice 0, then gold and inventory hold the result."""
+    prompt = "\nEnter choice: "
+
+    def __init__(self, player_gold: int, player_inventory: Inventory):
+        self.gold = player_gold
+        self.inventory = as_inventory(player_inventory)
+        self.done = False
+
+    def show(self) -> None:
+        shop = gamefunctions.CATALOG.shop
+        print("\n" + "="*40)
+        print(f"      SHOP | Credits: {self.gold}")
+        print("="*40)
+
+        print(f"{'#':<4} {'Item':<18} {'Price':<8} {'Description'}")
+        print("-" * 40)
+        for i, item in enumerate(shop):
+            print(f"{i+1:<4} {item['name']:<18} {item['price']:<8} {item.get('desc', '')}")
+        print("-" * 40)
+        print("0)   Exit Shop")
+
+    def handle(self, choice: str) -> None:
+        shop = gamefunctions.CATALOG.shop
+        if choice == "0":
+            print("\nThanks for shopping!")
+            self.done = True
+            return
+        if not choice.isdigit():
+            print("\nInvalid input.")
+            return
+        index = int(choice) - 1
+        if not 0 <= index < len(shop):
+            print("\nInvalid selection.")
+            return
+        item_template = shop[index]
+        price = item_template['price']
+        if item_template.get("unique", False) and self.inventory.has_name(item_template['name']):
+            print(f"\nYou already have a {item_template['name']} installed. You cannot carry another.")
+            return
+        if self.gold < price:
+            print(f"\nNot enough credits! You need {price} credits.")
+            return
+        self.gold -= price
+        new_item = gamefunctions.CATALOG.new_item(item_template['id'])
+        self.inventory.add(new_item)
+        print(f"\n*** Purchased {new_item['name']} for {price} credits! ***")
+
+
+class EquipMenu(Menu):
+    """handle_equip. Finished by choice 0, then equipped_weapon and inventory hold the result."""
+    item_type = "weapon"
+
+    def __init__(self, player_inventory: Inventory, equipped_weapon: dict):
+        self.inventory = as_inventory(player_inventory)
+        self.equipped_weapon = equipped_weapon
+        self.items = []
+        self.done = False
+
+    @property
+    def prompt(self) -> str:
+        return f"Enter choice (0-{len(self.items) + 1}): "
+
+    def start(self) -> None:
+        self.items = [item for item in self.inventory.of_type(self.item_type)
+                      if item.get("currentDurability", 1) > 0]
+        if not self.items:
+            print(f"\nYou have no functioning {self.item_type}s to equip.")
+            self.done = True
+
+    def show(self) -> None:
+        print("\n--- Equip Weapon ---")
+        print(f"Currently Equipped: {self.equipped_weapon.get('name', 'None').capitalize()}")
+        print(f"\nAvailable {self.item_type.capitalize()}s:")
+        for i, item in enumerate(self.items):
+            display_name = item['name'].capitalize()
+            if 'currentDurability' in item:
+                display_name += f" (Durability: {item['currentDurability']}/{item['maxDurability']})"
+            print(f"  {i+1}) {display_name}")
+        print(f"  {len(self.items) + 1}) Unequip Current Weapon")
+        print("  0) Back to Town Menu")
+        print("=" * 30)
+
+    def handle(self, choice: str) -> None:
+        if choice == "0":
+            self.done = True
+            return
+        if not choice.isdigit():
+            print("\nInvalid input. Please enter a number.")
+            return
+        choice_num = int(choice)
+        if choice_num == len(self.items) + 1:
+            if self.equipped_weapon:
+                print(f"\n{self.equipped_weapon['name'].capitalize()} has been unequipped.")
+                self.equipped_weapon = {}
+            else:
+                print("\nNothing is currently equipped.")
+        elif 1 <= choice_num <= len(self.items):
+            self.equipped_weapon = self.items[choice_num - 1]
+            print(f"\n** {self.equipped_weapon['name'].capitalize()} is now equipped! **")
+        else:
+            print("\nInvalid selection number.")
+
+
+class FightMenu(Menu):
+    """handle_fight. Finished when one side is down, the player fled or used an EMP."""
+
+    def __init__(self, player_hp: int, player_gold: int, player_power: int, equipped_weapon: dict,
+                 player_inventory: Inventory, monster):
+        self.player_hp = player_hp
+        self.player_gold = player_gold
+        self.player_power = player_power
+        self.equipped_weapon = equipped_weapon
+        self.inventory = as_inventory(player_inventory)
+        self.monster = monster
+        self.monster_hp = monster.health
+        self.won = False
+        self.done = False
+
+    @property
+    def has_emp(self) -> bool:
+        return self.inventory.has_id('emp')
+
+    @property
+    def prompt(self) -> str:
+        return "Enter your choice (1-3): " if self.has_emp else "Enter your choice (1-2): "
+
+    def start(self) -> None:
+        print(f"\nYou encounter a {self.monster.name} ship!")
+        print(f"> {self.monster.description}")
+        if self.player_hp <= 0 or self.monster_hp <= 0:
+            self._finish()
+
+    def show(self) -> None:
+        gamefunctions.display_fight_stats(self.player_hp, self.monster.name, self.monster_hp)
+        weapon = self.equipped_weapon
+        odds = combatsolver.fight_odds(
+            self.player_hp, self.monster_hp,
+            weapon.get('currentDurability', 0) if weapon else 0,
+            combatsolver.make_matchup(self.player_power, weapon, self.inventory.total_defense, self.monster)
+        )
+        print(f"Odds if you keep fighting: {odds.win:.0%} win, {odds.lose:.0%} lose")
+        print("What will you do?")
+        print("  1) Fight")
+        print("  2) Run")
+        if self.has_emp:
+            print("  3) Use EMP (Destroy Enemy)")
+
+    def handle(self, action: str) -> None:
+        monster = self.monster
+        name = monster.name
+        if action == "1":
+            self.player_hp, self.monster_hp, self.equipped_weapon = gamefunctions.handle_fight_turn(
+                self.player_hp, self.player_power,
+                self.monster_hp, monster.power, name,
+                self.equipped_weapon,
+                total_defense=self.inventory.total_defense,
+                monster_crit_chance=getattr(monster, 'crit_chance', 0.05),
+                monster_crit_multiplier=getattr(monster, 'crit_multiplier', 1.5),
+                monster_miss_chance=getattr(monster, 'miss_chance', 0.05)
+            )
+        elif action == "2":
+            #make fleeing only work sometimes
+            if rngs.combat.randrange(0, 100, 1) <= 80:
+                print("\nYou successfully Fled!")
+                self._finish()
+                return
+            print("\nYou did not get away!")
+            self.player_hp -= monster.power
+            print(f"The {name} attacks you in your failed attempt to flee, dealing {monster.power} damage.")
+        elif action == "3" and self.has_emp:
+            print(f"\nYou sent an EMP! The {name} ship is destroyed.")
+            self.inventory.pop_id('emp')
+            self.monster_hp = 0
+            self._finish()
+            return
+        else:
+            print("\nUnrecognized command. Try again.")
+        if self.player_hp <= 0 or self.monster_hp <= 0:
+            self._finish()
+
+    def _finish(self) -> None:
+        weapon = self.equipped_weapon
+        # If the equipped weapon broke during the fight, unequip it here.
+        if weapon and weapon.get('currentDurability', 0) <= 0:
+            print(f"\nYour {weapon['name'].capitalize()} has burned out!")
+            print("You discard the scrap.")
+            self.inventory.remove_matching(weapon)
+        self.player_hp, self.player_gold = gamefunctions.handle_fight_end(
+            self.player_hp, self.player_gold, self.monster_hp, self.monster.name, self.monster.money)
+        self.won = self.monster_hp <= 0
+        self.done = True
+
+
+class Player:
+    """Everything about the player that game.main keeps in local variables."""
+    def __init__(self, name: str = "", hp: int = 30, max_hp: int = 50, gold: int = 10, power: int = 5,
+                 inventory: Inventory = None, equipped_weapon: dict = None):
+        self.name = name
+        self.hp = hp
+        self.max_hp = max_hp
+        self.gold = gold
+        self.power = power
+        self.inventory = inventory if inventory is not None else Inventory()
+        self.equipped_weapon = equipped_weapon if equipped_weapon is not None else {}
+
+
+def new_map_state(town_pos: tuple = (0, 0)) -> dict:
+    """Map state of a new game."""
+    return {
+        'player_pos': town_pos,
+        'town_pos': town_pos,
+        'monsters': gamefunctions.populate_monsters(2, town_pos),
+        'asteroids': [],
+        'moved_from_town': False,
+        'turn_count': 0
+    }
+
+
+# Game states
+STATE_NAME = "name"
+STATE_TOWN = "town"
+STATE_MAP = "map"
+STATE_MENU = "menu"   # in a shop, equip or fight menu
+STATE_DEAD = "dead"
+STATE_OVER = "over"
+
+# Text map commands
+MAP_COMMANDS = {
+    'w': MOVE_UP, 'up': MOVE_UP,
+    's': MOVE_DOWN, 'down': MOVE_DOWN,
+    'a': MOVE_LEFT, 'left': MOVE_LEFT,
+    'd': MOVE_RIGHT, 'right': MOVE_RIGHT,
+    '.': MOVE_WAIT, 'wait': MOVE_WAIT,
+    'e': MOVE_DOCK, 'dock': MOVE_DOCK,
+}
+MAP_QUIT = ('q', 'quit')
+
+
+class Game(Menu):
+    """
+    The whole game from the name prompt on, the same as game.main: town
+    menu, shop, equip, map, fights and respawning. The map is played
+    with text commands, one turn each (see MAP_COMMANDS).
+    """
+    def __init__(self, player: Player = None, map_state: dict = None, ask_name: bool = True):
+        self.player = player if player is not None else Player()
+        self.map_state = map_state if map_state is not None else new_map_state()
+        self.state = STATE_NAME if ask_name else None
+        self.submenu = None
+        self.simulation = None
+        self.quit_abruptly = False
+        self.done = False
+
+    @property
+    def prompt(self) -> str:
+        if self.state == STATE_MENU:
+            return self.submenu.prompt
+        if self.state == STATE_NAME:
+            return "What is your name? "
+        if self.state == STATE_TOWN:
+            return "Enter your choice (1-6): "
+        if self.state == STATE_MAP:
+            return "Move (w/a/s/d, . wait, e dock, q quit): "
+        if self.state == STATE_DEAD:
+            return ("Would you like to (1) Respawn at Station or "
+                    "(2) Embrace the unforgiving vaccuum of space? ")
+        return ""
+
+    @property
+    def at_town(self) -> bool:
+        return self.map_state['player_pos'] == self.map_state['town_pos']
+
+    def start(self) -> None:
+        if self.state == STATE_NAME:
+            print("Welcome to the Space Game!")
+        else:
+            self._advance()
+
+    def _advance(self) -> None:
+        """Picks the next state after a command, like the top of game.main's loop."""
+        if self.player.hp <= 0:
+            self.state = STATE_DEAD
+        elif self.at_town:
+            self.state = STATE_TOWN
+        else:
+            self._enter_map()
+
+    def _enter_map(self) -> None:
+        if self.state != STATE_MAP:
+            # Made on the first text command, game.main plays the map in its window instead
+            self.simulation = None
+        self.state = STATE_MAP
+
+    def _open_submenu(self, menu: Menu) -> None:
+        menu.start()
+        if menu.done:
+            self._close_submenu(menu)
+        else:
+            self.submenu = menu
+            self.state = STATE_MENU
+
+    def _close_submenu(self, menu: Menu) -> None:
+        player = self.player
+        self.submenu = None
+        self.state = None
+        if isinstance(menu, ShopMenu):
+            player.gold, player.inventory = menu.gold, menu.inventory
+        elif isinstance(menu, EquipMenu):
+            player.equipped_weapon, player.inventory = menu.equipped_weapon, menu.inventory
+        elif isinstance(menu, FightMenu):
+            player.hp, player.gold = menu.player_hp, menu.player_gold
+            player.equipped_weapon, player.inventory = menu.equipped_weapon, menu.inventory
+            self.fight_over(menu.monster, menu.won)
+        self._advance()
+
+    def fight_over(self, monster, won: bool) -> None:
+        map_state = self.map_state
+        map_state.pop('active_encounter', None)
+        if not won:
+            return
+        map_state['monsters'].remove(monster)
+        # If all monsters are cleared, spawn 2 new ones
+        if not map_state['monsters']:
+            print("\nThe sector is clear... for now. New opponents appear!")
+            map_state['monsters'].extend(gamefunctions.populate_monsters(
+                2, map_state['town_pos'], blocked=[map_state['player_pos']]))
+
+    def map_action(self, action) -> None:
+        """Carries on after a map action (None, a simulation event or ACTION_QUIT)."""
+        if action == gamefunctions.ACTION_QUIT:
+            print("\nGame closed abruptly.")
+            self.quit_abruptly = True
+            self._end()
+        elif action == ACTION_MONSTER_ENCOUNTER:
+            player = self.player
+            self._open_submenu(FightMenu(player.hp, player.gold, player.power, player.equipped_weapon,
+                                         player.inventory, self.map_state['active_encounter']))
+        elif action is not None:
+            self.state = None
+            self._advance()
+
+    def _end(self) -> None:
+        self.state = STATE_OVER
+        self.done = True
+
+    def show(self) -> None:
+        if self.state == STATE_MENU:
+            self.submenu.show()
+        elif self.state == STATE_TOWN:
+            self._show_town()
+        elif self.state == STATE_MAP:
+            self._show_map()
+        elif self.state == STATE_DEAD:
+            print("\n" + "!"*40)
+            print("CRITICAL FAILURE: Your ship has been destroyed!")
+            print("!"*40)
+
+    def _show_town(self) -> None:
+        player = self.player
+        print("\n" + "-"*20)
+        print("You are at the Space Station.")
+        print(f"Current HP: {player.hp}/{player.max_hp}")
+        print(f"Current Credits: {player.gold}")
+        weapon = player.equipped_weapon
+        if weapon:
+            print(f"Auxilary Weapons: {weapon.get('name', 'Unknown').capitalize()} "
+                  f"(Charge: {weapon.get('currentDurability', 0)}/{weapon.get('maxDurability', 0)})")
+        else:
+            print("Auxilary Weapons: None")
+        print("\nWhat would you like to do?")
+        print("  1) Leave station (Explore Space)")
+        print("  2) Shipyard (Repair Ship for 5 Credits)")
+        print("  3) Visit Shop")
+        print("  4) Equip Weapons")
+        print("  5) Save and Quit")
+        print("  6) Quit (No Save)")
+
+    def _show_map(self) -> None:
+        map_state = self.map_state
+        size = gamefunctions.GRID_SIZE
+        cells = {}
+        for ast in map_state.get('asteroids', []):
+            cells[ast.get_pos()] = 'O'
+        for monster in map_state['monsters']:
+            cells[monster.get_pos()] = 'M'
+        cells[tuple(map_state['town_pos'])] = 'S'
+        cells[tuple(map_state['player_pos'])] = '@'
+        print()
+        for y in range(size):
+            print(" ".join(cells.get((x, y), '.') for x in range(size)))
+
+    def handle(self, command: str) -> None:
+        state = self.state
+        if state == STATE_MENU:
+            menu = self.submenu
+            menu.handle(command)
+            if menu.done:
+                self._close_submenu(menu)
+        elif state == STATE_NAME:
+            self.player.name = command
+            gamefunctions.print_welcome(command, 50)
+            self._advance()
+        elif state == STATE_TOWN:
+            self._handle_town(command)
+        elif state == STATE_MAP:
+            self._handle_map(command)
+        elif state == STATE_DEAD:
+            if command == "1":
+                print("\nRescue teams have recovered your escape pod.")
+                print("Your ship has been rebuilt at the station.")
+                self.player.hp = self.player.max_hp
+                self.map_state['player_pos'] = self.map_state['town_pos']
+                self.map_state['moved_from_town'] = False
+                self.state = None
+                self._advance()
+            else:
+                print("You would...")
+                self._end()
+
+    def _handle_town(self, choice: str) -> None:
+        player = self.player
+        if choice == "1":
+            self.state = None
+            self._enter_map()
+        elif choice == "2":
+            player.hp, player.gold = gamefunctions.handle_sleep(player.hp, player.gold, player.max_hp, REPAIR_COST)
+        elif choice == "3":
+            self._open_submenu(ShopMenu(player.gold, player.inventory))
+        elif choice == "4":
+            self._open_submenu(EquipMenu(player.inventory, player.equipped_weapon))
+        elif choice == "5":
+            self.save()
+            print(f"\nGoodbye, {player.name}!")
+            self._end()
+        elif choice == "6":
+            print(f"\nGoodbye, {player.name}!")
+            self._end()
+        else:
+            print("\nInvalid choice. Please enter a valid number.")
+
+    def save(self) -> None:
+        """Town choice 5. Nothing to save to here, game.TerminalGame saves to a file."""
+        print("\nThis session can't be saved.")
+
+    def _handle_map(self, command: str) -> None:
+        command = command.lower()
+        if command in MAP_QUIT:
+            self.map_action(gamefunctions.ACTION_QUIT)
+            return
+        move = MAP_COMMANDS.get(command)
+        if move is None:
+            print("\nUnknown move.")
+            return
+        if self.simulation is None:
+            self.map_state['bg_grid'] = as_background(self.map_state.get('bg_grid'), gamefunctions.GRID_SIZE)
+            self.simulation = SectorSimulation(self.map_state, gamefunctions.GRID_SIZE,
+                                               batched=gamefunctions.BATCHED_ENTITIES,
+                                               hunt=gamefunctions.HUNTING_MONSTERS)
+        events = self.simulation.step(move)
+        if events:
+            self.state = None
+            self.map_action(events[-1])
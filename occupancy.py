@@ -0,0 +1,123 @@
+"""
+Array-backed index of what is on each cell of a sector.
+
+Every cell has a slot per layer (monsters, asteroids) so "what is at
+(x, y)" and "is this cell free" are single list lookups. Entities are
+re-indexed in place when they move instead of rebuilding sets each turn.
+"""
+
+LAYER_MONSTER = 0
+LAYER_ASTEROID = 1
+
+
+class OccupancyGrid:
+    def __init__(self, grid_size: int, town_pos: tuple = None, player_pos: tuple = None):
+        self.grid_size = grid_size
+        self.town_pos = town_pos
+        self.player_pos = player_pos
+        cells = grid_size * grid_size
+        # layer -> flat list of cells, each None or a list of entities
+        self._layers = ([None] * cells, [None] * cells)
+
+    def _index(self, pos):
+        x, y = pos
+        if 0 <= x < self.grid_size and 0 <= y < self.grid_size:
+            return x * self.grid_size + y
+        return None
+
+    def in_bounds(self, pos) -> bool:
+        return self._index(pos) is not None
+
+    def add(self, layer: int, entity, pos: tuple = None) -> None:
+        """Indexes entity at pos (its current position by default). Off-grid entities are ignored."""
+        i = self._index(entity.get_pos() if pos is None else pos)
+        if i is None:
+            return
+        cells = self._layers[layer]
+        if cells[i] is None:
+            cells[i] = [entity]
+        else:
+            cells[i].append(entity)
+
+    def remove(self, layer: int, entity, pos: tuple = None) -> None:
+        """Removes entity from the cell at pos (its current position by default)."""
+        i = self._index(entity.get_pos() if pos is None else pos)
+        if i is None:
+            return
+        cells = self._layers[layer]
+        cell = cells[i]
+        if cell is not None and entity in cell:
+            cell.remove(entity)
+            if not cell:
+                cells[i] = None
+
+    def move(self, layer: int, entity, old_pos: tuple, new_pos: tuple = None) -> None:
+        """Call after an entity moved from old_pos to new_pos (its current position by default)."""
+        if new_pos is None:
+            new_pos = entity.get_pos()
+        if new_pos != old_pos:
+            self.remove(layer, entity, old_pos)
+            self.add(layer, entity, new_pos)
+
+    def at(self, layer: int, pos: tuple) -> list:
+        """Returns the entities of a layer on pos. Do not modify the list."""
+        i = self._index(pos)
+        if i is None:
+            return []
+        return self._layers[layer][i] or []
+
+    def first(self, layer: int, pos: tuple):
+        """Returns one entity of a layer on pos, or None."""
+        i = self._index(pos)
+        if i is None:
+            return None
+        cell = self._layers[layer][i]
+        return cell[0] if cell else None
+
+    def has(self, layer: int, pos: tuple) -> bool:
+        i = self._index(pos)
+        return i is not None and self._layers[layer][i] is not None
+
+    def cells(self, layer: int) -> list:
+        """The flat per-cell list of a layer (index x * grid_size + y). Do not modify it."""
+        return self._layers[layer]
+
+    def is_free(self, pos: tuple) -> bool:
+        """True if pos is on the grid and nothing (not even the player or station) is there."""
+        i = self._index(pos)
+        if i is None:
+            return False
+        return (pos != self.player_pos and pos != self.town_pos
+                and self._layers[LAYER_MONSTER][i] is None
+                and self._layers[LAYER_ASTEROID][i] is None)
+
+    def blockers(self, ignore=None, layers=(LAYER_MONSTER, LAYER_ASTEROID)):
+        """
+        Returns a set-like view for code that checks `pos in blocked`.
+        The cell of ignore (the entity doing the check) never counts as blocked.
+        """
+        return _BlockedView(self, ignore.get_pos() if ignore is not None else None, layers)
+
+
+class _BlockedView:
+    """Read-only stand-in for a set of blocked positions, backed by the grid."""
+    __slots__ = ('grid', 'ignore_pos', 'layers')
+
+    def __init__(self, grid, ignore_pos, layers):
+        self.grid = grid
+        self.ignore_pos = ignore_pos
+        self.layers = layers
+
+    def __contains__(self, pos) -> bool:
+        if pos == self.ignore_pos:
+            return False
+        grid = self.grid
+        i = grid._index(pos)
+        if i is None:
+            return False
+        if pos == grid.player_pos or pos == grid.town_pos:
+            return True
+        for layer in self.layers:
+            if grid._layers[layer][i] is not None:
+                return True
+        return False
@@ -0,0 +1,224 @@
+"""
+Per-phase timing for the map loop.
+
+Code marks its phases with
+
+    with perf.phase('monsters'):
+        ...
+
+and every sample goes into a rolling histogram for that phase. While
+timing is disabled (the default) phase() hands back one shared no-op
+context, so the instrumented code costs a function call per phase.
+
+Phases timed by the map loop:
+
+    events     polling for input (time spent waiting for a key is 'idle')
+    turn       one SectorSimulation.step
+    asteroids  asteroid movement and respawning, inside 'turn'
+    monsters   monster movement, inside 'turn'
+    blit       drawing background and tiles into the screen surface
+    flip       pushing the frame to the window
+    frame      one pass of the map loop, input to drawn frame
+
+enable() turns timing on, with an optional summary dumped to a JSON file
+at exit. The overlay (toggled with F3 on the map) shows FPS and the
+recent mean of each phase.
+"""
+import atexit
+import json
+import time
+from bisect import bisect_right
+from collections import deque
+from contextlib import nullcontext
+
+# Samples kept per phase for the percentiles and the overlay
+WINDOW = 300
+# Upper bounds of the cumulative histogram buckets, in ms (the last bucket is open)
+BUCKETS_MS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 16.7, 33.3, 50, 100, 250)
+# Phases the overlay lists, in this order
+HUD_PHASES = ('frame', 'events', 'turn', 'asteroids', 'monsters', 'blit', 'flip')
+
+_NULL = nullcontext()
+
+enabled = False
+hud_visible = False
+histograms = {}
+_frame_times = deque(maxlen=60)
+_dump_file = None
+_hud = None
+
+
+class Histogram:
+    """Rolling window of recent samples plus counts over the whole run."""
+    __slots__ = ('recent', 'count', 'total', 'max', 'buckets')
+
+    def __init__(self):
+        self.recent = deque(maxlen=WINDOW)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.buckets = [0] * (len(BUCKETS_MS) + 1)
+
+    def add(self, ms: float) -> None:
+        self.recent.append(ms)
+        self.count += 1
+        self.total += ms
+        if ms > self.max:
+            self.max = ms
+        self.buckets[bisect_right(BUCKETS_MS, ms)] += 1
+
+    def recent_mean(self) -> float:
+        return sum(self.recent) / len(self.recent) if self.recent else 0.0
+
+    def percentile(self, pct: float) -> float:
+        """Nearest-rank percentile of the recent samples."""
+        if not self.recent:
+            return 0.0
+        ordered = sorted(self.recent)
+        return ordered[max(0, min(len(ordered) - 1, round(pct / 100 * len(ordered)) - 1))]
+
+    def summary(self) -> dict:
+        buckets = {f"<={bound}": n for bound, n in zip(BUCKETS_MS, self.buckets)}
+        buckets[f">{BUCKETS_MS[-1]}"] = self.buckets[-1]
+        return {
+            'count': self.count,
+            'total_ms': self.total,
+            'mean_ms': self.total / self.count if self.count else 0.0,
+            'max_ms': self.max,
+            'recent_p50_ms': self.percentile(50),
+            'recent_p90_ms': self.percentile(90),
+            'recent_p99_ms': self.percentile(99),
+            'buckets': buckets
+        }
+
+
+class _Phase:
+    __slots__ = ('name', 'start')
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        record(self.name, time.perf_counter() - self.start)
+        return False
+
+
+def phase(name: str):
+    """Context manager timing one phase, a no-op while timing is disabled."""
+    if not enabled:
+        return _NULL
+    return _Phase(name)
+
+
+def record(name: str, seconds: float) -> None:
+    histogram = histograms.get(name)
+    if histogram is None:
+        histogram = histograms[name] = Histogram()
+    histogram.add(seconds * 1000)
+
+
+now = time.perf_counter
+
+
+def frame_done(start: float) -> None:
+    """Marks the end of a drawn frame that started at now() == start, for 'frame' and the FPS count."""
+    if enabled:
+        end = time.perf_counter()
+        record('frame', end - start)
+        _frame_times.append(end)
+
+
+def fps() -> float:
+    """Frames drawn per second over the last few frames."""
+    if len(_frame_times) < 2:
+        return 0.0
+    span = _frame_times[-1] - _frame_times[0]
+    return (len(_frame_times) - 1) / span if span > 0 else 0.0
+
+
+def summary() -> dict:
+    return {'fps': fps(), 'phases': {name: h.summary() for name, h in sorted(histograms.items())}}
+
+
+def dump(filename: str) -> None:
+    with open(filename, 'w') as f:
+        json.dump(summary(), f, indent=2)
+
+
+def _dump_at_exit() -> None:
+    if _dump_file is not None and histograms:
+        dump(_dump_file)
+        print(f"Timing summary written to '{_dump_file}'.")
+
+
+def enable(dump_file: str = None, hud: bool = False) -> None:
+    """Turns timing on. With dump_file the summary is written there at exit."""
+    global enabled, hud_visible, _dump_file
+    enabled = True
+    hud_visible = hud
+    if dump_file is not None:
+        if _dump_file is None:
+            atexit.register(_dump_at_exit)
+        _dump_file = dump_file
+
+
+def disable() -> None:
+    global enabled, hud_visible
+    enabled = False
+    hud_visible = False
+
+
+def reset() -> None:
+    histograms.clear()
+    _frame_times.clear()
+
+
+def toggle_hud() -> bool:
+    """Shows or hides the overlay (only while timing is enabled). Returns whether it is shown."""
+    global hud_visible
+    hud_visible = enabled and not hud_visible
+    return hud_visible
+
+
+def overlay():
+    """The overlay for MapRenderer, or None when it is hidden."""
+    global _hud
+    if not hud_visible:
+        return None
+    if _hud is None:
+        _hud = Hud()
+    return _hud
+
+
+class Hud:
+    """Box in the top left corner with FPS and recent per-phase means."""
+    LINE_HEIGHT = 14
+    WIDTH = 150
+    PADDING = 4
+
+    def __init__(self):
+        import pygame
+        if not pygame.font.get_init():
+            pygame.font.init()
+        self.font = pygame.font.Font(None, 18)
+        height = self.PADDING * 2 + self.LINE_HEIGHT * (len(HUD_PHASES) + 1)
+        self.rect = pygame.Rect(0, 0, self.WIDTH, height)
+
+    def draw(self, screen):
+        """Draws the overlay onto screen. Returns the rect that changed."""
+        lines = [f"FPS {fps():6.1f}"]
+        for name in HUD_PHASES:
+            histogram = histograms.get(name)
+            mean = histogram.recent_mean() if histogram is not None else 0.0
+            lines.append(f"{name:<10}{mean:7.2f} ms")
+        # Opaque and always the same size, so no old text shows through
+        screen.fill((0, 0, 0), self.rect)
+        y = self.PADDING
+        for line in lines:
+            screen.blit(self.font.render(line, True, (255, 255, 0)), (self.PADDING, y))
+            y += self.LINE_HEIGHT
+        return self.rect
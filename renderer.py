@@ -0,0 +1,160 @@
+"""
+Draws the map screen.
+
+Only the part of the sector inside the camera is drawn. The background
+is composed into one cached surface per chunk, and when the camera has
+not moved only the tiles that changed since the last frame are
+repainted and pushed to the display.
+"""
+import pygame
+import perf
+from occupancy import LAYER_MONSTER, LAYER_ASTEROID
+
+COLOR_BLACK = (0, 0, 0)
+COLOR_TOWN = (0, 150, 0)
+COLOR_ASTEROID = (100, 100, 100)
+COLOR_PLAYER = (255, 255, 255)
+
+MAX_CACHED_CHUNKS = 64
+
+
+class MapRenderer:
+    def __init__(self, screen, tile_size):
+        self.screen = screen
+        self.tile_size = tile_size
+        self.background = None
+        self.bg_variants = []
+        self._bg_key = None
+        # (cx, cy) -> pre-rendered chunk surface, oldest first
+        self._chunk_surfaces = {}
+        # tile -> what was drawn there last frame
+        self._last_frame = {}
+        self._last_view = None
+        self._needs_full_redraw = True
+        # Drawn over the map before every update, see perf.Hud
+        self.overlay = None
+
+    def set_background(self, background, bg_variants):
+        """Drops the cached chunk surfaces only if the background or tiles changed."""
+        key = (id(background), tuple(id(v) for v in bg_variants))
+        if key == self._bg_key:
+            return
+        self._bg_key = key
+        self.background = background
+        self.bg_variants = bg_variants
+        self._chunk_surfaces = {}
+        self._needs_full_redraw = True
+
+    def invalidate(self):
+        """Forces the background to be rebuilt and the whole screen repainted."""
+        self._bg_key = None
+        self._needs_full_redraw = True
+
+    def redraw_all(self):
+        """Forces the next frame to repaint the whole screen from the cached background."""
+        self._needs_full_redraw = True
+
+    def _chunk_surface(self, cx, cy):
+        """Returns the pre-rendered background of one chunk."""
+        key = (cx, cy)
+        surface = self._chunk_surfaces.pop(key, None)
+        if surface is None:
+            size = self.background.chunk_size
+            surface = pygame.Surface((size * self.tile_size, size * self.tile_size))
+            surface.fill(COLOR_BLACK)
+            if self.bg_variants:
+                tiles = self.background.chunk(cx, cy)
+                for lx in range(size):
+                    for ly in range(size):
+                        variant = self.bg_variants[tiles[lx * size + ly]]
+                        surface.blit(variant, (lx * self.tile_size, ly * self.tile_size))
+            if len(self._chunk_surfaces) >= MAX_CACHED_CHUNKS:
+                del self._chunk_surfaces[next(iter(self._chunk_surfaces))]
+        # Re-insert so the dict stays ordered from least to most recently used
+        self._chunk_surfaces[key] = surface
+        return surface
+
+    def _build_frame(self, camera, town_pos, player_pos, occupancy, town_sprite, player_sprite):
+        """Works out what should be drawn on every occupied tile in view, in draw order."""
+        frame = {}
+        for pos in camera.visible_tiles():
+            layers = []
+            if pos == town_pos:
+                layers.append(town_sprite or ('circle', COLOR_TOWN))
+            for ast in occupancy.at(LAYER_ASTEROID, pos):
+                layers.append(ast.sprite or ('circle', COLOR_ASTEROID))
+            if pos != town_pos:
+                for monster in occupancy.at(LAYER_MONSTER, pos):
+                    layers.append(getattr(monster, 'sprite', None) or ('circle', monster.color))
+            if pos == player_pos:
+                layers.append(player_sprite or ('rect', COLOR_PLAYER))
+            if layers:
+                frame[pos] = tuple(layers)
+        return frame
+
+    def _draw_tile(self, camera, tile, layers):
+        vx, vy = camera.to_view(tile)
+        px, py = vx * self.tile_size, vy * self.tile_size
+        rect = pygame.Rect(px, py, self.tile_size, self.tile_size)
+        size = self.background.chunk_size
+        (cx, lx), (cy, ly) = divmod(tile[0], size), divmod(tile[1], size)
+        source = pygame.Rect(lx * self.tile_size, ly * self.tile_size, self.tile_size, self.tile_size)
+        self.screen.blit(self._chunk_surface(cx, cy), rect, source)
+        for layer in layers:
+            if isinstance(layer, tuple):
+                shape, color = layer
+                if shape == 'circle':
+                    center = (px + self.tile_size // 2, py + self.tile_size // 2)
+                    pygame.draw.circle(self.screen, color, center, self.tile_size // 3)
+                else:
+                    pygame.draw.rect(self.screen, color, rect, 2)
+            else:
+                self.screen.blit(layer, (px, py))
+        return rect
+
+    def _draw_view(self, camera):
+        """Blits the background of every chunk in view."""
+        self.screen.fill(COLOR_BLACK)
+        size = self.background.chunk_size
+        for cx, cy in self.background.chunks_in_view(camera):
+            vx, vy = camera.to_view((cx * size, cy * size))
+            self.screen.blit(self._chunk_surface(cx, cy), (vx * self.tile_size, vy * self.tile_size))
+
+    def draw(self, camera, town_pos, player_pos, occupancy, town_sprite=None, player_sprite=None):
+        """
+        Draws one frame of what the camera sees.
+        Only tiles whose contents changed get repainted unless the camera moved.
+        Returns the number of tiles repainted.
+        """
+        view = (camera.x, camera.y, camera.view_width, camera.view_height)
+        overlay = self.overlay
+
+        if self._needs_full_redraw or view != self._last_view:
+            with perf.phase('blit'):
+                frame = self._build_frame(camera, town_pos, player_pos, occupancy, town_sprite, player_sprite)
+                self._draw_view(camera)
+                for tile, layers in frame.items():
+                    self._draw_tile(camera, tile, layers)
+                if overlay is not None:
+                    overlay.draw(self.screen)
+            with perf.phase('flip'):
+                pygame.display.flip()
+            self._needs_full_redraw = False
+            self._last_frame = frame
+            self._last_view = view
+            return len(frame)
+
+        with perf.phase('blit'):
+            frame = self._build_frame(camera, town_pos, player_pos, occupancy, town_sprite, player_sprite)
+            last_frame = self._last_frame
+            dirty = [tile for tile in frame if frame[tile] != last_frame.get(tile)]
+            dirty.extend(tile for tile in last_frame if tile not in frame)
+            rects = [self._draw_tile(camera, tile, frame.get(tile, ())) for tile in dirty]
+            if overlay is not None:
+                # Redrawn every frame so the numbers stay current and repainted tiles don't cover it
+                rects.append(overlay.draw(self.screen))
+        if rects:
+            with perf.phase('flip'):
+                pygame.display.update(rects)
+        self._last_frame = frame
+        return len(dirty)
@@ -0,0 +1,116 @@
+"""
+Recording and replaying play sessions.
+
+While recording, every menu answer (read_input) and every map key
+(record_map_event) is logged together with the seed of the rngs streams.
+Replaying seeds the streams the same way and feeds the logged inputs back,
+and handle_map runs without a window, so the session plays out exactly
+as before and as fast as the game logic allows:
+
+    python game.py --seed 42 --record session.json
+    python game.py --replay session.json --quiet
+
+A replay only repeats the original if it starts from the same save files
+and content.json.
+"""
+import json
+
+REPLAY_VERSION = 1
+
+
+class ReplayFinished(EOFError):
+    """The replay has no more inputs."""
+
+
+class Recorder:
+    def __init__(self, seed: int):
+        self.seed = seed
+        self.events = []
+
+    def input(self, prompt: str = "") -> str:
+        text = input(prompt)
+        self.events.append(['input', text])
+        return text
+
+    def map_event(self, value) -> None:
+        """value is a move (dx, dy), MOVE_DOCK or ACTION_QUIT."""
+        self.events.append(['map', list(value) if isinstance(value, tuple) else value])
+
+    def save(self, filename: str) -> None:
+        with open(filename, 'w') as f:
+            json.dump({'version': REPLAY_VERSION, 'seed': self.seed, 'events': self.events}, f)
+
+
+class Replayer:
+    # handle_map takes its moves from map_event() instead of opening a window
+    headless = True
+
+    def __init__(self, seed: int, events: list, echo: bool = True):
+        self.seed = seed
+        self.events = events
+        self.echo = echo
+        self.position = 0
+
+    @classmethod
+    def load(cls, filename: str, echo: bool = True) -> "Replayer":
+        with open(filename, 'r') as f:
+            data = json.load(f)
+        if data.get('version', 0) > REPLAY_VERSION:
+            raise ValueError(f"Replay version {data['version']} is newer than this game supports")
+        return cls(data['seed'], data['events'], echo)
+
+    @property
+    def finished(self) -> bool:
+        return self.position >= len(self.events)
+
+    def _next(self, kind: str):
+        if self.finished:
+            raise ReplayFinished("replay has no more inputs")
+        event_kind, value = self.events[self.position]
+        if event_kind != kind:
+            raise ValueError(f"replay expected a {kind} event at {self.position} but has {event_kind}, "
+                             "the game no longer plays out the same way")
+        self.position += 1
+        return value
+
+    def input(self, prompt: str = "") -> str:
+        text = self._next('input')
+        if self.echo:
+            print(prompt + text)
+        return text
+
+    def map_event(self):
+        """Next map event, a move (dx, dy), MOVE_DOCK or ACTION_QUIT."""
+        value = self._next('map')
+        return tuple(value) if isinstance(value, list) else value
+
+
+# The Recorder, Replayer (or other input source, see botrunner.Bot) in use, None for normal play
+active = None
+
+
+def start(source) -> None:
+    global active
+    active = source
+
+
+def stop() -> None:
+    global active
+    active = None
+
+
+def is_headless() -> bool:
+    """True while map moves come from the active source's map_event() instead of the keyboard."""
+    return getattr(active, 'headless', False)
+
+
+def read_input(prompt: str = "") -> str:
+    """input() for the game's menus, recorded or replayed when a session is active."""
+    if active is None:
+        return input(prompt)
+    return active.input(prompt)
+
+
+def record_map_event(value) -> None:
+    if isinstance(active, Recorder):
+        active.map_event(value)
@@ -0,0 +1,59 @@
+"""
+Seeded random streams, one per subsystem.
+
+Every subsystem draws from its own random.Random, so a seed fixes each
+of them and one subsystem drawing more numbers (say, an extra fight
+round) does not shift what the others see. seed() re-seeds the streams
+in place, so modules can keep a reference to them.
+"""
+import random
+
+combat = random.Random()
+spawn = random.Random()
+asteroids = random.Random()
+monsters = random.Random()
+background = random.Random()
+
+STREAMS = {
+    'combat': combat,
+    'spawn': spawn,
+    'asteroids': asteroids,
+    'monsters': monsters,
+    'background': background
+}
+
+current_seed = None
+
+
+def new_seed() -> int:
+    """A fresh seed from the OS, for runs that were not given one."""
+    return random.SystemRandom().getrandbits(32)
+
+
+def seed(value: int = None) -> int:
+    """Seeds every stream from value (a new seed if None). Returns the seed used."""
+    global current_seed
+    if value is None:
+        value = new_seed()
+    for name, stream in STREAMS.items():
+        # String seeds are hashed the same way on every run and platform
+        stream.seed(f"{value}:{name}")
+    current_seed = value
+    return value
+
+
+def private_streams(value: int) -> dict:
+    """A set of streams of its own, seeded the same way seed(value) seeds the shared ones."""
+    return {name: random.Random(f"{value}:{name}") for name in STREAMS}
+
+
+def load(streams: dict) -> None:
+    """Continues the shared streams from a private set, e.g. when switching game sessions."""
+    for name, stream in STREAMS.items():
+        stream.setstate(streams[name].getstate())
+
+
+def store(streams: dict) -> None:
+    """Copies where the shared streams are now back into a private set."""
+    for name, stream in STREAMS.items():
+        streams[name].setstate(stream.getstate())
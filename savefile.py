@@ -0,0 +1,172 @@
+"""
+Compact binary save format.
+
+Layout (all little endian):
+    magic     6 bytes  b'SPCSAV'
+    version   1 byte
+    codec     1 byte   0 = none, 1 = zlib, 2 = lzma
+    body      the rest, compressed with codec:
+        meta length   4 bytes, then the meta JSON (no indent)
+        grid width    4 bytes
+        grid height   4 bytes, then one byte per background tile (bg_grid[x][y])
+
+Monster type fields (name, description, color, sprite, crit/miss) are
+written once per type in the meta and monsters only store an index into
+that table. load() hands back the same dict shape as a JSON save.
+
+Run directly to convert between formats:
+    python savefile.py savegame.json savegame.sav
+"""
+import argparse
+import json
+import lzma
+import struct
+import zlib
+
+MAGIC = b'SPCSAV'
+VERSION = 1
+CODEC_NONE = 0
+CODEC_ZLIB = 1
+CODEC_LZMA = 2
+CODEC_NAMES = {'none': CODEC_NONE, 'zlib': CODEC_ZLIB, 'lzma': CODEC_LZMA}
+
+_HEADER = struct.Struct('<6sBB')
+_U32 = struct.Struct('<I')
+_GRID = struct.Struct('<II')
+
+# Monster fields shared by every monster of a type
+MONSTER_TYPE_FIELDS = ('name', 'description', 'color', 'sprite_name', 'crit_chance', 'crit_multiplier', 'miss_chance')
+# Per-monster fields, in the order they are stored
+MONSTER_FIELDS = ('x', 'y', 'health', 'max_health', 'power', 'money')
+
+
+def is_binary_save(filename: str) -> bool:
+    """True if the file starts with the binary save magic."""
+    try:
+        with open(filename, 'rb') as f:
+            return f.read(len(MAGIC)) == MAGIC
+    except IOError:
+        return False
+
+
+def _compress(codec: int, body: bytes) -> bytes:
+    if codec == CODEC_ZLIB:
+        return zlib.compress(body, 6)
+    if codec == CODEC_LZMA:
+        return lzma.compress(body)
+    return body
+
+
+def _decompress(codec: int, body: bytes) -> bytes:
+    if codec == CODEC_ZLIB:
+        return zlib.decompress(body)
+    if codec == CODEC_LZMA:
+        return lzma.decompress(body)
+    if codec == CODEC_NONE:
+        return body
+    raise ValueError(f"Unknown save compression {codec}")
+
+
+def _pack_monsters(monsters: list) -> tuple:
+    """Splits monster dicts into a type table and short rows referencing it."""
+    types = []
+    type_index = {}
+    rows = []
+    for m in monsters:
+        record = tuple(m.get(field) for field in MONSTER_TYPE_FIELDS)
+        key = json.dumps(record)
+        index = type_index.get(key)
+        if index is None:
+            index = type_index[key] = len(types)
+            types.append(list(record))
+        rows.append([index] + [m.get(field) for field in MONSTER_FIELDS])
+    return types, rows
+
+
+def _unpack_monsters(types: list, rows: list) -> list:
+    monsters = []
+    for row in rows:
+        m = dict(zip(MONSTER_TYPE_FIELDS, types[row[0]]))
+        m.update(zip(MONSTER_FIELDS, row[1:]))
+        monsters.append(m)
+    return monsters
+
+
+def encode(save_data: dict, codec: int = CODEC_ZLIB) -> bytes:
+    """Turns the dict written by game.py into binary save bytes."""
+    meta = dict(save_data)
+    map_state = dict(meta.get('map_state', {}))
+    bg_grid = map_state.pop('bg_grid', None) or []
+    types, rows = _pack_monsters(map_state.pop('monsters', []))
+    map_state['monster_types'] = types
+    map_state['monster_rows'] = rows
+    meta['map_state'] = map_state
+
+    meta_bytes = json.dumps(meta, separators=(',', ':')).encode('utf-8')
+    width = len(bg_grid)
+    height = len(bg_grid[0]) if width else 0
+    grid_bytes = bytes(v for column in bg_grid for v in column)
+    body = _U32.pack(len(meta_bytes)) + meta_bytes + _GRID.pack(width, height) + grid_bytes
+    return _HEADER.pack(MAGIC, VERSION, codec) + _compress(codec, body)
+
+
+def decode(data: bytes) -> dict:
+    """Turns binary save bytes back into the dict shape of a JSON save."""
+    magic, version, codec = _HEADER.unpack_from(data)
+    if magic != MAGIC:
+        raise ValueError("Not a binary save file")
+    if version > VERSION:
+        raise ValueError(f"Save version {version} is newer than this game supports ({VERSION})")
+    body = _decompress(codec, data[_HEADER.size:])
+
+    (meta_len,) = _U32.unpack_from(body)
+    offset = _U32.size
+    meta = json.loads(body[offset:offset + meta_len].decode('utf-8'))
+    offset += meta_len
+    width, height = _GRID.unpack_from(body, offset)
+    offset += _GRID.size
+    grid_bytes = body[offset:offset + width * height]
+
+    map_state = meta.get('map_state', {})
+    map_state['monsters'] = _unpack_monsters(map_state.pop('monster_types', []), map_state.pop('monster_rows', []))
+    map_state['bg_grid'] = [list(grid_bytes[x * height:(x + 1) * height]) for x in range(width)]
+    meta['map_state'] = map_state
+    return meta
+
+
+def save(filename: str, save_data: dict, codec: int = CODEC_ZLIB) -> None:
+    with open(filename, 'wb') as f:
+        f.write(encode(save_data, codec))
+
+
+def load(filename: str) -> dict:
+    with open(filename, 'rb') as f:
+        return decode(f.read())
+
+
+def convert(source: str, target: str, codec: int = CODEC_ZLIB) -> None:
+    """Converts a save between formats. The target format is binary unless it ends in .json."""
+    if is_binary_save(source):
+        save_data = load(source)
+    else:
+        with open(source, 'r') as f:
+            save_data = json.load(f)
+    if target.endswith('.json'):
+        with open(target, 'w') as f:
+            json.dump(save_data, f, indent=4)
+    else:
+        save(target, save_data, codec)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert save files between JSON and the binary format")
+    parser.add_argument('source')
+    parser.add_argument('target')
+    parser.add_argument('--compression', choices=sorted(CODEC_NAMES), default='zlib')
+    args = parser.parse_args()
+    convert(args.source, args.target, CODEC_NAMES[args.compression])
+    print(f"Converted '{args.source}' to '{args.target}'.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,278 @@
+"""
+Game server: many players in one process.
+
+Every connection gets a session with its own player, map_state and
+random streams, played through menus.Game one command at a time. The
+game logic never waits for input, so a single asyncio loop serves all
+sessions. An idle session is just a parked coroutine and a small game
+state.
+
+    python server.py serve --port 7777          (or --unix /tmp/space.sock)
+    python server.py client --port 7777
+    python server.py loadgen --port 7777 --sessions 500 --concurrency 50 --idle 300
+
+Protocol: the client sends one command per line. Every reply is the
+game's text ending with the next prompt, then a NUL byte. The connection
+closes when the game ends.
+"""
+import argparse
+import asyncio
+import random
+import socket
+import sys
+import time
+import menus
+import rngs
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 7777
+END = b"\0"
+
+
+class Session:
+    """One player's game plus the state of their random streams."""
+    __slots__ = ('seed', 'game', 'streams')
+
+    def __init__(self, seed: int):
+        self.seed = seed
+        self.streams = rngs.private_streams(seed)
+        self.game = None
+
+    @property
+    def done(self) -> bool:
+        return self.game is not None and self.game.done
+
+
+class SessionHost:
+    """Runs commands for many sessions, swapping each one's random streams in first."""
+    def __init__(self, seed: int = None):
+        self.seeds = random.Random(rngs.new_seed() if seed is None else seed)
+        self.sessions = set()
+        self.total = 0
+        self.commands = 0
+        # Session whose streams are loaded into rngs right now
+        self._owner = None
+
+    def _switch_to(self, session: Session) -> None:
+        if self._owner is session:
+            return
+        if self._owner is not None:
+            rngs.store(self._owner.streams)
+        rngs.load(session.streams)
+        self._owner = session
+
+    def open(self) -> tuple:
+        """Starts a session. Returns it and its first reply."""
+        session = Session(self.seeds.getrandbits(32))
+        self._switch_to(session)
+        # The new game's monsters already come from the session's streams
+        session.game = menus.Game()
+        self.sessions.add(session)
+        self.total += 1
+        return session, session.game.open() + session.game.prompt
+
+    def send(self, session: Session, command: str) -> str:
+        self._switch_to(session)
+        self.commands += 1
+        game = session.game
+        text = game.send(command)
+        return text if game.done else text + game.prompt
+
+    def close(self, session: Session) -> None:
+        self.sessions.discard(session)
+        if self._owner is session:
+            self._owner = None
+
+
+async def _serve_client(host: SessionHost, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+    session, reply = host.open()
+    try:
+        writer.write(reply.encode() + END)
+        await writer.drain()
+        while not session.done:
+            line = await reader.readline()
+            if not line:
+                break
+            writer.write(host.send(session, line.decode(errors='replace')).encode() + END)
+            await writer.drain()
+    except (ConnectionError, asyncio.IncompleteReadError):
+        pass
+    finally:
+        host.close(session)
+        writer.close()
+
+
+async def _report(host: SessionHost, every: float) -> None:
+    while True:
+        await asyncio.sleep(every)
+        print(f"{len(host.sessions)} sessions open, {host.total} started, {host.commands} commands", flush=True)
+
+
+async def serve(port: int = DEFAULT_PORT, unix_path: str = None, seed: int = None, status_every: float = 0) -> None:
+    host = SessionHost(seed)
+
+    def on_connect(reader, writer):
+        return _serve_client(host, reader, writer)
+
+    # Many idle clients at once need a long listen queue
+    if unix_path:
+        server = await asyncio.start_unix_server(on_connect, path=unix_path, backlog=1024)
+        where = unix_path
+    else:
+        server = await asyncio.start_server(on_connect, DEFAULT_HOST, port, backlog=1024)
+        where = f"{DEFAULT_HOST}:{port}"
+    print(f"Serving on {where}", flush=True)
+    if status_every > 0:
+        asyncio.ensure_future(_report(host, status_every))
+    async with server:
+        await server.serve_forever()
+
+
+def _connect(port: int, unix_path: str) -> socket.socket:
+    if unix_path:
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.connect(unix_path)
+        return sock
+    return socket.create_connection((DEFAULT_HOST, port))
+
+
+def client(port: int = DEFAULT_PORT, unix_path: str = None) -> None:
+    """Thin terminal client: prints replies, sends typed lines."""
+    sock = _connect(port, unix_path)
+    buffer = b""
+    with sock:
+        while True:
+            while END not in buffer:
+                data = sock.recv(65536)
+                if not data:
+                    # Game over, print what is left
+                    print(buffer.decode(errors='replace'), end="")
+                    return
+                buffer += data
+            reply, buffer = buffer.split(END, 1)
+            text = reply.decode(errors='replace')
+            # The prompt is the end of the reply, answered on the same line
+            print(text, end="", flush=True)
+            try:
+                line = sys.stdin.readline()
+            except KeyboardInterrupt:
+                return
+            if not line:
+                return
+            sock.sendall(line.encode())
+
+
+# Load generator answers by prompt, in the order checked
+def _answer(prompt: str, rng: random.Random) -> str:
+    if prompt.startswith("What is your name"):
+        return "loadgen"
+    if prompt.startswith("Move"):
+        return rng.choice("wasd")
+    # Town (launch), fight (attack) and the respawn question
+    if prompt.startswith("Enter your choice") or prompt.startswith("Would you like"):
+        return "1"
+    # Shop and equip menus
+    return "0"
+
+
+async def _open(port: int, unix_path: str):
+    if unix_path:
+        return await asyncio.open_unix_connection(unix_path)
+    return await asyncio.open_connection(DEFAULT_HOST, port)
+
+
+async def _scripted_session(port, unix_path, commands: int, rng: random.Random, latencies: list) -> None:
+    reader, writer = await _open(port, unix_path)
+    try:
+        reply = await reader.readuntil(END)
+        for _ in range(commands):
+            prompt = reply[:-1].decode(errors='replace').rsplit("\n", 1)[-1]
+            start = time.perf_counter()
+            writer.write((_answer(prompt, rng) + "\n").encode())
+            try:
+                reply = await reader.readuntil(END)
+            except asyncio.IncompleteReadError:
+                # The game ended
+                break
+            latencies.append(time.perf_counter() - start)
+    finally:
+        writer.close()
+
+
+async def loadgen(port: int = DEFAULT_PORT, unix_path: str = None, sessions: int = 200, commands: int = 50,
+                  concurrency: int = 50, idle: int = 0, seed: int = 1) -> dict:
+    """
+    Opens idle connections that just sit there, then plays scripted sessions
+    of up to commands commands each, concurrency at a time. Returns the measurements.
+    """
+    idle_connections = []
+    for _ in range(idle):
+        reader, writer = await _open(port, unix_path)
+        await reader.readuntil(END)
+        idle_connections.append(writer)
+
+    latencies = []
+    rng = random.Random(seed)
+    limit = asyncio.Semaphore(concurrency)
+
+    async def one(session_rng):
+        async with limit:
+            await _scripted_session(port, unix_path, commands, session_rng, latencies)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(random.Random(rng.getrandbits(32))) for _ in range(sessions)))
+    elapsed = time.perf_counter() - start
+    for writer in idle_connections:
+        writer.close()
+
+    latencies.sort()
+
+    def pct(p):
+        return latencies[min(len(latencies) - 1, int(p / 100 * len(latencies)))] * 1000 if latencies else 0.0
+    return {
+        'sessions': sessions,
+        'idle': idle,
+        'elapsed': elapsed,
+        'sessions_per_sec': sessions / elapsed,
+        'commands': len(latencies),
+        'commands_per_sec': len(latencies) / elapsed,
+        'p50_ms': pct(50),
+        'p90_ms': pct(90),
+        'p99_ms': pct(99),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Space Game server, client and load generator")
+    sub = parser.add_subparsers(dest='mode', required=True)
+    for name in ('serve', 'client', 'loadgen'):
+        p = sub.add_parser(name)
+        p.add_argument('--port', type=int, default=DEFAULT_PORT)
+        p.add_argument('--unix', metavar='PATH', help="use a Unix socket instead of TCP")
+        if name == 'serve':
+            p.add_argument('--seed', type=int, default=None, help="seed the session seeds are drawn from")
+            p.add_argument('--status', type=float, default=0, metavar='SEC', help="print session counts every SEC")
+        if name == 'loadgen':
+            p.add_argument('--sessions', type=int, default=200, help="scripted sessions to play")
+            p.add_argument('--commands', type=int, default=50, help="commands per scripted session")
+            p.add_argument('--concurrency', type=int, default=50, help="scripted sessions at once")
+            p.add_argument('--idle', type=int, default=0, help="extra connections kept open doing nothing")
+    args = parser.parse_args()
+
+    if args.mode == 'serve':
+        try:
+            asyncio.run(serve(args.port, args.unix, args.seed, args.status))
+        except KeyboardInterrupt:
+            pass
+    elif args.mode == 'client':
+        client(args.port, args.unix)
+    else:
+        result = asyncio.run(loadgen(args.port, args.unix, args.sessions, args.commands, args.concurrency, args.idle))
+        print(f"{result['sessions']} sessions ({result['idle']} idle alongside) in {result['elapsed']:.2f}s: "
+              f"{result['sessions_per_sec']:.1f} sessions/s, {result['commands_per_sec']:.0f} commands/s")
+        print(f"Command latency: p50 {result['p50_ms']:.2f} ms, p90 {result['p90_ms']:.2f} ms, "
+              f"p99 {result['p99_ms']:.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,249 @@
+"""
+Headless turn logic for one sector of space.
+
+SectorSimulation owns the rules that used to live inside the map event
+loop: player movement, asteroid movement and respawning, monster movement
+and encounter detection. It needs no window or keyboard, handle_map just
+feeds it player moves and draws the result.
+"""
+import asteroid
+import perf
+import rngs
+import spawner
+from flowfield import FlowField
+from occupancy import OccupancyGrid, LAYER_MONSTER, LAYER_ASTEROID
+
+ACTION_RETURN_TO_TOWN = "return_to_town"
+ACTION_MONSTER_ENCOUNTER = "monster_encounter"
+# Player flew off the edge, the direction is in map_state['exit_direction']
+ACTION_LEAVE_SECTOR = "leave_sector"
+
+# Player moves
+MOVE_UP = (0, -1)
+MOVE_DOWN = (0, 1)
+MOVE_LEFT = (-1, 0)
+MOVE_RIGHT = (1, 0)
+MOVE_WAIT = (0, 0)
+MOVE_DOCK = "dock"  # Wait a turn, or return to town if on the station
+
+MAX_ASTEROIDS = 3
+# How far hunting monsters can sense the player, in steps
+HUNT_RADIUS = 12
+
+
+class SectorSimulation:
+    def __init__(self, map_state: dict, grid_size: int, batched: bool = False, hunt: bool = False,
+                 open_edges: bool = False):
+        """
+        Wraps a map_state dict. The dict is updated in place as turns run.
+        With batched=True (and NumPy installed) monsters and asteroids are
+        moved together through entitystore instead of one object at a time.
+        With hunt=True monsters within HUNT_RADIUS of the player chase it
+        along a shared flow field instead of wandering.
+        With open_edges=True moving off the grid leaves the sector (see world.py)
+        instead of being blocked.
+        """
+        self.map_state = map_state
+        self.grid_size = grid_size
+        self.open_edges = open_edges
+        self.flow_field = FlowField(grid_size) if hunt else None
+        if batched:
+            # NumPy is only imported when batching is asked for
+            import entitystore
+            batched = entitystore.HAS_NUMPY
+        self.batched = batched
+        map_state.setdefault('asteroids', [])
+        map_state.setdefault('turn_count', 0)
+        map_state.setdefault('moved_from_town', False)
+        map_state['player_pos'] = tuple(map_state['player_pos'])
+        map_state['town_pos'] = tuple(map_state['town_pos'])
+        self.rebuild_index()
+
+    def rebuild_index(self) -> None:
+        """Re-indexes every entity. Needed if monsters or asteroids were changed from outside."""
+        if self.batched:
+            import entitystore
+            # Entities become views over rows of fresh stores
+            # NumPy generators seeded from the matching streams, so seeded runs repeat
+            np = entitystore.np
+            self.monster_store = entitystore.MonsterStore(
+                self.grid_size, capacity=max(64, len(self.monsters)),
+                rng=np.random.default_rng(rngs.monsters.getrandbits(64)))
+            self.asteroid_store = entitystore.AsteroidStore(
+                self.grid_size, capacity=max(64, len(self.asteroids)),
+                rng=np.random.default_rng(rngs.asteroids.getrandbits(64)))
+            self.monsters[:] = [self.monster_store.adopt(m) for m in self.monsters]
+            self.asteroids[:] = [self.asteroid_store.adopt(a) for a in self.asteroids]
+        self.occupancy = OccupancyGrid(self.grid_size, self.town_pos, self.player_pos)
+        for monster in self.monsters:
+            self.occupancy.add(LAYER_MONSTER, monster)
+        for ast in self.asteroids:
+            self.occupancy.add(LAYER_ASTEROID, ast)
+
+    @property
+    def player_pos(self) -> tuple:
+        return self.map_state['player_pos']
+
+    @property
+    def town_pos(self) -> tuple:
+        return self.map_state['town_pos']
+
+    @property
+    def monsters(self) -> list:
+        return self.map_state['monsters']
+
+    @property
+    def asteroids(self) -> list:
+        return self.map_state['asteroids']
+
+    def step(self, player_move) -> list:
+        """
+        Runs one player input.
+        player_move is a (dx, dy) tuple or MOVE_DOCK.
+        Returns the list of events that happened, in order.
+        On an encounter the monster is stored in map_state['active_encounter'].
+        """
+        map_state = self.map_state
+        events = []
+        player_x, player_y = self.player_pos
+        town_pos = self.town_pos
+
+        if player_move == MOVE_DOCK:
+            #prevent softlock
+            if (player_x, player_y) == town_pos:
+                events.append(ACTION_RETURN_TO_TOWN)
+            dx, dy = MOVE_WAIT
+        else:
+            dx, dy = player_move
+
+        #Bounds and asteroid collision
+        new_x = player_x + dx
+        new_y = player_y + dy
+        if not (0 <= new_x < self.grid_size and 0 <= new_y < self.grid_size):
+            if self.open_edges:
+                map_state['exit_direction'] = (dx, dy)
+                events.append(ACTION_LEAVE_SECTOR)
+            return events
+        occupancy = self.occupancy
+        if occupancy.has(LAYER_ASTEROID, (new_x, new_y)):
+            return events
+
+        player_x, player_y = new_x, new_y
+        map_state['player_pos'] = (player_x, player_y)
+        occupancy.player_pos = (player_x, player_y)
+
+        #Player-initiated Encounter Check
+        monster = occupancy.first(LAYER_MONSTER, (player_x, player_y))
+        if monster is not None:
+            map_state['active_encounter'] = monster
+            events.append(ACTION_MONSTER_ENCOUNTER)
+            return events
+
+        #Increment turn counter for each player move
+        map_state['turn_count'] += 1
+        with perf.phase('asteroids'):
+            self._move_asteroids()
+            self._spawn_asteroids()
+
+        #Monster Movement
+        with perf.phase('monsters'):
+            monster = self._move_monsters()
+        if monster is not None:
+            map_state['active_encounter'] = monster
+            events.append(ACTION_MONSTER_ENCOUNTER)
+            return events
+
+        #Check for Town Return
+        if (player_x, player_y) == town_pos:
+            #Only return to town if they've moved away first
+            if map_state['moved_from_town']:
+                events.append(ACTION_RETURN_TO_TOWN)
+        elif dx != 0 or dy != 0:
+            #Mark that the player has moved away from town for the first time
+            map_state['moved_from_town'] = True
+        return events
+
+    def _move_monsters(self):
+        """
+        Moves every monster once. Stops at the first one that lands on the player
+        and returns it, otherwise returns None.
+        """
+        occupancy = self.occupancy
+        town_pos = self.town_pos
+        player_pos = self.player_pos
+        turn_count = self.map_state['turn_count']
+        flow_field = self.flow_field
+        if flow_field is not None and turn_count % 2 == 1:
+            # One search per turn, shared by every monster (they only move on odd turns)
+            flow_field.compute(player_pos, occupancy.cells(LAYER_ASTEROID), (town_pos,), HUNT_RADIUS)
+        if self.batched:
+            store = self.monster_store
+            moved, old_x, old_y, encounter_row = store.move_all(town_pos, turn_count, stop_at=player_pos,
+                                                                flow_field=flow_field)
+            views = store.views
+            new_x, new_y = store.x[moved].tolist(), store.y[moved].tolist()
+            for row, ox, oy, nx, ny in zip(moved.tolist(), old_x.tolist(), old_y.tolist(), new_x, new_y):
+                occupancy.move(LAYER_MONSTER, views[row], (ox, oy), (nx, ny))
+            return None if encounter_row is None else store.views[encounter_row]
+
+        for monster in self.monsters:
+            old_pos = monster.get_pos()
+            monster.move(town_pos, turn_count, flow_field=flow_field)
+            occupancy.move(LAYER_MONSTER, monster, old_pos)
+            #Monster-initiated Encounter Check
+            if monster.get_pos() == player_pos:
+                return monster
+        return None
+
+    def _move_asteroids(self) -> None:
+        """Moves every asteroid once and drops the ones that left the sector."""
+        if self.batched:
+            self._move_asteroids_batched()
+            return
+        occupancy = self.occupancy
+        remaining = []
+        for ast in self.asteroids:
+            old_pos = ast.get_pos()
+            ast.move(occupancy.blockers(ignore=ast))
+            if ast.is_out_of_bounds():
+                occupancy.remove(LAYER_ASTEROID, ast, old_pos)
+            else:
+                occupancy.move(LAYER_ASTEROID, ast, old_pos)
+                remaining.append(ast)
+        self.asteroids[:] = remaining
+
+    def _move_asteroids_batched(self) -> None:
+        import entitystore
+        np = entitystore.np
+        store = self.asteroid_store
+        monster_store = self.monster_store
+        occupancy = self.occupancy
+        monster_rows = monster_store.live_rows()
+        blocker_x = np.concatenate((monster_store.x[monster_rows], [self.player_pos[0], self.town_pos[0]]))
+        blocker_y = np.concatenate((monster_store.y[monster_rows], [self.player_pos[1], self.town_pos[1]]))
+        moved, old_x, old_y, gone_rows = store.move_all(blocker_x, blocker_y)
+        new_x, new_y = store.x[moved].tolist(), store.y[moved].tolist()
+        for row, ox, oy, nx, ny in zip(moved.tolist(), old_x.tolist(), old_y.tolist(), new_x, new_y):
+            # Off-grid cells are ignored by the index, so this also drops asteroids that left
+            occupancy.move(LAYER_ASTEROID, store.views[row], (ox, oy), (nx, ny))
+        if gone_rows.size:
+            gone = {id(store.views[row]) for row in gone_rows.tolist()}
+            self.asteroids[:] = [a for a in self.asteroids if id(a) not in gone]
+            for row in gone_rows.tolist():
+                store.free_row(row)
+
+    def _spawn_asteroids(self) -> None:
+        """Spawn and maintain # of asteroids"""
+        asteroids = self.asteroids
+        missing = MAX_ASTEROIDS - len(asteroids)
+        if missing <= 0:
+            return
+        # Asteroids may spawn on monsters, just not on the player, station or each other
+        unsafe_spawns = self.occupancy.blockers(layers=(LAYER_ASTEROID,))
+        spawns = spawner.free_edge_cells(self.grid_size, missing, lambda pos: pos not in unsafe_spawns)
+        for spawn in spawns:
+            new_ast = asteroid.Asteroid(self.grid_size, unsafe_spawns, spawn=spawn)
+            if self.batched:
+                new_ast = self.asteroid_store.adopt(new_ast)
+            asteroids.append(new_ast)
+            self.occupancy.add(LAYER_ASTEROID, new_ast)
@@ -0,0 +1,72 @@
+"""
+Picks spawn cells without retry loops.
+
+Cells are drawn with a lazy Fisher-Yates shuffle over the grid (or over
+the edge cells): every draw is a cell that was not drawn before, so each
+cell is checked at most once. Placing N entities costs about N draws
+when the grid is mostly free and never more than one pass over the
+cells when it is crowded. If there are not enough free cells fewer
+positions are returned.
+"""
+import rngs
+
+
+def _sample(n: int, count: int, accept, rng) -> list:
+    """Up to count distinct indexes in [0, n) that pass accept, in random order."""
+    picked = []
+    # Only the swapped slots of the virtual list [0, 1, ..., n - 1] are stored
+    swapped = {}
+    for j in range(n):
+        if len(picked) == count:
+            break
+        i = rng.randrange(j, n)
+        value = swapped.get(i, i)
+        swapped[i] = swapped.get(j, j)
+        if accept(value):
+            picked.append(value)
+    return picked
+
+
+def free_cells(grid_size: int, count: int, is_free, rng=rngs.spawn) -> list:
+    """Up to count distinct (x, y) cells for which is_free((x, y)) is True."""
+    def accept(index):
+        return is_free(divmod(index, grid_size))
+    return [divmod(index, grid_size) for index in _sample(grid_size * grid_size, count, accept, rng)]
+
+
+# Which edge a cell is on, same numbering as Asteroid.create_new_asteroid
+EDGE_TOP = 0
+EDGE_BOTTOM = 1
+EDGE_LEFT = 2
+EDGE_RIGHT = 3
+
+
+def edge_cell(index: int, grid_size: int) -> tuple:
+    """
+    Maps 0 .. edge_count(grid_size) - 1 to (x, y, edge).
+    Corners belong to the top and bottom edges.
+    """
+    if index < grid_size:
+        return (index, 0, EDGE_TOP)
+    index -= grid_size
+    if grid_size > 1 and index < grid_size:
+        return (index, grid_size - 1, EDGE_BOTTOM)
+    index -= grid_size
+    side = grid_size - 2
+    if index < side:
+        return (0, index + 1, EDGE_LEFT)
+    return (grid_size - 1, index - side + 1, EDGE_RIGHT)
+
+
+def edge_count(grid_size: int) -> int:
+    if grid_size <= 1:
+        return grid_size
+    return 4 * grid_size - 4
+
+
+def free_edge_cells(grid_size: int, count: int, is_free, rng=rngs.spawn) -> list:
+    """Up to count distinct (x, y, edge) cells on the border for which is_free((x, y)) is True."""
+    def accept(index):
+        x, y, _ = edge_cell(index, grid_size)
+        return is_free((x, y))
+    return [edge_cell(index, grid_size) for index in _sample(edge_count(grid_size), count, accept, rng)]
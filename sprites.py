@@ -0,0 +1,71 @@
+"""
+Shared sprite cache.
+
+Sprites are loaded from disk and scaled once per (name, size, angle)
+and then reused by monsters, asteroids and the map screen.
+pygame is only imported when the first sprite is asked for.
+"""
+import os
+
+
+def _find_sprite_dir() -> str:
+    """
+    Finds the sprite folder once.
+    The folder is 'Sprites' in the repo, older code looked for 'sprites',
+    which only works on case-insensitive file systems.
+    """
+    current_dir = os.path.dirname(os.path.abspath(__file__))
+    for folder in ("Sprites", "sprites"):
+        path = os.path.join(current_dir, folder)
+        if os.path.isdir(path):
+            return path
+    return os.path.join(current_dir, "Sprites")
+
+
+SPRITE_DIR = _find_sprite_dir()
+
+_sprite_cache = {}
+_cache_stats = {'hits': 0, 'misses': 0}
+
+
+def get_sprite(name: str, size: tuple = (32, 32), angle: int = 0):
+    """
+    Returns the scaled (and optionally rotated) sprite for name,
+    or None if it could not be loaded.
+    Failed loads are cached too so a missing file is only tried once.
+    """
+    key = (name, size, angle)
+    if key in _sprite_cache:
+        _cache_stats['hits'] += 1
+        return _sprite_cache[key]
+
+    _cache_stats['misses'] += 1
+    import pygame
+    sprite_path = os.path.join(SPRITE_DIR, name)
+    try:
+        sprite = pygame.transform.scale(pygame.image.load(sprite_path), size)
+        if angle:
+            sprite = pygame.transform.rotate(sprite, angle)
+    except (pygame.error, FileNotFoundError) as e:
+        print(f"Warning: Failed to load '{name}'")
+        print(f"   --> Attempted path: {sprite_path}")
+        print(f"   --> Error: {e}")
+        sprite = None
+    _sprite_cache[key] = sprite
+    return sprite
+
+
+def cache_stats() -> dict:
+    """Returns hit/miss counts. Misses are disk reads."""
+    return {
+        'hits': _cache_stats['hits'],
+        'misses': _cache_stats['misses'],
+        'entries': len(_sprite_cache)
+    }
+
+
+def clear_cache() -> None:
+    """Drops every cached sprite and resets the counters."""
+    _sprite_cache.clear()
+    _cache_stats['hits'] = 0
+    _cache_stats['misses'] = 0
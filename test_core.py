@@ -0,0 +1,208 @@
+"""
+Checks for the save formats, autosave, inventory, spawner, combat odds and
+world storage. Run with: python -m pytest -q
+"""
+import json
+import os
+import random
+from types import SimpleNamespace
+import pytest
+import autosave
+import combatsolver
+import game
+import gamefunctions
+import menus
+import rngs
+import savefile
+import spawner
+import world
+from camera import ChunkedBackground
+from catalog import MonsterType
+from inventory import Inventory
+
+
+def _plain(data):
+    """data as it comes back from a JSON file."""
+    return json.loads(json.dumps(data))
+
+
+def _bg_list(bg_grid):
+    return bg_grid.to_list() if isinstance(bg_grid, ChunkedBackground) else bg_grid
+
+
+def _save_data() -> dict:
+    rngs.seed(7)
+    map_state = menus.new_map_state((0, 0))
+    map_state['bg_grid'] = ChunkedBackground(gamefunctions.GRID_SIZE)
+    laser = gamefunctions.CATALOG.new_item('laser')
+    inventory = Inventory([laser, gamefunctions.CATALOG.new_item('shield')])
+    return game.build_save_data(30, 50, 10, 5, laser, inventory, map_state,
+                                world_info={'id': 'abcd', 'sector': [1, -2]})
+
+
+@pytest.mark.parametrize('filename', ['save.sav', 'save.json'])
+def test_save_round_trip(tmp_path, filename):
+    save_data = _save_data()
+    path = str(tmp_path / filename)
+    gamefunctions.save_game_data(path, save_data)
+    assert gamefunctions.load_game_data(path) == _plain(save_data)
+
+
+def test_legacy_json_save_loads_and_converts(tmp_path):
+    save_data = _plain(_save_data())
+    # Saves from before the world and item ids
+    del save_data['world']
+    for item in save_data['player_inventory']:
+        del item['id']
+    legacy = tmp_path / "savegame.json"
+    legacy.write_text(json.dumps(save_data, indent=4))
+
+    loaded = gamefunctions.load_game_data(str(legacy))
+    assert loaded == save_data
+    assert Inventory.from_list(loaded['player_inventory']).has_id('laser')
+
+    converted = str(tmp_path / "savegame.sav")
+    savefile.convert(str(legacy), converted)
+    assert savefile.load(converted) == save_data
+
+
+def test_autosave_recovers_the_last_turn(tmp_path):
+    snapshot_file = str(tmp_path / "autosave.sav")
+    journal_file = str(tmp_path / "autosave.journal")
+    saver = autosave.Autosaver(snapshot_file, journal_file, snapshot_every=4)
+    rngs.seed(3)
+    map_state = menus.new_map_state((0, 0))
+    map_state['bg_grid'] = ChunkedBackground(gamefunctions.GRID_SIZE)
+    inventory = Inventory()
+    last = None
+    for turn in range(11):
+        map_state['turn_count'] = turn
+        map_state['player_pos'] = (turn % gamefunctions.GRID_SIZE, 1)
+        if turn == 5:
+            inventory.add(gamefunctions.CATALOG.new_item('shield'))
+        last = game.build_save_data(30 - turn, 50, 10 + turn, 5, {}, inventory, map_state,
+                                    background_as_list=False)
+        saver.record(last)
+    saver.close(discard=False)
+
+    recovered = autosave.recover(snapshot_file, journal_file)
+    expected = _plain(dict(last, map_state=dict(last['map_state'], bg_grid=None)))
+    assert _bg_list(recovered['map_state'].pop('bg_grid')) == map_state['bg_grid'].to_list()
+    expected['map_state'].pop('bg_grid')
+    assert recovered == expected
+
+
+def test_autosave_snapshot_only_when_static_data_changes(tmp_path):
+    saver = autosave.Autosaver(str(tmp_path / "a.sav"), str(tmp_path / "a.journal"), snapshot_every=100)
+    map_state = menus.new_map_state((0, 0))
+    snapshots = []
+    write_snapshot = saver._snapshot
+    saver._snapshot = lambda *args: snapshots.append(args[0]) or write_snapshot(*args)
+    # A new game has no background yet
+    for turn in range(10):
+        map_state['turn_count'] = turn
+        saver.record(game.build_save_data(30, 50, 10, 5, {}, Inventory(), map_state, background_as_list=False))
+    map_state['bg_grid'] = ChunkedBackground(gamefunctions.GRID_SIZE)
+    saver.record(game.build_save_data(30, 50, 10, 5, {}, Inventory(), map_state, background_as_list=False))
+    saver.close(discard=False)
+    assert snapshots == [1, 11]
+
+
+def _check_indexes(inventory: Inventory) -> None:
+    items = inventory.to_list()
+    assert len(inventory) == len(items)
+    assert inventory.total_defense == sum(item.get('defense_bonus', 0) for item in items)
+    for item in items:
+        assert item in inventory
+        assert inventory.count_name(item['name']) == sum(other['name'] == item['name'] for other in items)
+        assert inventory.find_id(item['id']) is next(other for other in items if other['id'] == item['id'])
+    for item_type in ('weapon', 'passive', 'consumable'):
+        assert inventory.of_type(item_type) == [item for item in items if item['type'] == item_type]
+
+
+def test_inventory_indexes_after_add_remove_equip():
+    catalog = gamefunctions.CATALOG
+    inventory = Inventory()
+    shop = menus.ShopMenu(500, inventory)
+    shop.open()
+    for choice in "1 2 2 3 4 1 0".split():
+        shop.send(choice)
+    _check_indexes(inventory)
+
+    equip = menus.EquipMenu(inventory, {})
+    equip.open()
+    equip.send("2")
+    equip.send("0")
+    weapon = equip.equipped_weapon
+    assert weapon in inventory
+
+    inventory.remove(weapon)
+    _check_indexes(inventory)
+    assert inventory.pop_id('shield')['id'] == 'shield'
+    assert inventory.remove_matching(catalog.new_item('laser'))['name'] == catalog.item('laser')['name']
+    _check_indexes(inventory)
+    inventory.add(weapon)
+    _check_indexes(inventory)
+    with pytest.raises(ValueError):
+        inventory.add(weapon)
+
+
+@pytest.mark.parametrize('blocked', [0, 10, 99])
+def test_spawner_never_draws_a_cell_twice(blocked):
+    size = 10
+    rng = random.Random(blocked)
+    taken = set(rng.sample([(x, y) for x in range(size) for y in range(size)], blocked))
+    cells = spawner.free_cells(size, size * size, lambda cell: cell not in taken, rng=rng)
+    assert len(cells) == len(set(cells)) == size * size - blocked
+    assert not taken & set(cells)
+    edge = spawner.free_edge_cells(size, spawner.edge_count(size), lambda cell: True, rng=rng)
+    assert len(edge) == len(set(edge)) == spawner.edge_count(size)
+
+
+# Matchups the player wins about half, half and a tenth of the time
+@pytest.mark.parametrize('weapon_id, total_defense, monster_hp, monster_power',
+                         [(None, 0, 40, 7), ('laser', 0, 120, 9), ('rocket', 3, 120, 9)])
+def test_solver_matches_combatsim(weapon_id, total_defense, monster_hp, monster_power):
+    np = pytest.importorskip('numpy')
+    import combatsim
+    monster = MonsterType('test', 'Test', '', (monster_hp, monster_hp), (monster_power, monster_power), (0, 0),
+                          None, None, 0.1, 2.0, 0.1, 1)
+    weapon = gamefunctions.CATALOG.new_item(weapon_id) if weapon_id else {}
+    sim = combatsim.simulate_fights(200000, 50, 5, weapon, total_defense, monster, np.random.default_rng(1))
+    # A monster of that type, its health and power ranges are a single value
+    spawned = SimpleNamespace(power=monster_power, crit_chance=0.1, crit_multiplier=2.0, miss_chance=0.1)
+    odds = combatsolver.fight_odds(50, monster_hp, weapon.get('maxDurability', 0),
+                                   combatsolver.make_matchup(5, weapon, total_defense, spawned))
+    assert sim['unfinished'] == 0
+    assert 0.05 < odds.win < 0.95
+    assert odds.win == pytest.approx(sim['win_rate'], abs=0.005)
+    assert odds.win + odds.lose == pytest.approx(1)
+
+
+def test_solver_handles_long_fights():
+    monster = SimpleNamespace(power=6)
+    odds = combatsolver.fight_odds(1500, 1500, 0, combatsolver.make_matchup(5, {}, 0, monster))
+    assert odds.win + odds.lose == pytest.approx(1)
+
+
+def test_world_writes_evicted_sectors_and_reads_them_back(tmp_path):
+    directory = str(tmp_path / "world")
+    rngs.seed(11)
+    origin = menus.new_map_state((0, 0))
+    origin['bg_grid'] = ChunkedBackground(gamefunctions.GRID_SIZE)
+    sectors = world.World(gamefunctions.GRID_SIZE, directory, origin, cache_size=9)
+    # Nothing is written until a sector leaves the cache
+    assert not os.path.exists(directory)
+    stored = _plain(world.sector_to_dict(origin))
+
+    map_state = origin
+    for _ in range(3):
+        map_state = sectors.cross(map_state, (1, 0))
+    assert world.ORIGIN not in sectors.sectors
+    assert os.path.exists(sectors.sector_file(world.ORIGIN))
+
+    reloaded = world.World(gamefunctions.GRID_SIZE, directory, map_state, sectors.current, cache_size=9)
+    assert _plain(world.sector_to_dict(reloaded.get(world.ORIGIN))) == stored
+
+    sectors.discard()
+    assert not os.path.exists(directory)
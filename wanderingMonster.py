@@ -1,133 +1,91 @@
-import random
-import pygame
-import os
-#colors
-COLOR_RED = (200, 0, 0)
-COLOR_GREEN = (0, 200, 0)
-COLOR_BLUE = (0, 0, 200)
-COLOR_PURPLE = (100, 0, 100)
-
+import rngs
+from collections import namedtuple
+import sprites
+import catalog
+import spawner
+# Everything monsters of one type share. Interned, so equal kinds are one object
+MonsterKind = namedtuple('MonsterKind', [
+    'name', 'description', 'color', 'sprite_name', 'crit_chance', 'crit_multiplier', 'miss_chance'
+])
+_kinds = {}
+def monster_kind(name, description, color, sprite_name, crit_chance=0.05, crit_multiplier=1.5, miss_chance=0.05):
+    """Returns the shared MonsterKind for these fields."""
+    kind = MonsterKind(name, description, tuple(color), sprite_name, crit_chance, crit_multiplier, miss_chance)
+    return _kinds.setdefault(kind, kind)
+def _kind_field(index):
+    """Read-only property for one field of the monster's shared kind."""
+    return property(lambda self: self.kind[index])
 class WanderingMonster:
-    def __init__(self,grid_size, town_pos, existing_data=None):
+    # Only per-monster state is stored on the instance, the rest is on self.kind
+    __slots__ = ('grid_size', 'x', 'y', 'health', 'max_health', 'power', 'money', 'kind')
+    name = _kind_field(0)
+    description = _kind_field(1)
+    color = _kind_field(2)
+    sprite_name = _kind_field(3)
+    crit_chance = _kind_field(4)
+    crit_multiplier = _kind_field(5)
+    miss_chance = _kind_field(6)
+
+    def __init__(self,grid_size, town_pos, existing_data=None, pos=None):
         """
         Initialize a monster,
         Load existing_data from save,
-        or generate new random monster
+        or generate new random monster (at pos if given)
         """
         self.grid_size = grid_size
-        self.sprite = None
         if existing_data:
             self.load_from_dict(existing_data)
         else:
-            self.create_new_random_monster(town_pos)
-        self.load_sprite()
-    def load_sprite(self):
+            self.create_new_random_monster(town_pos, pos)
+    @property
+    def sprite(self):
         """
-        Attempts to load sprite for monster
-        Will revert to old circles if loading fails
+        Gets the shared sprite for this monster type from the cache
+        Loaded the first time the map draws one, None reverts to old circles
         """
-        target_sprite = getattr(self, 'sprite_name', None)
+        target_sprite = self.sprite_name
         
         if target_sprite:
-            try:
-                current_dir = os.path.dirname(os.path.abspath(__file__))
-                sprite_path = os.path.join(current_dir, 'sprites', target_sprite)
-                loaded_sprite = pygame.image.load(sprite_path)
-                self.sprite = pygame.transform.scale(loaded_sprite, (32, 32))
-            except (pygame.error, FileNotFoundError) as e:
-                print(f"Warning: Failed to load '{target_sprite}'")
-                print(f"   --> Attempted path: {sprite_path}")
-                print(f"   --> Error: {e}")
-                self.sprite = None
+            return sprites.get_sprite(target_sprite, (32, 32))
+        return None
                 
-    def create_new_random_monster(self, town_pos):
+    def create_new_random_monster(self, town_pos, pos=None):
         """
         Creates a monster with randomized stats and a unique position.
+        Use spawner.free_cells to place many monsters at once.
         """
-        monster_types = [
-            {'name': 'Martian',
-             'description': 'A ship approaches from the planet Mars. They attack you, because Martians do that.',
-             'health_range': (15, 30),
-             'power_range': (8, 12),
-             'money_range': (10, 30),
-             'color': COLOR_RED,
-             'sprite':'BadShipR.png',
-             'crit_chance': 0.15, 
-             'crit_multiplier': 1.5, 
-             'miss_chance': 0.10},
-            {'name': 'Cyborg',
-             'description': 'A cyborg vessel. They would love to give you new features.',
-             'health_range': (5, 15),
-             'power_range': (15, 20),
-             'money_range': (5, 15),
-             'color': COLOR_GREEN,
-             'sprite':'BadShipG.png',
-             'crit_chance': 0.10, 
-             'crit_multiplier': 1.5, 
-             'miss_chance': 0.05},
-            {'name': 'Space Pirate',
-             'description': 'This ship seems like it might be hiding something. Hopefully credits.',
-             'health_range': (15, 35),
-             'power_range': (6, 7),
-             'money_range': (15, 50),
-             'color': COLOR_PURPLE,
-             'sprite':'BadShipP.png',
-             'crit_chance': 0.10, 
-             'crit_multiplier': 2.0, 
-             'miss_chance': 0.25},
-            {'name': '???',
-             'description': 'Something here is not right, is it time to flee?',
-             'health_range': (30, 45),
-             'power_range': (25, 30),
-             'money_range': (50, 100),
-             'color': COLOR_BLUE,
-             'sprite':'BadShipB.png',
-             'crit_chance': 0.10, 
-             'crit_multiplier': 2.0, 
-             'miss_chance': 0.00
-             }
-             ]
-
-        data = random.choice(monster_types)
+        data = catalog.get().random_monster_type()
         
-        self.name = data['name']
-        self.description = data['description']
-        self.health = random.randint(*data['health_range'])
+        self.kind = monster_kind(data.name, data.description, data.color, data.sprite,
+                                 data.crit_chance, data.crit_multiplier, data.miss_chance)
+        self.health = rngs.spawn.randint(*data.health_range)
         self.max_health = self.health
-        self.power = random.randint(*data['power_range'])
-        self.money = int(random.randint(*data['money_range']) * (random.random() * 0.2 + 0.9))
-        self.color = data['color']
-        self.sprite_name = data['sprite']
-        self.crit_chance = data.get('crit_chance', 0.05)
-        self.crit_multiplier = data.get('crit_multiplier', 1.5)
-        self.miss_chance = data.get('miss_chance', 0.05)   
+        self.power = rngs.spawn.randint(*data.power_range)
+        self.money = int(rngs.spawn.randint(*data.money_range) * (rngs.spawn.random() * 0.2 + 0.9))
         
         # Generate Position besides town
-        while True:
-            x = random.randint(0, self.grid_size - 1)
-            y = random.randint(0, self.grid_size - 1)
-            if (x, y) != town_pos:
-                self.x = x
-                self.y = y
-                break 
-    def move(self, town_pos, turn_count, obstacles=None):
+        if pos is None:
+            town_pos = tuple(town_pos)
+            cells = spawner.free_cells(self.grid_size, 1, lambda cell: cell != town_pos)
+            # Only the town is on the grid, share it rather than search forever
+            pos = cells[0] if cells else town_pos
+        self.x, self.y = pos
+    def move(self, town_pos, turn_count, obstacles=None, flow_field=None):
         """
         Attempts to move the monster in a random direction.
         Will not move off grid or into town.
         Moves every other turn, with a 25% chance of moving 2 squares.
+        obstacles is accepted for older callers, monsters fly over asteroids.
+        With a flow_field that reaches the monster it hunts instead: it takes
+        the direction that gets closest to the player, or waits if none is closer.
         """
         if turn_count % 2 == 0:
             return # Skip move this turn
 
         # Determine move distance
         move_distance = 1
-        if random.random() < 0.25: 
+        if rngs.monsters.random() < 0.25: 
             move_distance = 2
-        #Obstacle
-        if obstacles is None:
-            obstacles = set()
-        else:
-            obstacles = set(obstacles)
         directions = [
             (0, -1), # Up
             (0, 1),  # Down
@@ -138,7 +96,23 @@ class WanderingMonster:
             (-1,1),   #SW
             (-1,-1)   #SE
         ]
-        random.shuffle(directions)
+        rngs.monsters.shuffle(directions)
+
+        here = flow_field.distance((self.x, self.y)) if flow_field is not None else None
+        if here is not None:
+            # Hunting, ties go to the first direction in the shuffled order
+            best = None
+            best_distance = here
+            for dx, dy in directions:
+                target = (self.x + dx * move_distance, self.y + dy * move_distance)
+                if target == town_pos:
+                    continue
+                distance = flow_field.distance(target)
+                if distance is not None and distance < best_distance:
+                    best, best_distance = target, distance
+            if best is not None:
+                self.x, self.y = best
+            return
 
         for dx, dy in directions:
             new_x = self.x + dx * move_distance
@@ -167,22 +141,19 @@ class WanderingMonster:
             'color': self.color,
             'x': self.x,
             'y': self.y,
-            'sprite_name': getattr(self, 'sprite_name', None),
-            'crit_chance': getattr(self, 'crit_chance', 0.05),
-            'crit_multiplier': getattr(self, 'crit_multiplier', 1.5),
-            'miss_chance': getattr(self, 'miss_chance', 0.05)}
+            'sprite_name': self.sprite_name,
+            'crit_chance': self.crit_chance,
+            'crit_multiplier': self.crit_multiplier,
+            'miss_chance': self.miss_chance}
     def load_from_dict(self, data):
         """Loads monster stats from a dictionary."""
-        self.name = data['name']
-        self.description = data['description']
+        self.kind = monster_kind(
+            data['name'], data['description'], data['color'], data.get('sprite_name'),
+            data.get('crit_chance', 0.05), data.get('crit_multiplier', 1.5), data.get('miss_chance', 0.05)
+        )
         self.health = data['health']
         self.max_health = data.get('max_health', data['health'])
         self.power = data['power']
         self.money = data['money']
-        self.color = tuple(data['color']) 
         self.x = data['x']
-        self.y = data['y']
-        self.sprite_name = data.get('sprite_name')
-        self.crit_chance = data.get('crit_chance', 0.05)
-        self.crit_multiplier = data.get('crit_multiplier', 1.5)
-        self.miss_chance = data.get('miss_chance', 0.05)
\ No newline at end of file
+        self.y = data['y']
\ No newline at end of file
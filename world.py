@@ -0,0 +1,195 @@
+"""
+A world made of many sectors.
+
+Every sector is a map_state of its own (station, monsters, asteroids,
+background), addressed by (sx, sy). Flying off the edge of a sector
+enters the neighbouring one. Sectors are made the first time they are
+needed and kept in an LRU cache. The current sector and its 8
+neighbours always stay loaded. Once the cache is full, the least recently
+used other sector is written to the world's directory (savefile format)
+and dropped, so memory stays flat however far the player travels.
+"""
+import os
+import shutil
+from collections import OrderedDict
+import asteroid
+import savefile
+import spawner
+import wanderingMonster
+from camera import ChunkedBackground, as_background
+
+# Must be at least 9, the current sector and its neighbours
+DEFAULT_CACHE_SIZE = 16
+MONSTERS_PER_SECTOR = 2
+ORIGIN = (0, 0)
+
+
+def sector_to_dict(map_state: dict) -> dict:
+    """The parts of a sector's map_state that get stored."""
+    bg_grid = map_state.get('bg_grid', [])
+    if isinstance(bg_grid, ChunkedBackground):
+        bg_grid = bg_grid.to_list()
+    return {
+        'player_pos': map_state['player_pos'],
+        'town_pos': map_state['town_pos'],
+        'moved_from_town': map_state['moved_from_town'],
+        'turn_count': map_state.get('turn_count', 0),
+        'monsters': [m.to_dict() for m in map_state['monsters']],
+        'asteroids': [a.to_dict() for a in map_state.get('asteroids', [])],
+        'bg_grid': bg_grid
+    }
+
+
+def sector_from_dict(data: dict, grid_size: int) -> dict:
+    """Rebuilds a map_state (with monster and asteroid objects) from sector_to_dict output."""
+    town_pos = tuple(data['town_pos'])
+    return {
+        'player_pos': tuple(data['player_pos']),
+        'town_pos': town_pos,
+        'moved_from_town': data.get('moved_from_town', False),
+        'turn_count': data.get('turn_count', 0),
+        'monsters': [wanderingMonster.WanderingMonster(grid_size, town_pos, existing_data=m)
+                     for m in data.get('monsters', [])],
+        'asteroids': [asteroid.Asteroid(grid_size, set(), existing_data=a) for a in data.get('asteroids', [])],
+        'bg_grid': as_background(data.get('bg_grid'), grid_size)
+    }
+
+
+class World:
+    def __init__(self, grid_size: int, directory: str, current_state: dict, current: tuple = ORIGIN,
+                 cache_size: int = DEFAULT_CACHE_SIZE):
+        """
+        current_state is the map_state of the sector at current, the one the player is in.
+        Sectors written out before are read back from directory.
+        """
+        if cache_size < 9:
+            raise ValueError("cache_size must hold the current sector and its 8 neighbours")
+        self.grid_size = grid_size
+        self.directory = directory
+        self.cache_size = cache_size
+        # (sx, sy) -> map_state, least recently used first
+        self.sectors = OrderedDict()
+        # Sectors changed since they were last written
+        self.dirty = set()
+        self.current = tuple(current)
+        self.sectors[self.current] = current_state
+        self.dirty.add(self.current)
+        self._load_neighbours()
+
+    def sector_file(self, coords: tuple) -> str:
+        return os.path.join(self.directory, f"sector_{coords[0]}_{coords[1]}.sav")
+
+    def live(self) -> set:
+        """The sectors that are never evicted."""
+        cx, cy = self.current
+        return {(cx + dx, cy + dy) for dx in (-1, 0, 1) for dy in (-1, 0, 1)}
+
+    def get(self, coords: tuple) -> dict:
+        """The map_state of a sector, from the cache, from disk or newly made."""
+        coords = tuple(coords)
+        map_state = self.sectors.get(coords)
+        if map_state is not None:
+            self.sectors.move_to_end(coords)
+            return map_state
+        filename = self.sector_file(coords)
+        if os.path.exists(filename):
+            map_state = sector_from_dict(savefile.load(filename)['map_state'], self.grid_size)
+        else:
+            map_state = self.generate(coords)
+            self.dirty.add(coords)
+        self.sectors[coords] = map_state
+        self._evict()
+        return map_state
+
+    def generate(self, coords: tuple) -> dict:
+        """A new sector with a station, MONSTERS_PER_SECTOR monsters and its own background."""
+        size = self.grid_size
+        if coords == ORIGIN:
+            town_pos = (0, 0)
+        else:
+            town_pos = spawner.free_cells(size, 1, lambda cell: True)[0]
+        cells = spawner.free_cells(size, MONSTERS_PER_SECTOR, lambda cell: cell != town_pos)
+        return {
+            'player_pos': town_pos,
+            'town_pos': town_pos,
+            'moved_from_town': False,
+            'turn_count': 0,
+            'monsters': [wanderingMonster.WanderingMonster(size, town_pos, pos=cell) for cell in cells],
+            'asteroids': [],
+            'bg_grid': ChunkedBackground(size)
+        }
+
+    def _write(self, coords: tuple) -> None:
+        data = {'sector': list(coords), 'map_state': sector_to_dict(self.sectors[coords])}
+        # Made on the first write, a world that is quit early leaves nothing behind
+        os.makedirs(self.directory, exist_ok=True)
+        # Written next to the old file first, so a crash never leaves half a sector
+        filename = self.sector_file(coords)
+        savefile.save(filename + ".tmp", data)
+        os.replace(filename + ".tmp", filename)
+        self.dirty.discard(coords)
+
+    def _evict(self) -> None:
+        """Writes out and drops least recently used sectors until the cache fits."""
+        if len(self.sectors) <= self.cache_size:
+            return
+        live = self.live()
+        for coords in list(self.sectors):
+            if len(self.sectors) <= self.cache_size:
+                break
+            if coords in live:
+                continue
+            if coords in self.dirty:
+                self._write(coords)
+            del self.sectors[coords]
+
+    def _load_neighbours(self) -> None:
+        for coords in sorted(self.live()):
+            self.get(coords)
+        # The current sector is the most recently used
+        self.sectors.move_to_end(self.current)
+
+    def cross(self, map_state: dict, direction: tuple) -> dict:
+        """
+        Moves the player out of the current sector (whose map_state is given) in
+        direction (dx, dy). Returns the map_state of the sector entered, with the
+        player on the matching edge.
+        """
+        dx, dy = direction
+        x, y = map_state['player_pos']
+        self.dirty.add(self.current)
+        self.current = (self.current[0] + dx, self.current[1] + dy)
+        self._load_neighbours()
+        new_state = self.get(self.current)
+        self.dirty.add(self.current)
+        size = self.grid_size
+        new_state['player_pos'] = self._entry_cell(new_state, ((x + dx) % size, (y + dy) % size), direction)
+        new_state['moved_from_town'] = new_state['player_pos'] != new_state['town_pos']
+        return new_state
+
+    def _entry_cell(self, map_state: dict, cell: tuple, direction: tuple) -> tuple:
+        """cell, or the closest cell along the same edge without a monster or asteroid on it."""
+        taken = {m.get_pos() for m in map_state['monsters']} | {a.get_pos() for a in map_state.get('asteroids', [])}
+        if cell not in taken:
+            return cell
+        x, y = cell
+        # Entering left/right slides along y, entering top/bottom along x
+        along_y = direction[0] != 0
+        for offset in range(1, self.grid_size):
+            for sign in (1, -1):
+                candidate = (x, y + sign * offset) if along_y else (x + sign * offset, y)
+                if 0 <= candidate[0] < self.grid_size and 0 <= candidate[1] < self.grid_size \
+                        and candidate not in taken:
+                    return candidate
+        return cell
+
+    def flush(self) -> None:
+        """Writes every changed sector to disk, for a save."""
+        for coords in list(self.dirty):
+            if coords in self.sectors:
+                self._write(coords)
+
+    def discard(self) -> None:
+        """Deletes the sectors written so far, for a world that was never saved."""
+        shutil.rmtree(self.directory, ignore_errors=True)
+        self.dirty.update(self.sectors)